@@ -0,0 +1,137 @@
+"""
+Keyword intent routing for the master agent.
+
+Intents are declared in one table in priority order (lower number wins) and
+compiled once at import into a single prefix-trie regex. A message is scanned
+once and every matching intent is returned, so the routing decision no longer
+depends on the order of an if/elif chain.
+"""
+
+import re
+from typing import Dict, List, NamedTuple, Tuple
+
+# Intent names
+CLEAR_HISTORY = "clear_history"
+ADD_TO_CART = "add_to_cart"
+REMOVE_FROM_CART = "remove_from_cart"
+VIEW_CART = "view_cart"
+APPLY_DISCOUNT = "apply_discount"
+CHECKOUT = "checkout"
+VIEW_ORDERS = "view_orders"
+TRACK_ORDER = "track_order"
+BROWSE = "browse"
+PRODUCT_DETAILS = "product_details"
+PURCHASE = "purchase"
+AVAILABILITY = "availability"
+PAYMENT = "payment"
+GENERAL = "general"
+
+# (priority, intent, keywords). Keywords match as lowercase substrings of the message.
+INTENT_TABLE: List[Tuple[int, str, List[str]]] = [
+    (1, CLEAR_HISTORY, ["clear history", "new chat", "start over", "reset chat"]),
+    (2, ADD_TO_CART, [
+        "add to cart", "add this", "add that", "add it", "add the",
+        "i want to buy", "i'll take", "i will take", "buy this", "buy that",
+        "purchase this", "purchase that", "get this", "get that",
+        "put in cart", "add in cart", "cart add",
+        "i want this", "i want that", "i need this", "i need that",
+    ]),
+    (3, REMOVE_FROM_CART, ["remove from cart", "delete from cart", "remove this", "remove that", "take out"]),
+    (4, VIEW_CART, [
+        "show cart", "view cart", "my cart", "what's in my cart", "cart summary",
+        "what is in cart", "whats in cart", "items in cart", "check cart",
+        "whats there in cart", "anything in cart", "do we have anything in cart",
+        "do i have anything in cart", "do we have any items in cart",
+        "cart items", "in my cart", "in cart", "have in cart",
+    ]),
+    (5, APPLY_DISCOUNT, ["apply discount", "discount code", "promo code", "coupon"]),
+    (6, CHECKOUT, ["checkout", "proceed to checkout", "complete order", "finalize purchase"]),
+    (7, VIEW_ORDERS, [
+        "my orders", "my order", "order history", "past orders", "previous orders",
+        "recent orders", "show orders", "view orders", "order list",
+        "what did i order", "what have i ordered", "past purchases",
+        "do we have any orders", "do we have any order", "do i have orders", "do i have any order",
+        "any orders", "any order", "have i ordered", "did i order", "check my orders",
+        "check orders", "see my orders", "show my orders",
+    ]),
+    (8, TRACK_ORDER, [
+        "track order", "order status", "where is my order", "check order",
+        "order tracking", "delivery status", "shipment status",
+    ]),
+    (9, BROWSE, ["show", "recommend", "jeans", "shirt", "product", "browse", "looking for"]),
+    (10, PRODUCT_DETAILS, ["detail", "about", "tell me more", "information"]),
+    (11, PURCHASE, ["buy", "purchase"]),
+    (12, AVAILABILITY, ["available", "stock", "in store"]),
+    (13, PAYMENT, ["pay", "payment"]),
+]
+
+class IntentMatch(NamedTuple):
+    priority: int
+    intent: str
+
+
+def _trie_pattern(keywords) -> str:
+    """
+    Build a regex equivalent to a longest-first alternation of the keywords,
+    factored by common prefix so the engine dispatches on one character at a time.
+    """
+    trie: Dict[str, dict] = {}
+    for keyword in keywords:
+        node = trie
+        for char in keyword:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node) -> str:
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        # A keyword ends here: try to extend it first, otherwise stop (greedy => longest match)
+        return "(?:" + body + ")?" if "" in node else body
+
+    return build(trie)
+
+
+def _compile(table):
+    keyword_intents: Dict[str, set] = {}
+    for priority, intent, keywords in table:
+        for keyword in keywords:
+            keyword_intents.setdefault(keyword, set()).add((priority, intent))
+
+    # The lookahead reports the longest keyword starting at every position. Any
+    # shorter keyword matching at the same position is a prefix of it, so fold
+    # the intents of all prefix keywords into each entry to recover every
+    # overlapping match.
+    expanded: Dict[str, frozenset] = {}
+    for keyword in keyword_intents:
+        hits = set()
+        for other, found in keyword_intents.items():
+            if keyword.startswith(other):
+                hits |= found
+        expanded[keyword] = frozenset(hits)
+
+    pattern = re.compile("(?=(" + _trie_pattern(keyword_intents) + "))")
+    return pattern, expanded
+
+
+_PATTERN, _KEYWORD_INTENTS = _compile(INTENT_TABLE)
+
+
+def match_intents(message_lower: str) -> List[IntentMatch]:
+    """
+    Return every intent whose keywords occur in the (lowercased) message,
+    ordered by priority. Empty when nothing matches.
+    """
+    found = set()
+    for keyword in _PATTERN.findall(message_lower):
+        found |= _KEYWORD_INTENTS[keyword]
+    return [IntentMatch(priority, intent) for priority, intent in sorted(found)]
+
+
+def route(message_lower: str) -> str:
+    """
+    Return the highest-priority intent for the message, or GENERAL.
+    """
+    matches = match_intents(message_lower)
+    return matches[0].intent if matches else GENERAL
@@ -3,9 +3,10 @@ LLM client for interacting with Gemini directly (no LangChain retries).
 """
 
 import google.generativeai as genai
-from typing import List, Dict
+from typing import AsyncIterator, List, Dict, Optional
 from google.api_core.exceptions import ResourceExhausted
 
+import asyncio
 import logging
 import time
 from datetime import datetime, timedelta
@@ -24,6 +25,8 @@ class LLMClient:
     """
     Client for LLM interactions using Google Generative AI SDK directly (bypasses LangChain retries).
     """
+
+    OVERLOADED_MESSAGE = "I'm handling a lot of conversations right now. Please try again in a few seconds."
     
     def __init__(self):
         # Configure Google Generative AI SDK directly
@@ -59,6 +62,11 @@ These rules are mandatory and override normal creative behavior."""
         self._fail_threshold = 1
         self._quota_exhausted_until = None
 
+        # Bounded concurrency for async calls
+        self._semaphore = asyncio.Semaphore(settings.LLM_MAX_CONCURRENCY)
+        self._max_queue_depth = settings.LLM_MAX_QUEUE_DEPTH
+        self._waiting = 0
+
     def _is_disabled(self) -> bool:
         """Check if the LLM service is currently disabled by the circuit breaker."""
         # Check daily quota exhaustion first (longer block)
@@ -75,86 +83,177 @@ These rules are mandatory and override normal creative behavior."""
         backoff = self._base_backoff_seconds * (2 ** max(0, self._fail_count - 1))
         self._disabled_until = time.time() + backoff
         logger.warning("LLM temporarily disabled for %s seconds due to: %s", backoff, reason)
-        
-    def generate_response(self, prompt: str, chat_history: List[Dict] = None) -> str:
-        """
-        Generate a response from the LLM with conversation context using Google Generative AI SDK directly.
-        No LangChain retries - fast fail on quota errors.
-        """
-        # Fast-fail if circuit is open
-        if self._is_disabled():
-            remaining_time = int(max(self._disabled_until or 0, self._quota_exhausted_until or 0) - time.time())
-            logger.info("LLM call blocked by circuit breaker for %s more seconds", remaining_time)
-            if self._quota_exhausted_until:
-                return "⚠️ **Daily AI Limit Reached**\n\nThe AI assistant has used all 20 free requests for today. Please wait 24 hours or upgrade to a paid plan."
-            return f"The AI service is temporarily unavailable. Please try again in {remaining_time} seconds."
-
-        # Build conversation history in Gemini format
+
+    def _record_success(self):
+        """Reset failure counters after a successful call."""
+        self._fail_count = 0
+        self._disabled_until = None
+        self._quota_exhausted_until = None
+
+    def _blocked_response(self) -> Optional[str]:
+        """Return the fast-fail reply if the circuit is open, otherwise None."""
+        if not self._is_disabled():
+            return None
+        remaining_time = int(max(self._disabled_until or 0, self._quota_exhausted_until or 0) - time.time())
+        logger.info("LLM call blocked by circuit breaker for %s more seconds", remaining_time)
+        if self._quota_exhausted_until:
+            return "⚠️ **Daily AI Limit Reached**\n\nThe AI assistant has used all 20 free requests for today. Please wait 24 hours or upgrade to a paid plan."
+        return f"The AI service is temporarily unavailable. Please try again in {remaining_time} seconds."
+
+    def _build_history(self, chat_history: Optional[List[Dict]]) -> List[Dict]:
+        """Convert stored chat messages to Gemini history format."""
         history = []
-        
-        # Add chat history if provided
         if chat_history:
             for msg in chat_history:
                 role = "user" if msg.get("role") == "user" else "model"
                 content = msg.get("content", "")
                 if content.strip():  # Only add non-empty messages
                     history.append({"role": role, "parts": [content]})
+        return history
 
-        try:
-            # Start chat with history
-            chat = self.model.start_chat(history=history)
-            
-            # Send message with system prompt prepended
-            full_prompt = f"{self.system_prompt}\n\nUser: {prompt}"
-            response = chat.send_message(full_prompt)
-
-            # Reset failure counters on success
-            self._fail_count = 0
-            self._disabled_until = None
-            self._quota_exhausted_until = None
-
-            # Handle tool calls if any
-            if hasattr(response, 'tool_calls') and response.tool_calls:
-                # For now, we'll just return the tool call info or handle it simply
-                pass
-
-            # Reset counters on success
-            self._fail_count = 0
-            self._disabled_until = None
-            self._quota_exhausted_until = None
-            
-            return response.text
+    def _handle_error(self, e: Exception) -> str:
+        """Update breaker state for a failed call and return the user-facing reply."""
+        error_msg = str(e)
 
-        except ResourceExhausted as e:
+        if isinstance(e, ResourceExhausted):
             # Catch ResourceExhausted (429) immediately - no retries with direct SDK
-            error_msg = str(e)
             logger.error("🚫 Gemini API quota exhausted (fast-fail): %s", error_msg)
-            
+
             # Check if it's the daily quota (20 requests/day)
             if 'per day' in error_msg.lower() or 'generaterequestsperdayperprojectpermodel' in error_msg.replace(' ', '').replace('-','').lower():
                 # Daily quota exhausted - disable for 24 hours
                 self._quota_exhausted_until = time.time() + 86400
                 logger.error("Daily Gemini API quota (20 requests) exhausted. Service disabled for 24 hours.")
                 return "⚠️ **Daily AI Limit Reached**\n\nThe AI assistant has used all 20 free requests today. The quota resets in 24 hours.\n\n**Options:**\n- Wait for tomorrow's quota reset\n- Upgrade to paid Gemini API\n- Browse products without AI"
-            else:
-                # Per-minute quota
-                self._record_failure_and_backoff(error_msg)
-                return "The AI service is busy. Please try again in a minute."
-                
-        except Exception as e:
-            error_msg = str(e)
-            logger.exception("Error calling Gemini API: %s", error_msg)
-            
-            # Check for quota-related errors
-            if any(keyword in error_msg.lower() for keyword in ['quota', 'exceed', 'rate limit', '429']):
-                self._record_failure_and_backoff(error_msg)
-                return "The AI service is temporarily unavailable due to high usage. Please try again shortly."
-
-            # Handle StopCandidateException
-            if StopCandidateException and isinstance(e, StopCandidateException):
-                logger.warning("Gemini blocked response (StopCandidateException): %s", e)
-                return "I'm unable to generate a response to that. Could you try rephrasing your question?"
-
-            # Generic error
+            # Per-minute quota
             self._record_failure_and_backoff(error_msg)
-            return "I'm experiencing technical difficulties. Please try again in a moment."
\ No newline at end of file
+            return "The AI service is busy. Please try again in a minute."
+
+        logger.exception("Error calling Gemini API: %s", error_msg)
+
+        # Check for quota-related errors
+        if any(keyword in error_msg.lower() for keyword in ['quota', 'exceed', 'rate limit', '429']):
+            self._record_failure_and_backoff(error_msg)
+            return "The AI service is temporarily unavailable due to high usage. Please try again shortly."
+
+        # Handle StopCandidateException
+        if StopCandidateException and isinstance(e, StopCandidateException):
+            logger.warning("Gemini blocked response (StopCandidateException): %s", e)
+            return "I'm unable to generate a response to that. Could you try rephrasing your question?"
+
+        # Generic error
+        self._record_failure_and_backoff(error_msg)
+        return "I'm experiencing technical difficulties. Please try again in a moment."
+
+    def generate_response(self, prompt: str, chat_history: List[Dict] = None) -> str:
+        """
+        Generate a response from the LLM with conversation context using Google Generative AI SDK directly.
+        No LangChain retries - fast fail on quota errors.
+        Blocks the calling thread; async code should use agenerate_response.
+        """
+        # Fast-fail if circuit is open
+        blocked = self._blocked_response()
+        if blocked:
+            return blocked
+
+        try:
+            # Start chat with history
+            chat = self.model.start_chat(history=self._build_history(chat_history))
+
+            # Send message with system prompt prepended
+            full_prompt = f"{self.system_prompt}\n\nUser: {prompt}"
+            response = chat.send_message(full_prompt)
+
+            self._record_success()
+            return response.text
+
+        except Exception as e:
+            return self._handle_error(e)
+
+    async def _acquire_slot(self) -> bool:
+        """
+        Wait for a concurrency slot. Returns False without waiting when
+        LLM_MAX_QUEUE_DEPTH callers are already queued (load shedding).
+        """
+        if self._semaphore.locked() and self._waiting >= self._max_queue_depth:
+            logger.warning("LLM queue full (%s waiting), shedding request", self._waiting)
+            return False
+
+        self._waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self._waiting -= 1
+        return True
+
+    async def agenerate_response(self, prompt: str, chat_history: List[Dict] = None) -> str:
+        """
+        Async variant of generate_response that never blocks the event loop.
+        At most LLM_MAX_CONCURRENCY calls run at once; once LLM_MAX_QUEUE_DEPTH callers
+        are already waiting for a slot, further calls are shed with a deterministic reply.
+        """
+        blocked = self._blocked_response()
+        if blocked:
+            return blocked
+
+        if not await self._acquire_slot():
+            return self.OVERLOADED_MESSAGE
+
+        try:
+            # The breaker may have opened while this call was queued
+            blocked = self._blocked_response()
+            if blocked:
+                return blocked
+
+            chat = self.model.start_chat(history=self._build_history(chat_history))
+            full_prompt = f"{self.system_prompt}\n\nUser: {prompt}"
+            response = await chat.send_message_async(full_prompt)
+
+            self._record_success()
+            return response.text
+
+        except Exception as e:
+            return self._handle_error(e)
+        finally:
+            self._semaphore.release()
+
+    async def astream_response(self, prompt: str, chat_history: List[Dict] = None) -> AsyncIterator[str]:
+        """
+        Stream the response text chunk by chunk as Gemini produces it.
+        Same breaker and concurrency rules as agenerate_response; failures are
+        yielded as a final chunk with the usual user-facing message.
+        """
+        blocked = self._blocked_response()
+        if blocked:
+            yield blocked
+            return
+
+        if not await self._acquire_slot():
+            yield self.OVERLOADED_MESSAGE
+            return
+
+        try:
+            blocked = self._blocked_response()
+            if blocked:
+                yield blocked
+                return
+
+            chat = self.model.start_chat(history=self._build_history(chat_history))
+            full_prompt = f"{self.system_prompt}\n\nUser: {prompt}"
+            response = await chat.send_message_async(full_prompt, stream=True)
+
+            async for chunk in response:
+                try:
+                    text = chunk.text
+                except ValueError:
+                    # Chunks without text parts (e.g. safety metadata only)
+                    continue
+                if text:
+                    yield text
+
+            self._record_success()
+
+        except Exception as e:
+            yield self._handle_error(e)
+        finally:
+            self._semaphore.release()
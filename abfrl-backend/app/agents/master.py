@@ -1,220 +1,229 @@
-from typing import Dict, List, Any, Optional
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Any, Optional, Tuple
+from contextvars import ContextVar
 from app.agents.llm_client import LLMClient
+from app.agents import intents
 from app.services.recommendation import RecommendationService
 from app.services.inventory import InventoryService
 from app.services.payment import PaymentService
 from app.services.fulfillment import FulfillmentService
 from app.services.cart import CartService
+from app.services.catalog_index import catalog_index
+from app.services import store_inventory
+from app.services.stores import nearest_with_stock
 from app.models.product import Product
 from app.models.chat import ChatSession, Message
+import asyncio
 import re
 
+# Set by stream_message for the duration of one process_message call; LLM text
+# is pushed here chunk by chunk instead of being returned only at the end.
+_token_sink: ContextVar[Optional[Callable[[str], Awaitable[None]]]] = ContextVar("_token_sink", default=None)
+_STREAM_END = object()
+
+_SIZE_WORDS = {"small": "S", "medium": "M", "large": "L"}
+_SIZE_VALUE = r"(xxs|xs|s|m|l|xl|xxl|xxxl|[2-5]xl|small|medium|large|\d{1,3})"
+# "size M", "size: 32", "the size is L"; not "sizes" or "what size do you have"
+_ASKED_SIZE_RE = re.compile(r"\bsize\b(?:\s*[:=]|\s+(?:is|of))?\s*" + _SIZE_VALUE + r"\b")
+# Single letters only after "size", so "it's" or "I'm" are not read as sizes
+_SIZE_WORD_RE = re.compile(r"\b(xxs|xs|xl|xxl|xxxl|[2-5]xl|small|medium|large)\b")
+
+# Channels where a located shopper's pickup question is answered from the
+# nearest-store query directly, without the LLM
+DIRECT_PICKUP_CHANNELS = ("kiosk", "mobile")
+
+def asked_size(message_lower: str) -> Optional[str]:
+    """
+    The size a (lower-cased) message asks about, or None.
+    """
+    match = _ASKED_SIZE_RE.search(message_lower) or _SIZE_WORD_RE.search(message_lower)
+    return _SIZE_WORDS.get(match.group(1), match.group(1).upper()) if match else None
+
 class MasterAgent:
-    def __init__(self):
-        self.llm = LLMClient()
+    def __init__(self, llm: Optional[LLMClient] = None):
+        # Reuse a shared client when given so circuit-breaker state survives across requests
+        self.llm = llm or LLMClient()
         self.recommendation_service = RecommendationService()
         self.inventory_service = InventoryService()
         self.payment_service = PaymentService()
         self.fulfillment_service = FulfillmentService()
         self.cart_service = CartService()
 
-    async def process_message(self, message: str, chat_history: List[Dict] = None, user_id: str = "default_user") -> Dict[str, Any]:
+    async def _generate(self, prompt: str, chat_history: List[Dict] = None) -> str:
+        """Call the LLM, streaming chunks to the active token sink if there is one."""
+        sink = _token_sink.get()
+        if sink is None:
+            return await self.llm.agenerate_response(prompt, chat_history)
+
+        parts = []
+        async for chunk in self.llm.astream_response(prompt, chat_history):
+            parts.append(chunk)
+            await sink(chunk)
+        return "".join(parts)
+
+    async def stream_message(self, message: str, chat_history: List[Dict] = None, user_id: str = "default_user",
+                             channel: str = "web", location: Optional[Tuple[float, float]] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Run process_message and yield {"content": ...} events as soon as the LLM
+        produces text, then a final {"done": True, "result": ...} event carrying
+        the full result (products, cart_summary). Replies that never reach the
+        LLM are sent as a single content event.
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+
+        async def sink(text: str) -> None:
+            await queue.put(text)
+
+        async def run() -> Dict[str, Any]:
+            _token_sink.set(sink)  # Only visible inside this task's context
+            try:
+                return await self.process_message(message, chat_history, user_id, channel=channel, location=location)
+            finally:
+                await queue.put(_STREAM_END)
+
+        task = asyncio.create_task(run())
+        streamed = False
+        try:
+            while True:
+                chunk = await queue.get()
+                if chunk is _STREAM_END:
+                    break
+                streamed = True
+                yield {"content": chunk}
+
+            result = await task
+            if not streamed and isinstance(result.get("response"), str) and result["response"]:
+                yield {"content": result["response"]}
+            yield {"done": True, "result": result}
+        finally:
+            if not task.done():
+                task.cancel()
+
+    async def process_message(self, message: str, chat_history: List[Dict] = None, user_id: str = "default_user",
+                              channel: str = "web", location: Optional[Tuple[float, float]] = None) -> Dict[str, Any]:
+        """
+        location is the shopper's (latitude, longitude) when known; stock
+        questions then name the nearest stores holding the product.
+        """
         message_lower = message.lower()
         products = []
-        cart_summary = None
+        intent = intents.route(message_lower)
         
         # CONVERSATION MANAGEMENT: Clear history / New chat
-        if any(keyword in message_lower for keyword in ["clear history", "new chat", "start over", "reset chat"]):
+        if intent == intents.CLEAR_HISTORY:
             return await self._handle_clear_history(user_id)
         
-        # CART MANAGEMENT: Add to cart - Enhanced keywords
-        if any(keyword in message_lower for keyword in [
-            "add to cart", "add this", "add that", "add it", "add the",
-            "i want to buy", "i'll take", "i will take", "buy this", "buy that",
-            "purchase this", "purchase that", "get this", "get that",
-            "put in cart", "add in cart", "cart add",
-            "i want this", "i want that", "i need this", "i need that"
-        ]):
+        # CART MANAGEMENT: Add to cart
+        elif intent == intents.ADD_TO_CART:
             return await self._handle_add_to_cart(message, message_lower, chat_history, user_id)
         
         # CART MANAGEMENT: Remove from cart
-        elif any(keyword in message_lower for keyword in ["remove from cart", "delete from cart", "remove this", "remove that", "take out"]):
+        elif intent == intents.REMOVE_FROM_CART:
             return await self._handle_remove_from_cart(message, message_lower, chat_history, user_id)
         
         # CART MANAGEMENT: View cart
-        elif any(keyword in message_lower for keyword in [
-            "show cart", "view cart", "my cart", "what's in my cart", "cart summary", 
-            "what is in cart", "whats in cart", "items in cart", "check cart", 
-            "whats there in cart", "anything in cart", "do we have anything in cart",
-            "do i have anything in cart", "do we have any items in cart", 
-            "cart items", "in my cart", "in cart", "have in cart"
-        ]):
+        elif intent == intents.VIEW_CART:
             return await self._handle_view_cart(message, chat_history, user_id)
         
         # CART MANAGEMENT: Apply discount code
-        elif any(keyword in message_lower for keyword in ["apply discount", "discount code", "promo code", "coupon"]):
-            return self._handle_apply_discount(message, message_lower, chat_history, user_id)
+        elif intent == intents.APPLY_DISCOUNT:
+            return await self._handle_apply_discount(message, message_lower, chat_history, user_id)
         
         # CART MANAGEMENT: Checkout
-        elif any(keyword in message_lower for keyword in ["checkout", "proceed to checkout", "complete order", "finalize purchase"]):
-            return self._handle_checkout(message, chat_history, user_id)
+        elif intent == intents.CHECKOUT:
+            return await self._handle_checkout(message, chat_history, user_id)
         
         # ORDER MANAGEMENT: View order history
-        elif any(keyword in message_lower for keyword in [
-            "my orders", "my order", "order history", "past orders", "previous orders", 
-            "recent orders", "show orders", "view orders", "order list",
-            "what did i order", "what have i ordered", "past purchases",
-            "do we have any orders", "do we have any order", "do i have orders", "do i have any order",
-            "any orders", "any order", "have i ordered", "did i order", "check my orders",
-            "check orders", "see my orders", "show my orders"
-        ]):
+        elif intent == intents.VIEW_ORDERS:
             return await self._handle_view_orders(message, chat_history, user_id)
         
         # ORDER MANAGEMENT: Track specific order
-        elif any(keyword in message_lower for keyword in [
-            "track order", "order status", "where is my order", "check order",
-            "order tracking", "delivery status", "shipment status"
-        ]):
+        elif intent == intents.TRACK_ORDER:
             return await self._handle_track_order(message, message_lower, chat_history, user_id)
         
         # PRODUCT BROWSING: Show products
-        elif any(keyword in message_lower for keyword in ["show", "recommend", "jeans", "shirt", "product", "browse", "looking for"]):
-            # Get products from database using Beanie
-            if "jeans" in message_lower or "jean" in message_lower:
-                db_products = await Product.find(Product.category == "jeans").to_list()
-                category_name = "jeans"
-            elif "shirt" in message_lower or "tshirt" in message_lower or "t-shirt" in message_lower:
-                db_products = await Product.find(Product.category == "shirts").to_list()
-                category_name = "shirts"
-            else:
+        elif intent == intents.BROWSE:
+            # Semantic search over the catalog; fall back to a few products if nothing matches
+            products = await self.recommendation_service.get_recommendations(message, limit=5)
+            category_name = "matching products"
+            if not products:
                 db_products = await Product.find().limit(5).to_list()
                 category_name = "products"
-            
-            products = [{
-                "id": str(p.id),
-                "name": p.name,
-                "price": p.price,
-                "description": p.description,
-                "image_url": p.image_url
-            } for p in db_products]
+                products = [{
+                    "id": str(p.id),
+                    "name": p.name,
+                    "price": p.price,
+                    "description": p.description,
+                    "image_url": p.image_url
+                } for p in db_products]
             
             # Use LLM to generate personalized response about the products
             product_info = ", ".join([f"{p['name']} (₹{p['price']})" for p in products])
             prompt = f"The customer asked: '{message}'. I'm showing them {len(products)} {category_name}: {product_info}. Generate a friendly, conversational response introducing these products."
-            response = self.llm.generate_response(prompt, chat_history)
+            response = await self._generate(prompt, chat_history)
             
             return {"response": response, "products": products, "cart_summary": None}
         
         # Check if asking about specific product details
-        elif any(keyword in message_lower for keyword in ["detail", "about", "tell me more", "information"]):
+        elif intent == intents.PRODUCT_DETAILS:
             # Try to find product by name mentioned
-            words = message_lower.split()
-            found_product = None
-            
-            # Check for product names in the message using Beanie
-            all_products = await Product.find().to_list()
-            for product in all_products:
-                product_words = product.name.lower().split()
-                if any(word in words for word in product_words):
-                    found_product = product
-                    break
+            await catalog_index.ensure_loaded()
+            found_product = catalog_index.find_in_text(message_lower) or catalog_index.match_words(message_lower, min_multi_word_matches=1)
             
             if found_product:
-                products = [{
-                    "id": str(found_product.id),
-                    "name": found_product.name,
-                    "price": found_product.price,
-                    "description": found_product.description,
-                    "image_url": found_product.image_url
-                }]
+                products = [dict(found_product)]
                 
-                prompt = f"The customer asked for details about {found_product.name} which costs ₹{found_product.price}. Description: {found_product.description}. Provide detailed information about this product including material, fit, styling tips, and care instructions in a friendly way."
-                response = self.llm.generate_response(prompt, chat_history)
+                prompt = f"The customer asked for details about {found_product['name']} which costs ₹{found_product['price']}. Description: {found_product['description']}. Provide detailed information about this product including material, fit, styling tips, and care instructions in a friendly way."
+                response = await self._generate(prompt, chat_history)
                 return {"response": response, "products": products, "cart_summary": None}
+
+            # No product recognised - answer as general conversation
+            response = await self._generate(message, chat_history)
+            return {"response": response, "products": [], "cart_summary": None}
         
         # Check for cart/purchase related queries  
-        elif any(keyword in message_lower for keyword in ["buy", "purchase"]):
+        elif intent == intents.PURCHASE:
             prompt = f"The customer said: '{message}'. They want to add an item to their cart. Respond helpfully, acknowledging their request and asking if they need anything else or want to proceed to checkout."
-            response = self.llm.generate_response(prompt, chat_history)
+            response = await self._generate(prompt, chat_history)
             return {"response": response, "products": [], "cart_summary": None}
             
-        elif any(keyword in message_lower for keyword in ["available", "stock", "in store"]):
-            prompt = f"Customer asked: '{message}'. Tell them the product is available in stock at Phoenix Mall in sizes S, M, L, XL. Ask if they'd like to reserve it or check another location."
-            response = self.llm.generate_response(prompt, chat_history)
-            return {"response": response, "products": [], "cart_summary": None}
+        elif intent == intents.AVAILABILITY:
+            return await self._handle_availability(message, message_lower, chat_history, channel, location)
             
-        # Note: "order" keyword is handled above in ORDER MANAGEMENT section
-        elif any(keyword in message_lower for keyword in ["pay", "payment"]):
+        elif intent == intents.PAYMENT:
             prompt = f"Customer wants to complete their purchase: '{message}'. Guide them through the checkout process in a helpful way."
-            response = self.llm.generate_response(prompt, chat_history)
+            response = await self._generate(prompt, chat_history)
             return {"response": response, "products": [], "cart_summary": None}
         
         # General conversation - use LLM
         else:
-            response = self.llm.generate_response(message, chat_history)
+            response = await self._generate(message, chat_history)
             return {"response": response, "products": [], "cart_summary": None}
     
     async def _handle_add_to_cart(self, message: str, message_lower: str, chat_history: List[Dict], user_id: str) -> Dict[str, Any]:
         """Handle adding items to cart"""
         # Extract product name or ID from message
-        all_products = await Product.find_all().to_list()
-        found_product = None
-        
-        # Try to find product by name - Look for exact matches first, then partial
-        # Sort products by name length descending to match longest name first
-        sorted_products = sorted(all_products, key=lambda p: len(p.name), reverse=True)
+        await catalog_index.ensure_loaded()
         
-        # Method 1: Exact product name match
-        for product in sorted_products:
-            if product.name.lower() in message_lower:
-                found_product = product
-                break
+        # Method 1: Longest full product name in the message
+        found_product = catalog_index.find_in_text(message_lower)
         
-        # Method 2: Try word matching
+        # Method 2: Word matching (2+ words for multi-word names, or the single word)
         if not found_product:
-            for product in sorted_products:
-                product_words = product.name.lower().split()
-                # Check if at least 2 words match for multi-word names, or the single word matches
-                matches = sum(1 for word in product_words if word in message_lower)
-                if len(product_words) > 1 and matches >= 2:
-                    found_product = product
-                    break
-                elif len(product_words) == 1 and matches == 1:
-                    found_product = product
-                    break
+            found_product = catalog_index.match_words(message_lower)
         
         # Method 3: Try to extract product ID if mentioned
         if not found_product:
-            id_match = re.search(r'product (\d+)|id[:\s]*(\d+)|#(\d+)', message_lower)
+            id_match = re.search(r'product (\w+)|id[:\s]*(\w+)|#(\w+)', message_lower)
             if id_match:
-                # Assuming ID is still int or string? Beanie uses ObjectId by default but we might have custom IDs
-                # Let's assume we are using string IDs or int IDs as per model definition
-                # If Product model uses int id, we need to cast. If ObjectId, we need to handle that.
-                # Let's check Product model later. For now assuming it might be int or str.
                 product_id = id_match.group(1) or id_match.group(2) or id_match.group(3)
-                # Try to find by id (assuming id field exists and is compatible)
-                # If using default Beanie, id is PydanticObjectId.
-                # If we migrated from SQL, we might have kept integer IDs or mapped them.
-                # Let's assume we can search by id if it's an int field or similar.
-                # If it's ObjectId, we can't easily search by int unless we have a custom field.
-                # Let's assume we search by a custom 'id' field if it exists, or skip this for now if unsure.
-                # For safety, let's search by 'id' attribute if it matches.
-                try:
-                    found_product = await Product.get(product_id)
-                except:
-                    pass
+                found_product = catalog_index.get(product_id)
         
         # Method 4: Check recent chat history for product context
         if not found_product and chat_history:
             # Look at the last AI message to see if it mentioned products
             for msg in reversed(chat_history[-3:]):  # Check last 3 messages
                 if msg.get("role") == "ai":
-                    content = msg.get("content", "").lower()
-                    # Extract product names from AI's response
-                    for product in sorted_products:
-                        if product.name.lower() in content:
-                            found_product = product
-                            break
+                    found_product = catalog_index.find_in_text(msg.get("content", ""))
                     if found_product:
                         break
         
@@ -232,21 +241,20 @@ class MasterAgent:
                 size = size_match.group(1).upper()
             
             # Add to cart
-            result = await self.cart_service.add_item(user_id, str(found_product.id), quantity, size)
+            result = await self.cart_service.add_item(user_id, found_product["id"], quantity, size)
             
             if result["success"]:
                 cart_summary = await self.cart_service.get_cart_summary(user_id)
-                prompt = f"Customer added {quantity}x {found_product.name} (₹{found_product.price}) to their cart. Their cart now has {cart_summary['item_count']} items worth ₹{cart_summary['total']}. Confirm the addition and ask if they want to continue shopping or checkout."
-                response = self.llm.generate_response(prompt, chat_history)
+                # Suggest what other customers bought with this product
+                bought_together = await self.recommendation_service.get_frequently_bought_together(found_product["id"], limit=3)
+                prompt = f"Customer added {quantity}x {found_product['name']} (₹{found_product['price']}) to their cart. Their cart now has {cart_summary['item_count']} items worth ₹{cart_summary['total']}. Confirm the addition and ask if they want to continue shopping or checkout."
+                if bought_together:
+                    suggestions = ", ".join(f"{p['name']} (₹{p['price']})" for p in bought_together)
+                    prompt += f" Customers who bought it also often bought: {suggestions}. Briefly suggest these."
+                response = await self._generate(prompt, chat_history)
                 
-                # Include the added product in the response so frontend can display it if needed
-                added_product_info = [{
-                    "id": str(found_product.id),
-                    "name": found_product.name,
-                    "price": found_product.price,
-                    "description": found_product.description,
-                    "image_url": found_product.image_url
-                }]
+                # Include the added product (and suggestions) in the response so frontend can display them
+                added_product_info = [dict(found_product)] + bought_together
 
                 return {
                     "response": response,
@@ -260,7 +268,7 @@ class MasterAgent:
             sample_products = await Product.find_all().limit(5).to_list()
             product_list = ", ".join([p.name for p in sample_products])
             prompt = f"Customer wants to add something to cart but I couldn't identify which product from: '{message}'. Here are some products I have: {product_list}. Ask them to specify which product they'd like, or say 'show me [category]' to browse."
-            response = self.llm.generate_response(prompt, chat_history)
+            response = await self._generate(prompt, chat_history)
             
             # Return products to help them choose
             products = [{
@@ -275,23 +283,17 @@ class MasterAgent:
     
     async def _handle_remove_from_cart(self, message: str, message_lower: str, chat_history: List[Dict], user_id: str) -> Dict[str, Any]:
         """Handle removing items from cart"""
-        # Extract product name or ID
-        all_products = await Product.find_all().to_list()
-        found_product = None
-        
-        for product in all_products:
-            product_words = product.name.lower().split()
-            if any(word in message_lower for word in product_words):
-                found_product = product
-                break
+        # Extract product name (any shared name word is enough here)
+        await catalog_index.ensure_loaded()
+        found_product = catalog_index.find_in_text(message_lower) or catalog_index.match_words(message_lower, min_multi_word_matches=1)
         
         if found_product:
-            result = await self.cart_service.remove_item(user_id, str(found_product.id))
+            result = await self.cart_service.remove_item(user_id, found_product["id"])
             
             if result["success"]:
                 cart_summary = await self.cart_service.get_cart_summary(user_id)
                 # Deterministic message for confirmation of removal
-                response = f"Removed {found_product.name} from your cart. You now have {cart_summary['item_count']} item(s) in your cart. Would you like anything else?"
+                response = f"Removed {found_product['name']} from your cart. You now have {cart_summary['item_count']} item(s) in your cart. Would you like anything else?"
                 
                 return {
                     "response": response,
@@ -302,9 +304,62 @@ class MasterAgent:
                 return {"response": result["message"], "products": [], "cart_summary": None}
         else:
             prompt = f"Customer wants to remove something but didn't specify what: '{message}'. Ask which item they want to remove."
-            response = self.llm.generate_response(prompt, chat_history)
+            response = await self._generate(prompt, chat_history)
             return {"response": response, "products": [], "cart_summary": None}
     
+    async def _handle_availability(self, message: str, message_lower: str, chat_history: List[Dict],
+                                   channel: str = "web", location: Optional[Tuple[float, float]] = None) -> Dict[str, Any]:
+        """Answer stock questions from the store inventory"""
+        await catalog_index.ensure_loaded()
+        found_product = catalog_index.find_in_text(message_lower) or catalog_index.match_words(message_lower, min_multi_word_matches=1)
+        if not found_product:
+            prompt = f"Customer asked: '{message}'. Ask which product (and size) they would like to check availability for."
+            response = await self._generate(prompt, chat_history)
+            return {"response": response, "products": [], "cart_summary": None}
+
+        size = asked_size(message_lower)
+        nearest = await nearest_with_stock(found_product["id"], size, *location) if location is not None else []
+        if location is not None and channel in DIRECT_PICKUP_CHANNELS:
+            return {"response": self._pickup_answer(found_product["name"], size, nearest), "products": [dict(found_product)], "cart_summary": None}
+        entries = await store_inventory.availability(found_product["id"])
+        stores = sorted({entry["store_location"] for entry in entries})
+        asked_store = next((store for store in stores if store.lower() in message_lower), None)
+
+        def describe(matching):
+            by_store: Dict[str, List[str]] = {}
+            for entry in matching:
+                by_store.setdefault(entry["store_location"], []).append(f"{entry['size']}: {entry['quantity']}")
+            return "; ".join(f"{store} ({', '.join(sizes)})" for store, sizes in sorted(by_store.items()))
+
+        if not entries:
+            facts = f"{found_product['name']} is currently out of stock in all stores."
+        else:
+            matching = [e for e in entries if (size is None or e["size"] == size) and (asked_store is None or e["store_location"] == asked_store)]
+            wanted = " ".join(part for part in [f"in size {size}" if size else "", f"at {asked_store}" if asked_store else ""] if part)
+            if matching:
+                facts = f"{found_product['name']} {wanted + ' ' if wanted else ''}is in stock at: {describe(matching)}."
+            else:
+                facts = f"{found_product['name']} is not in stock {wanted}. It is in stock at: {describe(entries)}."
+        if nearest:
+            closest = "; ".join(f"{store['name']} ({store['distance_km']} km)" for store in nearest)
+            facts += f" Nearest to the customer: {closest}."
+        prompt = f"Customer asked: '{message}'. Current stock (store: size: quantity): {facts} Answer using only this stock information, and ask if they'd like to reserve it or check another size or store."
+        response = await self._generate(prompt, chat_history)
+        return {"response": response, "products": [dict(found_product)], "cart_summary": None}
+
+    @staticmethod
+    def _pickup_answer(name: str, size: Optional[str], nearest: List[Dict]) -> str:
+        """Deterministic pickup answer from the nearest stores holding the product"""
+        wanted = f"{name} in size {size}" if size else name
+        if not nearest:
+            return f"Sorry, {wanted} isn't in stock at any store near you right now."
+        lines = [f"You can pick up {wanted} at:"]
+        for store in nearest:
+            sizes = ", ".join(f"{entry['size']}: {entry['quantity']} left" for entry in store["stock"])
+            lines.append(f"- {store['name']} ({store['distance_km']} km away) — {sizes}")
+        lines.append("Would you like me to reserve one for you?")
+        return "\n".join(lines)
+
     async def _handle_view_cart(self, message: str, chat_history: List[Dict], user_id: str) -> Dict[str, Any]:
         """Handle viewing cart summary — deterministic, tool-first, no LLM for transactional facts"""
         cart_summary = await self.cart_service.get_cart_summary(user_id)
@@ -361,7 +416,7 @@ class MasterAgent:
                 cart_summary = await self.cart_service.get_cart_summary(user_id, code)
                 
                 prompt = f"Customer applied discount code '{code}' successfully! They got {validation['discount_percent']}% off, saving ₹{validation['discount_amount']}. New total: ₹{cart_summary['total']}. Celebrate this discount and ask if they want to checkout."
-                response = self.llm.generate_response(prompt, chat_history)
+                response = await self._generate(prompt, chat_history)
                 
                 return {
                     "response": response,
@@ -370,12 +425,12 @@ class MasterAgent:
                 }
             else:
                 prompt = f"Customer tried discount code '{code}' but it failed: {validation['message']}. Apologize and suggest they try another code or proceed without discount."
-                response = self.llm.generate_response(prompt, chat_history)
+                response = await self._generate(prompt, chat_history)
                 return {"response": response, "products": [], "cart_summary": current_cart}
         else:
             # List available discount codes
             prompt = f"Customer wants to use a discount code but didn't specify which one. Tell them about available codes: SAVE10 (10% off ₹1000+), FIRST20 (20% off ₹2000+), MEGA25 (25% off ₹5000+), VIP15 (15% off ₹3000+), WELCOME5 (5% off ₹500+). Ask which one they'd like to apply."
-            response = self.llm.generate_response(prompt, chat_history)
+            response = await self._generate(prompt, chat_history)
             return {"response": response, "products": [], "cart_summary": None}
     
     async def _handle_checkout(self, message: str, chat_history: List[Dict], user_id: str) -> Dict[str, Any]:
@@ -389,7 +444,7 @@ class MasterAgent:
         items_desc = ", ".join([f"{item['quantity']}x {item['product_name']}" for item in cart_summary["items"]])
         
         prompt = f"Customer ready to checkout! Order: {items_desc}. Total: ₹{cart_summary['total']} (includes shipping ₹{cart_summary['shipping']}). Guide them through payment: ask for their preferred payment method (Credit Card, UPI, Wallet, or Cash on Delivery). Also mention they can still apply a discount code if they haven't."
-        response = self.llm.generate_response(prompt, chat_history)
+        response = await self._generate(prompt, chat_history)
         
         return {
             "response": response,
@@ -418,7 +473,7 @@ class MasterAgent:
         
         if isinstance(orders_data, str):
             # No orders or error
-            response = self.llm.generate_response(
+            response = await self._generate(
                 f"Customer asked to see their orders but {orders_data}. Respond in a friendly way and suggest they browse products.",
                 chat_history
             )
@@ -437,7 +492,7 @@ class MasterAgent:
         
         orders_text = "\n".join(orders_summary)
         prompt = f"Customer wants to see their order history. They have {total_orders} orders:\n{orders_text}\n\nSummarize this in a friendly, conversational way. Mention they can ask for details about a specific order if needed."
-        response = self.llm.generate_response(prompt, chat_history)
+        response = await self._generate(prompt, chat_history)
         
         return {"response": response, "products": [], "cart_summary": None}
     
@@ -456,7 +511,7 @@ class MasterAgent:
             
             if isinstance(order_details, str):
                 # Error or not found
-                response = self.llm.generate_response(
+                response = await self._generate(
                     f"Customer asked about order {order_id} but {order_details}. Respond politely and offer to show their recent orders instead.",
                     chat_history
                 )
@@ -475,13 +530,13 @@ Shipping to: {order_details['shipping_address']}
 Estimated delivery: {order_details['estimated_delivery']}
 
 Provide a friendly, detailed update about their order status and when they can expect delivery."""
-            response = self.llm.generate_response(prompt, chat_history)
+            response = await self._generate(prompt, chat_history)
         else:
             # No order ID provided, show recent orders
             orders_data = await get_user_orders.ainvoke({"user_id": user_id})
             
             if isinstance(orders_data, str) or orders_data.get("total_orders", 0) == 0:
-                response = self.llm.generate_response(
+                response = await self._generate(
                     "Customer asked to track an order but they don't have any orders yet. Suggest they place an order first.",
                     chat_history
                 )
@@ -495,6 +550,6 @@ Provide a friendly, detailed update about their order status and when they can e
             ])
             
             prompt = f"Customer wants to track an order but didn't specify which one. Their recent orders:\n{orders_list}\n\nAsk them which order they'd like to track or if they want details about the most recent one."
-            response = self.llm.generate_response(prompt, chat_history)
+            response = await self._generate(prompt, chat_history)
         
         return {"response": response, "products": [], "cart_summary": None}
@@ -0,0 +1,67 @@
+"""
+Process-wide agent registry.
+
+The Gemini client and the master agent are expensive to build and carry
+state that must outlive a single request (the LLM circuit breaker), so they
+are created once per process and handed to endpoints through a dependency.
+"""
+
+from typing import Optional
+
+from fastapi import Request
+
+from app.agents.llm_client import LLMClient
+from app.agents.master import MasterAgent
+
+
+class AgentRegistry:
+    """
+    Holds the long-lived LLM client and master agent for this process.
+    """
+
+    def __init__(self) -> None:
+        self._llm: Optional[LLMClient] = None
+        self._master: Optional[MasterAgent] = None
+
+    @property
+    def llm(self) -> LLMClient:
+        """
+        Shared LLM client (built on first use).
+        """
+        if self._llm is None:
+            self._llm = LLMClient()
+        return self._llm
+
+    @property
+    def master(self) -> MasterAgent:
+        """
+        Shared master agent wired to the shared LLM client.
+        """
+        if self._master is None:
+            self._master = MasterAgent(llm=self.llm)
+        return self._master
+
+    def start(self) -> None:
+        """
+        Eagerly build the agents so the first chat message does not pay for it.
+        """
+        _ = self.master
+
+    def shutdown(self) -> None:
+        """
+        Drop the agents; a later access rebuilds them.
+        """
+        self._master = None
+        self._llm = None
+
+
+# Default registry; the app lifespan starts it and exposes it on app.state.
+agent_registry = AgentRegistry()
+
+
+def get_master_agent(request: Request) -> MasterAgent:
+    """
+    FastAPI dependency returning the process-wide master agent.
+    """
+    registry = getattr(request.app.state, "agent_registry", agent_registry)
+    return registry.master
@@ -2,14 +2,21 @@
 Admin endpoints - MongoDB/Beanie version.
 """
 
-from fastapi import APIRouter, Depends, HTTPException
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
 from datetime import datetime, timedelta
 
 from app.api.v1.endpoints.auth import get_current_admin_user
 from app.models.user import User as UserModel
 from app.models.order import Order as OrderModel
 from app.models.product import Product as ProductModel
+from app.models.cart import DiscountCode as DiscountCodeModel
+from app.schemas.cart import DiscountCodeSchema
+from app.services import catalog_events, low_stock
+from app.services.catalog_index import catalog_index
+from app.services.discount_cache import discount_cache
+from app.services.product_import import FORMATS, format_for_content_type, import_products
 
 router = APIRouter()
 
@@ -37,8 +44,8 @@ async def get_dashboard_metrics(
     monthly_orders = [order for order in all_orders if hasattr(order, 'created_at') and order.created_at >= month_start]
     monthly_revenue = sum(order.total for order in monthly_orders)
     
-    # Low stock products
-    low_stock_products = 0
+    # Low stock products (one count over the partial index of flagged products)
+    low_stock_products = await low_stock.count_low_stock()
     
     return {
         "totalRevenue": float(total_revenue),
@@ -273,6 +280,7 @@ async def create_product_admin(
     
     product = ProductModel(**product_data)
     await product.insert()
+    catalog_events.notify_product_saved(product)
     
     return {
         "id": product.id,
@@ -284,6 +292,22 @@ async def create_product_admin(
     }
 
 
+@router.post("/products/import")
+async def import_products_admin(
+    request: Request,
+    format: Optional[str] = Query(None, description="ndjson or csv; defaults to the Content-Type"),
+    current_admin: UserModel = Depends(get_current_admin_user)
+):
+    """
+    Bulk-create products from an NDJSON or CSV request body, streamed.
+    Returns counts and per-row errors.
+    """
+    file_format = format or format_for_content_type(request.headers.get("content-type"))
+    if file_format not in FORMATS:
+        raise HTTPException(status_code=415, detail="Send application/x-ndjson or text/csv")
+    return await import_products(request.stream(), file_format)
+
+
 @router.put("/products/{product_id}")
 async def update_product_admin(
     product_id: int,
@@ -302,6 +326,7 @@ async def update_product_admin(
             setattr(product, key, value)
     
     await product.save()
+    catalog_events.notify_product_saved(product)
     
     return {
         "id": product.id,
@@ -326,16 +351,113 @@ async def delete_product_admin(
         raise HTTPException(status_code=404, detail="Product not found")
     
     await product.delete()
+    catalog_events.notify_product_deleted(product.id)
     
     return {"message": "Product deleted successfully"}
 
 
+@router.get("/discount-codes")
+async def get_discount_codes(
+    current_admin: UserModel = Depends(get_current_admin_user)
+):
+    """Get all discount codes."""
+    
+    codes = await DiscountCodeModel.find_all().to_list()
+    return [DiscountCodeSchema.model_validate(code) for code in codes]
+
+
+@router.get("/discount-codes/cache")
+async def get_discount_cache_stats(
+    current_admin: UserModel = Depends(get_current_admin_user)
+):
+    """Get discount code cache statistics."""
+    return discount_cache.stats()
+
+
+@router.put("/discount-codes/{code}")
+async def upsert_discount_code(
+    code: str,
+    discount_data: DiscountCodeSchema,
+    current_admin: UserModel = Depends(get_current_admin_user)
+):
+    """Create or update a discount code."""
+    
+    code = code.upper()
+    discount = await DiscountCodeModel.find_one(DiscountCodeModel.code == code)
+    if not discount:
+        discount = DiscountCodeModel(code=code, discount_percent=discount_data.discount_percent)
+    
+    discount.discount_percent = discount_data.discount_percent
+    discount.min_purchase = discount_data.min_purchase
+    discount.active = discount_data.active
+    discount.valid_until = discount_data.valid_until
+    await discount.save()
+    discount_cache.on_code_saved(discount)
+    
+    return DiscountCodeSchema.model_validate(discount)
+
+
+@router.delete("/discount-codes/{code}")
+async def delete_discount_code(
+    code: str,
+    current_admin: UserModel = Depends(get_current_admin_user)
+):
+    """Delete discount code."""
+    
+    discount = await DiscountCodeModel.find_one(DiscountCodeModel.code == code.upper())
+    
+    if not discount:
+        raise HTTPException(status_code=404, detail="Discount code not found")
+    
+    await discount.delete()
+    discount_cache.on_code_deleted(discount.code)
+    
+    return {"message": "Discount code deleted successfully"}
+
+
 @router.get("/inventory")
 async def get_inventory(
+    store: Optional[str] = Query(None, description="Store location"),
+    limit: int = Query(100, ge=1, le=1000),
+    current_admin: UserModel = Depends(get_current_admin_user)
+):
+    """Get store inventory entries at or below their reorder threshold."""
+    
+    await catalog_index.ensure_loaded()
+    entries = await low_stock.low_stock_entries(store, limit)
+    result = []
+    for entry in entries:
+        product = catalog_index.get(entry["product_id"])
+        result.append({
+            "id": entry["_id"],
+            "productId": entry["product_id"],
+            "productName": product["name"] if product else "Unknown",
+            "sku": entry["product_id"],
+            "size": entry["size"],
+            "color": "",
+            "storeLocation": entry["store_location"],
+            "quantity": entry["quantity"],
+            "lowStockThreshold": low_stock.low_stock_detector.store_threshold(entry["store_location"]),
+            "isLowStock": True
+        })
+    return result
+
+
+@router.get("/inventory/low-stock-products")
+async def get_low_stock_products(
+    limit: int = Query(100, ge=1, le=1000),
+    current_admin: UserModel = Depends(get_current_admin_user)
+):
+    """Get products whose total stock is at or below their reorder threshold."""
+    return await low_stock.low_stock_products(limit=limit)
+
+
+@router.get("/inventory/alerts")
+async def stream_low_stock_alerts(
     current_admin: UserModel = Depends(get_current_admin_user)
 ):
-    """Get inventory items."""
-    return []
+    """Stream low-stock alerts as Server-Sent Events."""
+    return StreamingResponse(low_stock.low_stock_alerts.events(), media_type="text/event-stream")
 
 
 @router.get("/analytics")
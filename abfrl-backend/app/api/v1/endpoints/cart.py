@@ -2,7 +2,6 @@ from fastapi import APIRouter, HTTPException, Query
 from typing import Optional
 from app.services.cart import CartService
 from pydantic import BaseModel
-from app.models.cart import Cart
 
 router = APIRouter()
 
@@ -31,10 +30,7 @@ async def apply_discount(request: DiscountRequest):
     validation = await cart_service.validate_discount_code(request.code, cart_summary["subtotal"])
     
     if validation["valid"]:
-        cart = await Cart.find_one(Cart.user_id == request.user_id)
-        if cart:
-            cart.applied_discount_code = request.code
-            await cart.save()
+        await cart_service.apply_discount_code(request.user_id, request.code)
             
         return {"success": True, "message": validation["message"]}
     else:
@@ -83,19 +79,15 @@ async def sync_cart_from_firestore(request: dict):
     if not user_id:
         raise HTTPException(status_code=400, detail="user_id is required")
     
-    # Clear existing cart first
-    await cart_service.clear_cart(user_id)
-    
-    # Add all items
-    results = []
-    for item in items:
-        result = await cart_service.add_item(
-            user_id=user_id,
-            product_id=str(item.get("id")),
-            quantity=item.get("quantity", 1),
-            size=item.get("selectedSize")
-        )
-        results.append(result)
+    # Validate every product and write the new items in one update
+    results = await cart_service.replace_cart(user_id, [
+        {
+            "product_id": str(item.get("id")),
+            "quantity": item.get("quantity", 1),
+            "size": item.get("selectedSize")
+        }
+        for item in items
+    ])
     
     return {"success": True, "synced_items": len(results), "results": results}
 
@@ -1,16 +1,28 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
 from fastapi.responses import StreamingResponse
 from app.schemas.chat import ChatRequest, ChatResponse
 from app.agents.master import MasterAgent
+from app.agents.registry import get_master_agent
 from app.models.chat import ChatSession, Message
+from app.services.stores import store_locator
 from datetime import datetime
+from typing import Optional, Tuple
 import json
-import asyncio
 
 router = APIRouter()
 
+
+async def _shopper_location(request: ChatRequest) -> Optional[Tuple[float, float]]:
+    """The shopper's (latitude, longitude): sent by the client, or the kiosk's store"""
+    if request.latitude is not None and request.longitude is not None:
+        return request.latitude, request.longitude
+    if request.store:
+        await store_locator.ensure_loaded()
+        return store_locator.coordinates(request.store)
+    return None
+
 @router.post("/stream")
-async def chat_stream_endpoint(request: ChatRequest):
+async def chat_stream_endpoint(request: ChatRequest, agent: MasterAgent = Depends(get_master_agent)):
     """Streaming chat endpoint for real-time responses"""
     user_id = request.user_id
     session_id = request.session_id or user_id  # Use provided session_id or fallback to user_id
@@ -35,9 +47,16 @@ async def chat_stream_endpoint(request: ChatRequest):
                     "content": msg.content
                 })
             
-            # Process message
-            agent = MasterAgent()
-            result = await agent.process_message(request.message, chat_history, user_id)
+            # Relay LLM text as soon as the model produces it
+            result = None
+            streamed = False
+            location = await _shopper_location(request)
+            async for event in agent.stream_message(request.message, chat_history, user_id, channel=request.channel, location=location):
+                if event.get("done"):
+                    result = event["result"]
+                    continue
+                streamed = True
+                yield f"data: {json.dumps({'content': event['content'], 'done': False})}\n\n"
             
             # Store user message
             user_msg = Message(
@@ -55,15 +74,8 @@ async def chat_stream_endpoint(request: ChatRequest):
                 except (IndexError, AttributeError):
                     response_content = str(response_content)
             
-            # Stream response word by word
-            words = response_content.split()
-            for i, word in enumerate(words):
-                chunk_data = {
-                    "content": word + " ",
-                    "done": False
-                }
-                yield f"data: {json.dumps(chunk_data)}\n\n"
-                await asyncio.sleep(0.03)  # Typing effect delay
+            if not streamed and response_content:
+                yield f"data: {json.dumps({'content': response_content, 'done': False})}\n\n"
             
             # Send products and cart if available
             if result.get("products") or result.get("cart_summary"):
@@ -95,7 +107,7 @@ async def chat_stream_endpoint(request: ChatRequest):
     return StreamingResponse(generate(), media_type="text/event-stream")
 
 @router.post("/", response_model=ChatResponse)
-async def chat_endpoint(request: ChatRequest):
+async def chat_endpoint(request: ChatRequest, agent: MasterAgent = Depends(get_master_agent)):
     user_id = request.user_id
     
     # 1. Get or Create Chat Session (Persistent)
@@ -119,8 +131,8 @@ async def chat_endpoint(request: ChatRequest):
     
     # 3. Invoke Agent with history and user_id
     try:
-        agent = MasterAgent()
-        result = await agent.process_message(request.message, chat_history, user_id)
+        location = await _shopper_location(request)
+        result = await agent.process_message(request.message, chat_history, user_id, channel=request.channel, location=location)
         
         # 4. Store conversation in ChatSession messages list
         user_msg = Message(
@@ -1,11 +1,11 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Header, HTTPException
 from pydantic import BaseModel
 from typing import Optional, List
+from app.services import idempotency
 from app.services.cart import CartService
-from app.models.order import Order, OrderItem
-from app.models.product import Product
-from datetime import datetime
-from beanie import PydanticObjectId
+from app.services.checkout import AmountMismatch, CheckoutService, EmptyCart, HoldLapsed, PaymentNotConfirmed
+from app.services.idempotency import IdempotencyConflict, RequestInProgress
+from app.services.inventory import InsufficientStock
 
 router = APIRouter()
 
@@ -30,80 +30,59 @@ class CartItemData(BaseModel):
 class CheckoutRequest(BaseModel):
     user_id: str
     shipping_address: ShippingAddress
-    cart_items: List[CartItemData]
-    subtotal: float
-    shipping: float
-    discount: float
-    total: float
+    # Ignored: the order is priced from the server-side cart. Accepted so older clients keep working.
+    cart_items: List[CartItemData] = []
+    subtotal: Optional[float] = None
+    shipping: Optional[float] = None
+    discount: Optional[float] = None
+    total: Optional[float] = None
     discount_code: Optional[str] = None
     payment_id: str
     transaction_id: str
     notes: Optional[str] = None
 
 @router.post("/checkout", response_model=dict)
-async def checkout(request: CheckoutRequest):
-    """Process checkout and create order after payment verification"""
+async def checkout(
+    request: CheckoutRequest,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
+):
+    """
+    Place the order for a confirmed payment from the user's cart, priced on
+    the server, and return everything the confirmation page shows. The cart
+    is emptied in the same step. Retries with the same Idempotency-Key
+    (default: the payment_id) return the original order instead of placing
+    another.
+    """
     
-    if len(request.cart_items) == 0:
-        raise HTTPException(status_code=400, detail="Cart is empty")
-    
-    # Create order
     try:
-        # Create order items list with product details
-        order_items = []
-        for item in request.cart_items:
-            order_item = OrderItem(
-                product_id=str(item.id),
-                product_name=item.name,
-                quantity=item.quantity,
-                price=item.price,
-                size=item.selectedSize
-            )
-            order_items.append(order_item)
+        return await idempotency.run(
+            "checkout", idempotency_key or request.payment_id, request.model_dump(), lambda: _place_order(request)
+        )
+    except IdempotencyConflict:
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different checkout")
+    except RequestInProgress:
+        raise HTTPException(status_code=409, detail="This checkout is still being processed, retry shortly")
 
-        order = Order(
+async def _place_order(request: CheckoutRequest) -> dict:
+    try:
+        return await CheckoutService.place_order(
             user_id=request.user_id,
-            total_amount=request.total,
-            subtotal=request.subtotal,
-            shipping_cost=request.shipping,
-            discount_amount=request.discount,
+            payment_id=request.payment_id,
+            transaction_id=request.transaction_id,
+            shipping_address=request.shipping_address.model_dump(),
             discount_code=request.discount_code,
-            status="confirmed",
-            payment_status="success",
-            payment_method="mock_upi",
-            razorpay_order_id=request.payment_id,
-            razorpay_payment_id=request.transaction_id,
-            razorpay_signature="MOCK_PAYMENT",
-            
-            # Shipping Details
-            shipping_name=request.shipping_address.full_name,
-            shipping_email=request.shipping_address.email,
-            shipping_phone=request.shipping_address.phone,
-            shipping_address_line1=request.shipping_address.address_line1,
-            shipping_address_line2=request.shipping_address.address_line2,
-            shipping_city=request.shipping_address.city,
-            shipping_state=request.shipping_address.state,
-            shipping_zip=request.shipping_address.zip_code,
-            shipping_country=request.shipping_address.country,
-            
-            items=order_items,
             notes=request.notes,
-            created_at=datetime.utcnow()
         )
-        await order.save()
-        
-        return {
-            "success": True,
-            "order_id": str(order.id),
-            "total": request.total,
-            "message": "Order placed successfully!",
-            "estimated_delivery": "3-5 business days"
-        }
-        
-    except Exception as e:
-        import traceback
-        traceback.print_exc()
-        raise HTTPException(status_code=500, detail=f"Checkout failed: {str(e)}")
+    except PaymentNotConfirmed as e:
+        raise HTTPException(status_code=402, detail={"message": "Payment has not been confirmed", "status": e.status})
+    except EmptyCart:
+        raise HTTPException(status_code=400, detail="Cart is empty")
+    except AmountMismatch as e:
+        raise HTTPException(status_code=409, detail={"message": "Cart changed after payment was started", "paid": e.paid, "total": e.total})
+    except InsufficientStock as e:
+        raise HTTPException(status_code=409, detail={"message": "Some items are out of stock", "product_ids": e.product_ids})
+    except HoldLapsed:
+        raise HTTPException(status_code=409, detail="Stock could not be held, please retry")
 
 @router.get("/cart/{user_id}", response_model=dict)
 async def get_cart(user_id: str):
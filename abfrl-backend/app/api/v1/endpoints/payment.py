@@ -1,15 +1,15 @@
 from fastapi import APIRouter, HTTPException
+from app.models.payment import PaymentSession
 from app.services.cart import CartService
+from app.services.inventory import InsufficientStock, InventoryService
 from pydantic import BaseModel
+from pymongo import ReturnDocument
 from uuid import uuid4
 from datetime import datetime, timedelta
-from typing import Dict, Optional
+from typing import Optional
 
 router = APIRouter()
 
-# In-memory mock payment storage (use Redis in production)
-mock_payments: Dict[str, dict] = {}
-
 class CreateOrderRequest(BaseModel):
     user_id: str
     discount_code: Optional[str] = None
@@ -17,30 +17,56 @@ class CreateOrderRequest(BaseModel):
 class ConfirmPaymentRequest(BaseModel):
     payment_id: str
 
+async def _get_payment(payment_id: str) -> PaymentSession:
+    payment = await PaymentSession.get(payment_id)
+    if payment is None:
+        raise HTTPException(status_code=404, detail="Payment session not found")
+    return payment
+
+async def _expire_if_lapsed(payment: PaymentSession) -> None:
+    """A pending payment past its expiry is expired once, and its stock hold released"""
+    if payment.status != 'PENDING' or datetime.utcnow() <= payment.expires_at:
+        return
+    expired = await PaymentSession.get_motor_collection().update_one(
+        {"_id": payment.id, "status": "PENDING"}, {"$set": {"status": "EXPIRED"}}
+    )
+    if expired.modified_count:
+        await InventoryService.release(payment.id)
+    payment.status = 'EXPIRED'
+
 @router.post("/create-mock-payment")
 async def create_mock_payment(request: CreateOrderRequest):
     """Create mock payment session and generate QR code data"""
     cart_service = CartService()
-    cart_summary = await cart_service.get_cart_summary(request.user_id, request.discount_code)
+    # Price from the products collection, not cart snapshots: this is the amount charged
+    cart_summary = await cart_service.get_cart_summary(request.user_id, request.discount_code, use_snapshots=False)
     
     if cart_summary["total"] <= 0:
         raise HTTPException(status_code=400, detail="Cart total must be greater than 0")
     
+    # Generate unique payment ID
+    payment_id = str(uuid4())
+    
+    # Hold the stock while the payment is pending; released if it is abandoned
     try:
-        # Generate unique payment ID
-        payment_id = str(uuid4())
-        
-        # Store payment session
-        mock_payments[payment_id] = {
-            'payment_id': payment_id,
-            'user_id': request.user_id,
-            'amount': cart_summary["total"],
-            'discount_code': request.discount_code,
-            'status': 'PENDING',
-            'created_at': datetime.utcnow().isoformat(),
-            'expires_at': (datetime.utcnow() + timedelta(minutes=15)).isoformat(),
-            'cart_summary': cart_summary
-        }
+        await InventoryService.reserve_items(
+            payment_id,
+            [(item["id"], item["quantity"]) for item in cart_summary["items"]],
+            request.user_id,
+        )
+    except InsufficientStock as e:
+        raise HTTPException(status_code=409, detail={"message": "Some items are out of stock", "product_ids": e.product_ids})
+    
+    try:
+        # Stored in Mongo, so checkout can check it from any worker and after a restart
+        await PaymentSession(
+            id=payment_id,
+            user_id=request.user_id,
+            amount=cart_summary["total"],
+            discount_code=request.discount_code,
+            expires_at=datetime.utcnow() + timedelta(minutes=15),
+            cart_summary=cart_summary
+        ).insert()
         
         # Generate QR URL (this will be scanned by mobile)
         qr_url = f"mock-pay/{payment_id}?amount={cart_summary['total']}"
@@ -60,21 +86,22 @@ async def create_mock_payment(request: CreateOrderRequest):
 @router.post("/confirm-mock-payment/{payment_id}")
 async def confirm_mock_payment(payment_id: str):
     """Confirm mock payment (called when user clicks Pay on mobile)"""
-    if payment_id not in mock_payments:
-        raise HTTPException(status_code=404, detail="Payment session not found")
-    
-    payment = mock_payments[payment_id]
-    
-    # Check if expired
-    expires_at = datetime.fromisoformat(payment['expires_at'])
-    if datetime.utcnow() > expires_at:
-        payment['status'] = 'EXPIRED'
-        raise HTTPException(status_code=400, detail="Payment session expired")
-    
-    # Mark as success
-    payment['status'] = 'SUCCESS'
-    payment['confirmed_at'] = datetime.utcnow().isoformat()
-    payment['transaction_id'] = f"TXN{uuid4().hex[:12].upper()}"
+    # Only a pending, unexpired payment succeeds, once
+    payment = await PaymentSession.get_motor_collection().find_one_and_update(
+        {"_id": payment_id, "status": "PENDING", "expires_at": {"$gt": datetime.utcnow()}},
+        {"$set": {
+            "status": "SUCCESS",
+            "confirmed_at": datetime.utcnow(),
+            "transaction_id": f"TXN{uuid4().hex[:12].upper()}",
+        }},
+        return_document=ReturnDocument.AFTER,
+    )
+    if payment is None:
+        session = await _get_payment(payment_id)
+        if session.status != 'SUCCESS':
+            await _expire_if_lapsed(session)
+            raise HTTPException(status_code=400, detail="Payment session expired")
+        payment = {"transaction_id": session.transaction_id}  # confirmed already
     
     return {
         'success': True,
@@ -86,39 +113,29 @@ async def confirm_mock_payment(payment_id: str):
 @router.get("/mock-payment-status/{payment_id}")
 async def get_mock_payment_status(payment_id: str):
     """Get payment status (for polling from frontend)"""
-    if payment_id not in mock_payments:
-        raise HTTPException(status_code=404, detail="Payment session not found")
-    
-    payment = mock_payments[payment_id]
-    
-    # Check if expired
-    expires_at = datetime.fromisoformat(payment['expires_at'])
-    if datetime.utcnow() > expires_at and payment['status'] == 'PENDING':
-        payment['status'] = 'EXPIRED'
+    payment = await _get_payment(payment_id)
+    await _expire_if_lapsed(payment)
     
     return {
         'success': True,
         'payment_id': payment_id,
-        'status': payment['status'],
-        'amount': payment['amount'],
-        'transaction_id': payment.get('transaction_id'),
-        'confirmed_at': payment.get('confirmed_at')
+        'status': payment.status,
+        'amount': payment.amount,
+        'transaction_id': payment.transaction_id,
+        'confirmed_at': payment.confirmed_at.isoformat() if payment.confirmed_at else None
     }
 
 @router.get("/mock-payment-details/{payment_id}")
 async def get_mock_payment_details(payment_id: str):
     """Get full payment details for display on payment page"""
-    if payment_id not in mock_payments:
-        raise HTTPException(status_code=404, detail="Payment session not found")
-    
-    payment = mock_payments[payment_id]
+    payment = await _get_payment(payment_id)
     
     return {
         'success': True,
         'payment_id': payment_id,
-        'amount': payment['amount'],
-        'status': payment['status'],
-        'user_id': payment['user_id'],
-        'created_at': payment['created_at'],
-        'expires_at': payment['expires_at']
+        'amount': payment.amount,
+        'status': payment.status,
+        'user_id': payment.user_id,
+        'created_at': payment.created_at.isoformat(),
+        'expires_at': payment.expires_at.isoformat()
     }
@@ -2,63 +2,247 @@
 Products endpoints.
 """
 
-from fastapi import APIRouter
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlencode
+
+from bson import ObjectId
+from fastapi import APIRouter, HTTPException, Query, Request, Response
 from ....models.product import Product
+from ....schemas.product import BulkAvailabilityRequest
+from ....services import store_inventory, stores
+from ....services.autocomplete import MAX_SUGGESTIONS, autocomplete_index
+from ....services.catalog_cache import catalog_cache, etag_matches
+from ....services.catalog_index import catalog_index
+from ....services.facets import PRICE_BUCKETS, facet_index
+from ....services.search_index import search_index
+from ....services.recommendation import RecommendationService
 
 router = APIRouter()
 
+# Fields a listing can ask for; "id" is always returned
+LISTING_FIELDS = ("name", "description", "price", "category", "image_url", "sizes", "colors")
+
+
+def _listing_item(doc: dict, fields) -> dict:
+    item = {"id": str(doc["_id"])}
+    for field in fields:
+        item[field] = doc.get(field, [] if field in ("sizes", "colors") else None)
+    if "image_url" in fields:
+        item["imageUrl"] = item["image_url"]  # Add camelCase version for frontend
+    return item
+
+
+async def _cached_json(request: Request, build: Callable[[], Awaitable[Tuple[object, Dict[str, str]]]]) -> Response:
+    """
+    Serve a catalog response from the version-keyed cache, building and
+    caching it on a miss, and answer If-None-Match with 304 when it matches.
+    """
+    await catalog_cache.sync()
+    key = catalog_cache.key(request.url.path, urlencode(sorted(request.query_params.multi_items())))
+    entry = catalog_cache.get(key)
+    if entry is None:
+        payload, headers = await build()
+        entry = catalog_cache.put(key, payload, headers)
+
+    # Clients must revalidate, which costs a 304 when nothing changed
+    headers = {**entry.headers, "ETag": entry.etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), entry.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
+
 
 @router.get("/")
-async def get_products():
+async def get_products(
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1, le=200, description="Page size; omit to get every match"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor value from the previous page"),
+    category: Optional[str] = None,
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    size: Optional[List[str]] = Query(None, description="Products stocked in any of these sizes"),
+    fields: Optional[str] = Query(None, description="Comma-separated subset of " + ", ".join(LISTING_FIELDS)),
+):
     """
-    Get all products.
+    List products, optionally filtered and paginated.
+    Pages are ordered by id; when more results exist the cursor for the next
+    page is returned in the X-Next-Cursor header.
     """
-    products = await Product.find_all().to_list()
-    
-    # Enhance products with sizes and colors from inventory
-    result = []
-    for product in products:
-        product_dict = {
-            "id": str(product.id),
-            "name": product.name,
-            "description": product.description,
-            "price": product.price,
-            "category": product.category,
-            "image_url": product.image_url,
-            "imageUrl": product.image_url,  # Add camelCase version for frontend
-            "sizes": list(set([inv.size for inv in product.inventory])) if product.inventory else [],
-            "colors": product.metadata_info.get("colors", []) if product.metadata_info else [],
-        }
-        result.append(product_dict)
-    
-    return result
+    return await _cached_json(request, lambda: _list_products(limit, cursor, category, min_price, max_price, size, fields))
+
+
+async def _list_products(limit, cursor, category, min_price, max_price, size, fields):
+    query: dict = {}
+    if category:
+        query["category"] = category
+    if min_price is not None or max_price is not None:
+        query["price"] = {}
+        if min_price is not None:
+            query["price"]["$gte"] = min_price
+        if max_price is not None:
+            query["price"]["$lte"] = max_price
+    if size:
+        query["sizes"] = {"$in": size}
+    if cursor:
+        if not ObjectId.is_valid(cursor):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        query["_id"] = {"$gt": ObjectId(cursor)}
+
+    if fields:
+        selected = [field.strip() for field in fields.split(",") if field.strip() and field.strip() != "id"]
+        unknown = [field for field in selected if field not in LISTING_FIELDS]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    else:
+        selected = list(LISTING_FIELDS)
+
+    find = Product.get_motor_collection().find(query, {field: 1 for field in selected}).sort("_id", 1)
+    if limit:
+        # One extra row tells us whether there is a next page
+        find = find.limit(limit + 1)
+    docs = await find.to_list(length=None)
+
+    headers = {}
+    if limit and len(docs) > limit:
+        docs = docs[:limit]
+        headers["X-Next-Cursor"] = str(docs[-1]["_id"])
+
+    return [_listing_item(doc, selected) for doc in docs], headers
+
+
+@router.get("/search")
+async def search_products(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+):
+    """
+    Typo-tolerant product search over name, category and description.
+    Results are ranked by match score, best first.
+    """
+    return await _cached_json(request, lambda: _search_products(q, limit))
+
+
+async def _search_products(q: str, limit: int):
+    await catalog_index.ensure_loaded()
+    await search_index.ensure_loaded()
+    results = []
+    for product_id, score in search_index.search(q, limit):
+        card = catalog_index.get(product_id)
+        if card:
+            results.append({**card, "imageUrl": card["image_url"], "score": score})
+    return results, {}
+
+
+@router.get("/autocomplete")
+async def autocomplete(
+    q: str = Query(..., max_length=100),
+    limit: int = Query(MAX_SUGGESTIONS, ge=1, le=MAX_SUGGESTIONS),
+):
+    """
+    Product name and category suggestions for a typed prefix, most popular first.
+    """
+    await autocomplete_index.ensure_loaded()
+    return autocomplete_index.suggest(q, limit)
+
+
+@router.get("/facets")
+async def get_facets(
+    request: Request,
+    category: Optional[List[str]] = Query(None),
+    size: Optional[List[str]] = Query(None),
+    color: Optional[List[str]] = Query(None),
+    price: Optional[List[str]] = Query(None, description="Price buckets: " + ", ".join(PRICE_BUCKETS)),
+):
+    """
+    Product counts per category, size, color and price bucket. Values of one
+    facet are alternatives; different facets narrow each other down.
+    """
+    unknown = [bucket for bucket in price or [] if bucket not in PRICE_BUCKETS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown price buckets: {', '.join(unknown)}")
+    filters = {"category": category, "size": size, "color": color, "price": price}
+    return await _cached_json(request, lambda: _facets(filters))
+
+
+async def _facets(filters):
+    await facet_index.ensure_loaded()
+    return facet_index.counts(filters), {}
+
+
+@router.post("/availability")
+async def get_bulk_availability(request: BulkAvailabilityRequest):
+    """
+    Store availability for many (product, size, store) queries at once, e.g. a whole cart.
+    """
+    return await store_inventory.bulk_availability([query.model_dump() for query in request.queries])
+
+
+@router.get("/{product_id}/availability")
+async def get_availability(
+    product_id: str,
+    size: Optional[str] = None,
+    store: Optional[str] = Query(None, description="Store location"),
+):
+    """
+    Stores holding this product in stock, with quantities per size.
+    """
+    return await store_inventory.availability(product_id, size, store)
+
+
+@router.get("/{product_id}/nearest-stores")
+async def get_nearest_stores(
+    product_id: str,
+    lat: float = Query(..., ge=-90, le=90),
+    lng: float = Query(..., ge=-180, le=180),
+    size: Optional[str] = None,
+    limit: int = Query(3, ge=1, le=20),
+    max_km: float = Query(stores.DEFAULT_MAX_KM, gt=0, le=1000),
+):
+    """
+    The nearest stores with this product in stock (in the size, if given), nearest first.
+    """
+    return await stores.nearest_with_stock(product_id, size, lat, lng, limit, max_km)
+
+
+@router.get("/{product_id}/frequently-bought-together")
+async def get_frequently_bought_together(product_id: str, limit: int = Query(5, ge=1, le=20)):
+    """
+    Products most often bought in the same order as this one.
+    """
+    products = await RecommendationService.get_frequently_bought_together(product_id, limit)
+    return [{**product, "imageUrl": product["image_url"]} for product in products]
+
 
 @router.get("/{product_id}")
-async def get_product_by_id(product_id: str):
+async def get_product_by_id(product_id: str, request: Request):
     """
     Get a single product by ID.
     """
-    from beanie import PydanticObjectId
-    
     try:
-        product = await Product.get(PydanticObjectId(product_id))
-        
-        if not product:
-            return {"error": "Product not found"}
-        
-        return {
-            "_id": str(product.id),
-            "id": str(product.id),
-            "name": product.name,
-            "description": product.description,
-            "price": product.price,
-            "category": product.category,
-            "image_url": product.image_url,
-            "imageUrl": product.image_url,
-            "sizes": list(set([inv.size for inv in product.inventory])) if product.inventory else [],
-            "colors": product.metadata_info.get("colors", []) if product.metadata_info else [],
-            "rating": 4.5,
-            "reviews": 1234
-        }
+        return await _cached_json(request, lambda: _product_detail(product_id))
     except Exception as e:
         return {"error": str(e)}
+
+
+async def _product_detail(product_id: str):
+    from beanie import PydanticObjectId
+    
+    product = await Product.get(PydanticObjectId(product_id))
+    
+    if not product:
+        return {"error": "Product not found"}, {}
+    
+    return {
+        "_id": str(product.id),
+        "id": str(product.id),
+        "name": product.name,
+        "description": product.description,
+        "price": product.price,
+        "category": product.category,
+        "image_url": product.image_url,
+        "imageUrl": product.image_url,
+        "sizes": product.sizes,
+        "colors": product.colors,
+        "rating": 4.5,
+        "reviews": 1234
+    }, {}
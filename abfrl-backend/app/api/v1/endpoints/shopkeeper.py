@@ -2,7 +2,8 @@
 Shopkeeper authentication and management endpoints.
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from typing import Optional
 from datetime import datetime
@@ -11,6 +12,8 @@ from firebase_admin import auth as firebase_auth
 
 from app.models.user import User as UserModel
 from app.models.product import Product as ProductModel
+from app.services import catalog_events, low_stock
+from app.services.product_import import FORMATS, format_for_content_type, import_products
 
 router = APIRouter()
 security = HTTPBearer()
@@ -160,6 +163,7 @@ async def create_product(
     )
     
     await product.insert()
+    catalog_events.notify_product_saved(product)
     
     return {
         "message": "Product created successfully",
@@ -172,6 +176,27 @@ async def create_product(
     }
 
 
+@router.post("/products/import")
+async def import_products_shopkeeper(
+    request: Request,
+    format: Optional[str] = Query(None, description="ndjson or csv; defaults to the Content-Type"),
+    current_shopkeeper = Depends(get_current_shopkeeper)
+):
+    """
+    Bulk-create listings from an NDJSON or CSV request body, streamed.
+    Imported products await admin approval like single listings.
+    """
+    file_format = format or format_for_content_type(request.headers.get("content-type"))
+    if file_format not in FORMATS:
+        raise HTTPException(status_code=415, detail="Send application/x-ndjson or text/csv")
+    owner = {
+        "shopkeeper_id": current_shopkeeper["uid"],
+        "shopkeeper_name": current_shopkeeper.get("name", ""),
+        "is_verified": False,
+    }
+    return await import_products(request.stream(), file_format, owner)
+
+
 @router.put("/products/{product_id}")
 async def update_product(
     product_id: int,
@@ -196,6 +221,7 @@ async def update_product(
             setattr(product, field, product_data[field])
     
     await product.save()
+    catalog_events.notify_product_saved(product)
     
     return {
         "message": "Product updated successfully",
@@ -224,6 +250,7 @@ async def delete_product(
         raise HTTPException(status_code=403, detail="Not authorized to delete this product")
     
     await product.delete()
+    catalog_events.notify_product_deleted(product.id)
     
     return {"message": "Product deleted successfully"}
 
@@ -252,3 +279,23 @@ async def get_dashboard_stats(
         "pending_products": pending_products,
         "shop_name": current_shopkeeper.shop_name or "Not set"
     }
+
+
+@router.get("/inventory/low-stock")
+async def get_low_stock_products(
+    limit: int = Query(100, ge=1, le=1000),
+    current_shopkeeper = Depends(get_current_shopkeeper)
+):
+    """Get this shopkeeper's products at or below their reorder threshold."""
+    return await low_stock.low_stock_products(current_shopkeeper["uid"], limit)
+
+
+@router.get("/inventory/alerts")
+async def stream_low_stock_alerts(
+    current_shopkeeper = Depends(get_current_shopkeeper)
+):
+    """Stream low-stock alerts for this shopkeeper's products as Server-Sent Events."""
+    return StreamingResponse(
+        low_stock.low_stock_alerts.events(current_shopkeeper["uid"]),
+        media_type="text/event-stream"
+    )
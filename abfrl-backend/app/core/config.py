@@ -1,4 +1,3 @@
-from typing import Optional
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class Settings(BaseSettings):
@@ -13,12 +12,44 @@ class Settings(BaseSettings):
     SECRET_KEY: str = "development_secret_key"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 8 
     
+    # Serialized catalog responses kept per process (see services/catalog_cache.py)
+    CATALOG_CACHE_MAX_ENTRIES: int = 256
+    CATALOG_CACHE_MAX_AGE_SECONDS: int = 300  # entries are rebuilt after this, whatever the version says
+    CATALOG_VERSION_CHECK_SECONDS: float = 1.0  # how often the shared catalog version is read
+    
+    # Discount codes are served from an in-process snapshot refreshed this often
+    DISCOUNT_CACHE_TTL_SECONDS: int = 300
+    
+    # Checkout stock holds (see services/inventory.py); longer than the 15 minute payment window
+    STOCK_HOLD_MINUTES: int = 20
+    STOCK_HOLD_SWEEP_SECONDS: int = 60  # how often lapsed holds are given back
+    
+    # Idempotent checkout (see services/idempotency.py)
+    IDEMPOTENCY_WAIT_SECONDS: float = 10.0  # how long a retry waits for the original request to finish
+    IDEMPOTENCY_LOCK_SECONDS: int = 120  # an unfinished request older than this is taken over
+    
+    # Reorder thresholds when a product or store sets none (see services/low_stock.py)
+    LOW_STOCK_THRESHOLD: int = 10  # product stock across all stores
+    STORE_LOW_STOCK_THRESHOLD: int = 2  # one size at one store
+    
     # AI - Gemini
     GOOGLE_API_KEY: str
+    LLM_MAX_CONCURRENCY: int = 8  # Gemini calls in flight per process
+    LLM_MAX_QUEUE_DEPTH: int = 32  # callers allowed to wait for a slot before shedding load
+    
+    # In-process vector search (see services/vector_store.py)
+    VECTOR_DIM: int = 512
+    VECTOR_MIN_SCORE: float = 0.15  # cosine below this is hash-collision noise, not a match
+    VECTOR_ANN_MIN_ITEMS: int = 20000  # catalogs this large also get an approximate (IVF) index
+    VECTOR_ANN_NPROBE: int = 8  # IVF clusters scanned per query
+    EMBEDDING_STORE_DIR: str = "data/embeddings"  # precomputed vectors shared by all workers
+    EMBEDDING_STORE_POLL_SECONDS: int = 30  # how often workers look for a new version
+    EMBEDDING_PIPELINE_INTERVAL_SECONDS: int = 600  # in-app incremental runs; 0 leaves it to cron
     
-    # Vector DB
-    QDRANT_URL: str = "http://localhost:6333"
-    QDRANT_API_KEY: Optional[str] = None
+    # "Frequently bought together" (see services/copurchase.py)
+    COPURCHASE_DIR: str = "data/copurchase"
+    COPURCHASE_TOP_N: int = 20  # neighbours kept per product
+    COPURCHASE_RELOAD_SECONDS: int = 60  # how often workers check for a newer job output
 
     model_config = SettingsConfigDict(env_file=".env", case_sensitive=True, extra='ignore')
 
@@ -6,18 +6,47 @@ from app.models.product import Product
 from app.models.cart import Cart, DiscountCode, PaymentMethod
 from app.models.order import Order
 from app.models.chat import ChatSession
+from app.models.inventory import StockReservation, StoreInventory
+from app.models.store import Store
+from app.models.idempotency import IdempotencyRecord
+from app.models.payment import PaymentSession
+
+DOCUMENT_MODELS = [
+    User,
+    Product,
+    Cart,
+    DiscountCode,
+    PaymentMethod,
+    Order,
+    ChatSession,
+    StockReservation,
+    StoreInventory,
+    Store,
+    IdempotencyRecord,
+    PaymentSession
+]
+
+async def backfill_product_listing_fields():
+    """Fill sizes/colors on products written before they were denormalized (one server-side update)"""
+    await Product.get_motor_collection().update_many(
+        {"sizes": {"$exists": False}},
+        [{"$set": {
+            "sizes": {"$setUnion": [{"$ifNull": ["$inventory.size", []]}, []]},
+            "colors": {"$ifNull": ["$metadata_info.colors", []]},
+        }}]
+    )
+
+async def drop_reservation_expiry_ttl():
+    """The reservations' TTL index used to be on expires_at, which deleted holds the sweeper had not released yet"""
+    collection = StockReservation.get_motor_collection()
+    if "expires_at_1" in await collection.index_information():
+        await collection.drop_index("expires_at_1")
 
 async def init_db():
     client = AsyncIOMotorClient(settings.MONGODB_URL)
     await init_beanie(
         database=client[settings.DATABASE_NAME],
-        document_models=[
-            User,
-            Product,
-            Cart,
-            DiscountCode,
-            PaymentMethod,
-            Order,
-            ChatSession
-        ]
+        document_models=DOCUMENT_MODELS
     )
+    await backfill_product_listing_fields()
+    await drop_reservation_expiry_ttl()
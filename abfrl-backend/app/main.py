@@ -1,3 +1,4 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 import firebase_admin
@@ -5,17 +6,43 @@ from firebase_admin import credentials
 from app.core.config import settings
 from app.api.v1.api import api_router
 from app.db.mongodb import init_db
+from app.agents.registry import agent_registry
+from app.services.catalog_index import catalog_index
+from app.services.discount_cache import discount_cache
+from app.services.vector_store import vector_store
+from app.services.embedding_store import embedding_pipeline
+from app.services.copurchase import copurchase_index
+from app.services.search_index import search_index
+from app.services.autocomplete import autocomplete_index
+from app.services.facets import facet_index
+from app.services.inventory import reservation_sweeper
+from app.services import store_inventory
+from app.services.stores import store_locator
+from app.services import low_stock
 import os
 
-app = FastAPI(
-    title=settings.PROJECT_NAME,
-    version="1.0.0",
-    description="ABFRL Conversational Sales Agent Backend"
-)
-
-@app.on_event("startup")
-async def on_startup():
+async def on_startup(app: FastAPI):
     await init_db()
+    await catalog_index.ensure_loaded()
+    await search_index.ensure_loaded()
+    await facet_index.ensure_loaded()
+    await store_inventory.ensure_built()
+    store_inventory.store_inventory_sync.start()
+    await low_stock.ensure_flagged()
+    low_stock.low_stock_detector.start()
+    await store_locator.ensure_loaded()
+    await vector_store.ensure_loaded()
+    vector_store.start()
+    embedding_pipeline.start()
+    copurchase_index.load()
+    await autocomplete_index.ensure_loaded()
+    await discount_cache.refresh()
+    discount_cache.start()
+    reservation_sweeper.start()
+
+    # Build the shared agents once; chat endpoints get them via a dependency
+    agent_registry.start()
+    app.state.agent_registry = agent_registry
     
     # Initialize Firebase Admin SDK
     try:
@@ -48,6 +75,25 @@ async def on_startup():
             print("━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━")
             print()
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await on_startup(app)
+    yield
+    await discount_cache.stop()
+    await reservation_sweeper.stop()
+    await store_inventory.store_inventory_sync.stop()
+    await low_stock.low_stock_detector.stop()
+    await vector_store.stop()
+    await embedding_pipeline.stop()
+    agent_registry.shutdown()
+
+app = FastAPI(
+    title=settings.PROJECT_NAME,
+    version="1.0.0",
+    description="ABFRL Conversational Sales Agent Backend",
+    lifespan=lifespan
+)
+
 # CORS Configuration
 origins = ["*"] # Allow all for Hackathon/MVP
 
@@ -57,6 +103,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Include centralized API router
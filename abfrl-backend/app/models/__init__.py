@@ -5,7 +5,13 @@ from app.models.user import User
 from app.models.order import Order, OrderItem
 from app.models.chat import ChatSession, Message
 from app.models.cart import Cart, CartItem, DiscountCode, PaymentMethod
+from app.models.inventory import StockReservation, ReservedItem, StoreInventory
+from app.models.store import Store, GeoPoint
+from app.models.idempotency import IdempotencyRecord
+from app.models.payment import PaymentSession
 
 # Export all models
 __all__ = ["Product", "Inventory", "User", "Order", "OrderItem", 
-           "ChatSession", "Message", "Cart", "CartItem", "DiscountCode", "PaymentMethod"]
+           "ChatSession", "Message", "Cart", "CartItem", "DiscountCode", "PaymentMethod",
+           "StockReservation", "ReservedItem", "StoreInventory", "Store", "GeoPoint",
+           "IdempotencyRecord", "PaymentSession"]
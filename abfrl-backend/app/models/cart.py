@@ -8,10 +8,14 @@ class CartItem(BaseModel):
     product_id: str  # Store as string ID
     quantity: int = 1
     size: Optional[str] = None
-    # We can optionally store product snapshot here if needed
+    # Snapshot of the product at add time; reused for pricing while product_version is current
+    name: Optional[str] = None
+    price: Optional[float] = None
+    image_url: Optional[str] = None
+    product_version: Optional[int] = None
 
 class Cart(Document):
-    user_id: Indexed(str)
+    user_id: Indexed(str, unique=True)  # One cart per user; cart upserts rely on it
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
     applied_discount_code: Optional[str] = None
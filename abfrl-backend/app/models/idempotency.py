@@ -0,0 +1,22 @@
+from datetime import datetime
+from typing import Optional
+from beanie import Document
+from pydantic import Field
+from pymongo import ASCENDING, IndexModel
+
+# Keys are remembered this long; later retries still find the order by its payment reference
+IDEMPOTENCY_RETENTION_SECONDS = 24 * 60 * 60
+
+class IdempotencyRecord(Document):
+    """The outcome of one idempotent request; see services/idempotency.py."""
+    id: Optional[str] = None  # "<scope>:<idempotency key>", so each key is claimed once
+    fingerprint: str  # hash of the request body; a key may not be reused for a different request
+    status: str = "in_progress"  # in_progress, done
+    response: Optional[dict] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+    class Settings:
+        name = "idempotency_keys"
+        indexes = [
+            IndexModel([("created_at", ASCENDING)], expireAfterSeconds=IDEMPOTENCY_RETENTION_SECONDS),
+        ]
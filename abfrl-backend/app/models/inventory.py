@@ -0,0 +1,65 @@
+from datetime import datetime
+from typing import List, Optional
+from beanie import Document, Indexed
+from pydantic import BaseModel, Field
+from pymongo import ASCENDING, IndexModel
+
+# The TTL monitor deletes committed and released reservations this long after
+# they closed. Held ones have no closed_at and are kept until the sweeper
+# releases them, however long the app was down.
+RESERVATION_RETENTION_SECONDS = 60 * 60
+
+class ReservedItem(BaseModel):
+    product_id: str
+    quantity: int
+
+class StockReservation(Document):
+    """Stock held for one checkout while its payment is pending."""
+    reservation_id: Indexed(str, unique=True)  # the payment session id
+    user_id: Optional[str] = None
+    items: List[ReservedItem] = []
+    status: str = "held"  # held, committed (order placed), released (abandoned or expired)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    expires_at: datetime
+    closed_at: Optional[datetime] = None  # when committed or released
+
+    class Settings:
+        name = "stock_reservations"
+        indexes = [
+            IndexModel([("closed_at", ASCENDING)], expireAfterSeconds=RESERVATION_RETENTION_SECONDS),
+            # The sweeper's query for lapsed holds
+            IndexModel([("status", ASCENDING), ("expires_at", ASCENDING)]),
+        ]
+
+# Index names, so availability queries can hint the index that covers them
+PRODUCT_AVAILABILITY_INDEX = "product_store_size_quantity"
+STORE_AVAILABILITY_INDEX = "store_size_quantity_product"
+STORE_LOW_STOCK_INDEX = "low_stock_store_product"
+
+class StoreInventory(Document):
+    """One (product, store, size) entry of Product.inventory; see services/store_inventory.py."""
+    id: Optional[str] = None  # "<product_id>|<store_location>|<size>", so each entry exists once
+    product_id: str
+    store_location: str
+    size: str
+    quantity: int = 0
+    low_stock: bool = False  # quantity at or below the store's reorder threshold
+
+    class Settings:
+        name = "store_inventory"
+        # Each index ends in the fields its queries return, so they are answered from the index alone
+        indexes = [
+            IndexModel(
+                [("product_id", ASCENDING), ("store_location", ASCENDING), ("size", ASCENDING), ("quantity", ASCENDING)],
+                name=PRODUCT_AVAILABILITY_INDEX,
+            ),
+            IndexModel(
+                [("store_location", ASCENDING), ("size", ASCENDING), ("quantity", ASCENDING), ("product_id", ASCENDING)],
+                name=STORE_AVAILABILITY_INDEX,
+            ),
+            IndexModel(
+                [("low_stock", ASCENDING), ("store_location", ASCENDING), ("product_id", ASCENDING)],
+                name=STORE_LOW_STOCK_INDEX,
+                partialFilterExpression={"low_stock": True},
+            ),
+        ]
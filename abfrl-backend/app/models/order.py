@@ -2,6 +2,7 @@ from typing import List, Optional
 from datetime import datetime
 from beanie import Document, Indexed
 from pydantic import BaseModel, Field
+from pymongo import ASCENDING, IndexModel
 
 class OrderItem(BaseModel):
     product_id: str
@@ -10,6 +11,8 @@ class OrderItem(BaseModel):
     price: float  # Store price at time of purchase
     size: Optional[str] = None
 
+PAYMENT_REFERENCE_INDEX = "unique_payment_reference"
+
 class Order(Document):
     user_id: Indexed(str)
     total_amount: float
@@ -43,4 +46,15 @@ class Order(Document):
     notes: Optional[str] = None
 
     class Settings:
-        name = "orders"
\ No newline at end of file
+        name = "orders"
+        indexes = [
+            # Incremental jobs (e.g. co-purchase counts) resume from the last (created_at, _id) they saw
+            IndexModel([("created_at", ASCENDING), ("_id", ASCENDING)]),
+            # One order per payment; orders without one (e.g. seeded history) are not indexed
+            IndexModel(
+                [("razorpay_order_id", ASCENDING)],
+                name=PAYMENT_REFERENCE_INDEX,
+                unique=True,
+                partialFilterExpression={"razorpay_order_id": {"$type": "string"}},
+            ),
+        ]
\ No newline at end of file
@@ -0,0 +1,20 @@
+from datetime import datetime
+from typing import Optional
+from beanie import Document
+from pydantic import Field
+
+class PaymentSession(Document):
+    """One mock UPI payment; checkout only places orders for SUCCESS ones."""
+    id: Optional[str] = None  # the payment id, shared with the stock reservation and the order
+    user_id: str
+    amount: float  # the server-priced cart total when the payment was started
+    discount_code: Optional[str] = None
+    status: str = "PENDING"  # PENDING, SUCCESS, EXPIRED
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    expires_at: datetime
+    confirmed_at: Optional[datetime] = None
+    transaction_id: Optional[str] = None
+    cart_summary: Optional[dict] = None
+
+    class Settings:
+        name = "payment_sessions"
@@ -1,12 +1,16 @@
 from typing import List, Optional
-from beanie import Document, Indexed, Link
+from beanie import Document, Indexed, Link, PydanticObjectId, before_event, Insert, Replace, Save
 from pydantic import BaseModel, Field
+from pymongo import ASCENDING, IndexModel
 
 class Inventory(BaseModel):
     store_location: str
     size: str
     quantity: int = 0
 
+# Partial index over products flagged low on stock; see services/low_stock.py
+LOW_STOCK_INDEX = "low_stock_shopkeeper"
+
 class Product(Document):
     name: Indexed(str)
     description: Optional[str] = None
@@ -14,6 +18,7 @@ class Product(Document):
     category: Indexed(str)
     image_url: Optional[str] = None
     stock: int = 0
+    reorder_threshold: Optional[int] = None  # low stock at or below this; None uses LOW_STOCK_THRESHOLD
     metadata_info: dict = {}
     inventory: List[Inventory] = []
     
@@ -22,5 +27,42 @@ class Product(Document):
     shopkeeper_name: Optional[str] = None  # Shop name for display
     is_verified: bool = False  # Admin can verify shopkeeper products
 
+    # Bumped on every save so cached snapshots (e.g. cart lines) can tell they are stale
+    version: int = 0
+
+    # Derived from inventory / metadata_info on every write so listings need no per-product work
+    sizes: List[str] = []
+    colors: List[str] = []
+
+    @before_event(Save, Replace)
+    def bump_version(self):
+        self.version += 1
+
+    @before_event(Insert, Save, Replace)
+    def denormalize_listing_fields(self):
+        self.sizes = sorted({inv.size for inv in self.inventory})
+        self.colors = list((self.metadata_info or {}).get("colors", []))
+
     class Settings:
         name = "products"
+        # Listing filters; keyset pagination orders by _id
+        indexes = [
+            IndexModel([("category", ASCENDING), ("_id", ASCENDING)]),
+            IndexModel([("category", ASCENDING), ("price", ASCENDING)]),
+            IndexModel([("sizes", ASCENDING), ("_id", ASCENDING)]),
+            IndexModel([("price", ASCENDING)]),
+            # Only flagged products are indexed, so low-stock counts read a handful of keys
+            IndexModel(
+                [("low_stock", ASCENDING), ("shopkeeper_id", ASCENDING)],
+                name=LOW_STOCK_INDEX,
+                partialFilterExpression={"low_stock": True},
+            ),
+        ]
+
+class ProductPricingView(BaseModel):
+    """Projection with only the fields cart pricing needs."""
+    id: PydanticObjectId = Field(alias="_id")
+    name: str
+    price: float
+    image_url: Optional[str] = None
+    version: int = 0
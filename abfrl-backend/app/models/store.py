@@ -0,0 +1,22 @@
+from typing import List, Optional
+from beanie import Document, Indexed
+from pydantic import BaseModel
+from pymongo import GEOSPHERE, IndexModel
+
+class GeoPoint(BaseModel):
+    """GeoJSON point."""
+    type: str = "Point"
+    coordinates: List[float]  # [longitude, latitude]
+
+class Store(Document):
+    name: Indexed(str, unique=True)  # the store_location used by product inventory
+    location: Optional[str] = None  # area or address, for display
+    city: Optional[str] = None
+    geo: Optional[GeoPoint] = None
+    reorder_threshold: Optional[int] = None  # per-size stock at or below this is low; None uses STORE_LOW_STOCK_THRESHOLD
+
+    class Settings:
+        name = "stores"
+        indexes = [
+            IndexModel([("geo", GEOSPHERE)]),
+        ]
@@ -1,5 +1,6 @@
 from pydantic import BaseModel
 from typing import List, Optional
+from datetime import datetime
 
 class CartItemSchema(BaseModel):
     id: Optional[str] = None
@@ -25,6 +26,8 @@ class DiscountCodeSchema(BaseModel):
     code: str
     discount_percent: float
     min_purchase: float
+    active: bool = True
+    valid_until: Optional[datetime] = None
 
     class Config:
         from_attributes = True
@@ -1,11 +1,16 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional, Any, Dict
 
 class ChatRequest(BaseModel):
     user_id: str
     message: str
-    channel: str = "web" # web, telegram, kiosk
+    channel: str = "web" # web, telegram, kiosk, mobile
     session_id: Optional[str] = None
+    # Where the shopper is, for "nearest store" answers: coordinates from a
+    # mobile app, or the store a kiosk stands in
+    latitude: Optional[float] = Field(None, ge=-90, le=90)
+    longitude: Optional[float] = Field(None, ge=-180, le=180)
+    store: Optional[str] = None
 
 class ProductCard(BaseModel):
     id: int
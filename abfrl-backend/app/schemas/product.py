@@ -2,7 +2,11 @@
 Pydantic schemas for products.
 """
 
-from pydantic import BaseModel
+from typing import List, Optional
+
+from pydantic import BaseModel, Field, field_validator
+
+from ..models.product import Inventory
 
 
 class ProductBase(BaseModel):
@@ -30,4 +34,33 @@ class Product(ProductBase):
     id: int
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class ProductImportRow(BaseModel):
+    """
+    One row of a bulk product import (NDJSON object or CSV record).
+    """
+    name: str = Field(min_length=1)
+    description: Optional[str] = None
+    price: float = Field(ge=0)
+    category: str = "General"
+    image_url: Optional[str] = None
+    stock: int = Field(0, ge=0)
+    colors: List[str] = []
+    inventory: List[Inventory] = []
+
+    @field_validator("colors", mode="before")
+    @classmethod
+    def split_colors(cls, value):
+        # CSV cells hold "red|blue"
+        if isinstance(value, str):
+            return [color.strip() for color in value.split("|") if color.strip()]
+        return value
+
+class AvailabilityQuery(BaseModel):
+    product_id: str
+    size: Optional[str] = None
+    store_location: Optional[str] = None
+
+class BulkAvailabilityRequest(BaseModel):
+    queries: List[AvailabilityQuery] = Field(min_length=1, max_length=100)
@@ -0,0 +1,438 @@
+"""
+Prefix autocomplete over product names and categories.
+
+Suggestions are indexed under normalized keys, one per word start of their
+text ("slim fit jeans", "fit jeans", "jeans"), kept in a sorted list. The
+keys with a given prefix form one contiguous range, found with two
+bisects. The best suggestions of a busy prefix (its trie node) are ranked once by
+popularity and stored; the 1-2 character prefixes are ranked up front,
+longer ones on first use. Prefixes matching only a few keys are ranked
+on the fly.
+
+Popularity is the number of orders containing a product, from the
+co-purchase job; a category scores the orders and products it holds. When
+the job writes new counts, everything is rescored and the stored rankings
+rebuilt in a worker thread, then swapped in at once; queries are answered
+from the old rankings meanwhile.
+Catalog writes update the keys and the stored rankings through the catalog
+change hook, so answering a query never touches Mongo.
+"""
+
+import asyncio
+import logging
+import re
+from bisect import bisect_left, bisect_right
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from ..models.product import Product
+from . import catalog_events
+from .copurchase import copurchase_index
+
+logger = logging.getLogger(__name__)
+
+MAX_SUGGESTIONS = 10
+_WARM_PREFIX_LENGTH = 2  # prefixes up to this long are ranked when the index is built
+_MAX_KEY_WORDS = 8  # word starts indexed per suggestion
+_SPARE = 4 * MAX_SUGGESTIONS  # candidates taken from a range before removing duplicates
+
+_HYPHEN_RE = re.compile(r"(?<=[a-z0-9])-(?=[a-z0-9])")
+_NON_WORD_RE = re.compile(r"[^a-z0-9]+")
+
+
+def normalize(text: str) -> str:
+    """
+    Lowercase words separated by single spaces; hyphenated words are joined
+    ("T-Shirt" -> "tshirt").
+    """
+    text = _HYPHEN_RE.sub("", (text or "").lower())
+    return _NON_WORD_RE.sub(" ", text).strip()
+
+
+def _keys(text: str) -> List[str]:
+    words = normalize(text).split()
+    return [" ".join(words[i:]) for i in range(min(len(words), _MAX_KEY_WORDS))]
+
+
+def _rank(ids: List[int], scores: List[float]) -> List[int]:
+    """
+    The best MAX_SUGGESTIONS distinct suggestions among ids (a key range).
+    """
+    candidates = ids
+    # A suggestion can have several keys in the range, so take some spare
+    if len(ids) > _SPARE:
+        values = np.fromiter((scores[s] for s in ids), dtype=np.float64, count=len(ids))
+        threshold = np.partition(values, len(ids) - _SPARE)[len(ids) - _SPARE]
+        # Ties at the threshold are filled in key (alphabetical) order
+        above = np.flatnonzero(values > threshold)
+        tied = np.flatnonzero(values == threshold)[:_SPARE - len(above)]
+        candidates = [ids[i] for i in np.sort(np.concatenate([above, tied]))]
+    # Stable sort: equal scores keep key order
+    ranked = sorted(dict.fromkeys(candidates), key=lambda s: -scores[s])[:MAX_SUGGESTIONS]
+    if len(ranked) < MAX_SUGGESTIONS and len(candidates) < len(ids):
+        ranked = sorted(dict.fromkeys(ids), key=lambda s: -scores[s])[:MAX_SUGGESTIONS]
+    return ranked
+
+
+def _warm_rankings(keys: List[str], key_suggestion: List[int], scores: List[float]) -> Dict[str, List[int]]:
+    """
+    Stored rankings of the busy prefixes up to _WARM_PREFIX_LENGTH characters.
+    """
+    top = {}
+    for prefix in {key[:length] for key in keys for length in range(1, _WARM_PREFIX_LENGTH + 1)}:
+        lo, hi = bisect_left(keys, prefix), bisect_left(keys, prefix + "\uffff")
+        if hi - lo > _SPARE:
+            top[prefix] = _rank(key_suggestion[lo:hi], scores)
+    return top
+
+
+def _rescored(popularity: Dict[str, int], scores: List[float], products: Dict[str, int],
+              categories: List[Tuple[int, List[str]]]) -> List[float]:
+    """
+    Suggestion scores for new order counts (scores is a copy, updated in place).
+    """
+    for product_id, suggestion in products.items():
+        scores[suggestion] = float(popularity.get(product_id, 0))
+    for suggestion, members in categories:
+        scores[suggestion] = float(sum(popularity.get(product_id, 0) + 1 for product_id in members))
+    return scores
+
+
+class AutocompleteIndex:
+    """
+    Sorted keys -> suggestions, with the top MAX_SUGGESTIONS of each
+    queried prefix cached and maintained on writes.
+    """
+
+    def __init__(self) -> None:
+        self._clear()
+        self._popularity: Dict[str, int] = {}
+        self._loaded = False
+        self._lock = asyncio.Lock()
+        self._writes = 0  # catalog writes applied, so a background re-rank can tell it went stale
+        self._refreshing: Optional[Dict[str, int]] = None  # order counts being re-ranked for
+        self._refresher: Optional[asyncio.Task] = None
+
+    def _clear(self) -> None:
+        self._keys: List[str] = []
+        self._key_suggestion: List[int] = []  # suggestion id per key, aligned with _keys
+        # Suggestions by id; removed ids are set to None
+        self._text: List[Optional[str]] = []
+        self._kind: List[str] = []
+        self._ref: List[str] = []
+        self._score: List[float] = []
+        self._product_suggestion: Dict[str, int] = {}
+        self._product_category: Dict[str, str] = {}
+        self._category_suggestion: Dict[str, int] = {}
+        self._category_products: Dict[str, List[str]] = {}
+        # Ranked suggestion ids per prefix (the trie nodes visited so far)
+        self._top: Dict[str, List[int]] = {}
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    async def ensure_loaded(self) -> None:
+        """
+        Index the whole catalog once; later calls are no-ops.
+        """
+        if self._loaded:
+            return
+        async with self._lock:
+            if self._loaded:
+                return
+            docs = await Product.get_motor_collection().find({}, {"name": 1, "category": 1}).to_list(length=None)
+            self.rebuild(docs, copurchase_index.popularity())
+
+    def rebuild(self, products, popularity: Optional[Dict[str, int]] = None) -> None:
+        self._clear()
+        self._popularity = popularity if popularity is not None else {}
+        pairs = []
+        for product in products:
+            for key, suggestion in self._add_product(product):
+                pairs.append((key, suggestion))
+        pairs.sort()
+        self._keys = [key for key, _ in pairs]
+        self._key_suggestion = [suggestion for _, suggestion in pairs]
+        self._warm()
+        self._loaded = True
+
+    def _warm(self) -> None:
+        self._top = _warm_rankings(self._keys, self._key_suggestion, self._score)
+
+    # Suggestions
+
+    def _new_suggestion(self, text: str, kind: str, ref: str, score: float) -> int:
+        self._text.append(text)
+        self._kind.append(kind)
+        self._ref.append(ref)
+        self._score.append(score)
+        return len(self._text) - 1
+
+    def _add_product(self, product) -> List[tuple]:
+        """
+        Register a product (and its category if new) and return the
+        (key, suggestion id) pairs to index; the caller inserts them.
+        """
+        if isinstance(product, dict):
+            product_id, name, category = str(product["_id"]), product.get("name"), product.get("category")
+        else:
+            product_id, name, category = str(product.id), product.name, product.category
+        pairs = []
+        popularity = self._popularity.get(product_id, 0)
+        suggestion = self._new_suggestion(name or "", "product", product_id, float(popularity))
+        self._product_suggestion[product_id] = suggestion
+        pairs.extend((key, suggestion) for key in _keys(name))
+
+        category_key = normalize(category)
+        if category_key:
+            self._product_category[product_id] = category_key
+            members = self._category_products.setdefault(category_key, [])
+            members.append(product_id)
+            category_suggestion = self._category_suggestion.get(category_key)
+            if category_suggestion is None:
+                category_suggestion = self._new_suggestion(category, "category", category_key, 0.0)
+                self._category_suggestion[category_key] = category_suggestion
+                pairs.extend((key, category_suggestion) for key in _keys(category))
+            # Categories rank by the orders of their products, then by size
+            self._score[category_suggestion] += popularity + 1
+        return pairs
+
+    # Ranking
+
+    def _range(self, prefix: str):
+        return bisect_left(self._keys, prefix), bisect_left(self._keys, prefix + "\uffff")
+
+    def _ranked(self, prefix: str) -> List[int]:
+        ranked = self._top.get(prefix)
+        if ranked is None:
+            lo, hi = self._range(prefix)
+            ranked = _rank(self._key_suggestion[lo:hi], self._score)
+            # Small ranges rank in microseconds; only store the busy nodes
+            if hi - lo > _SPARE:
+                self._top[prefix] = ranked
+        return ranked
+
+    def _prefixes(self, suggestion: int):
+        text = self._text[suggestion]
+        for key in _keys(text):
+            for length in range(1, len(key) + 1):
+                yield key[:length]
+
+    def _raised(self, suggestion: int) -> None:
+        """
+        A suggestion is new or scores higher: place it in the stored rankings.
+        """
+        score = self._score[suggestion]
+        for prefix in set(self._prefixes(suggestion)):
+            ranked = self._top.get(prefix)
+            if ranked is None:
+                continue
+            if suggestion in ranked:
+                ranked.remove(suggestion)
+            # A short list holds every suggestion under the prefix
+            if len(ranked) < MAX_SUGGESTIONS or score > self._score[ranked[-1]]:
+                position = 0
+                while position < len(ranked) and self._score[ranked[position]] >= score:
+                    position += 1
+                ranked.insert(position, suggestion)
+                del ranked[MAX_SUGGESTIONS:]
+
+    def _lowered(self, suggestion: int) -> None:
+        """
+        A suggestion is gone or scores lower: re-rank the prefixes showing it on next use.
+        """
+        for prefix in set(self._prefixes(suggestion)):
+            ranked = self._top.get(prefix)
+            if ranked is not None and suggestion in ranked:
+                del self._top[prefix]
+
+    # Catalog change hook
+
+    def _insert_keys(self, pairs) -> None:
+        for key, suggestion in pairs:
+            i = bisect_right(self._keys, key)
+            self._keys.insert(i, key)
+            self._key_suggestion.insert(i, suggestion)
+
+    def _merge_keys(self, pairs) -> None:
+        """
+        Insert sorted (key, suggestion) pairs: the lists are rebuilt from
+        slices of the old ones around each insert position, so the cost is
+        a copy of the lists plus a bisect per pair, not a re-sort.
+        """
+        if not pairs:
+            return
+        # New suggestions have the highest ids, so they go after equal keys
+        positions = [bisect_right(self._keys, key) for key, _ in pairs]
+        keys: List[str] = []
+        key_suggestion: List[int] = []
+        start = 0
+        for position, (key, suggestion) in zip(positions, pairs):
+            keys += self._keys[start:position]
+            key_suggestion += self._key_suggestion[start:position]
+            keys.append(key)
+            key_suggestion.append(suggestion)
+            start = position
+        keys += self._keys[start:]
+        key_suggestion += self._key_suggestion[start:]
+        self._keys, self._key_suggestion = keys, key_suggestion
+
+    def _remove_keys(self, suggestion: int) -> None:
+        for key in _keys(self._text[suggestion]):
+            i = bisect_left(self._keys, key)
+            while i < len(self._keys) and self._keys[i] == key:
+                if self._key_suggestion[i] == suggestion:
+                    del self._keys[i]
+                    del self._key_suggestion[i]
+                    break
+                i += 1
+
+    def _remove_product(self, product_id: str) -> None:
+        suggestion = self._product_suggestion.pop(product_id, None)
+        if suggestion is None:
+            return
+        self._lowered(suggestion)
+        self._remove_keys(suggestion)
+        self._text[suggestion] = None
+
+        category_key = self._product_category.pop(product_id, None)
+        if category_key is not None:
+            category_suggestion = self._category_suggestion[category_key]
+            members = self._category_products[category_key]
+            members.remove(product_id)
+            self._lowered(category_suggestion)
+            if members:
+                self._score[category_suggestion] -= self._popularity.get(product_id, 0) + 1
+            else:
+                self._remove_keys(category_suggestion)
+                self._text[category_suggestion] = None
+                del self._category_suggestion[category_key]
+                del self._category_products[category_key]
+
+    def on_product_saved(self, product: Product) -> None:
+        if not self._loaded:
+            return
+        self._writes += 1
+        self._remove_product(str(product.id))
+        pairs = self._add_product(product)
+        self._insert_keys(pairs)
+        self._raised(self._product_suggestion[str(product.id)])
+        category_key = self._product_category.get(str(product.id))
+        if category_key is not None:
+            self._raised(self._category_suggestion[category_key])
+
+    def on_products_saved(self, products) -> None:
+        """
+        Batch version for bulk imports: the new keys are merged into the
+        sorted lists in one pass instead of one list insert each.
+        """
+        if not self._loaded:
+            return
+        self._writes += 1
+        pairs = []
+        for product in products:
+            self._remove_product(str(product.id))
+            pairs.extend(self._add_product(product))
+        pairs.sort()
+        self._merge_keys(pairs)
+        raised = dict.fromkeys(suggestion for _, suggestion in pairs)
+        for product in products:
+            category_key = self._product_category.get(str(product.id))
+            if category_key is not None:
+                raised[self._category_suggestion[category_key]] = None
+        for suggestion in raised:
+            self._raised(suggestion)
+
+    def on_product_deleted(self, product_id: str) -> None:
+        if self._loaded:
+            self._writes += 1
+            self._remove_product(product_id)
+
+    # Queries
+
+    def _rescore_inputs(self) -> tuple:
+        """
+        Copies of what re-ranking reads, so it can run off the event loop.
+        """
+        categories = [
+            (self._category_suggestion[category_key], list(members))
+            for category_key, members in self._category_products.items()
+        ]
+        return list(self._keys), list(self._key_suggestion), list(self._score), dict(self._product_suggestion), categories
+
+    @staticmethod
+    def _rerank(popularity: Dict[str, int], keys, key_suggestion, scores, products, categories):
+        scores = _rescored(popularity, scores, products, categories)
+        return scores, _warm_rankings(keys, key_suggestion, scores)
+
+    def _refresh_popularity(self, popularity: Dict[str, int]) -> None:
+        """
+        New order counts from the co-purchase job: rescore and re-rank, here and now.
+        """
+        self._score, self._top = self._rerank(popularity, *self._rescore_inputs())
+        self._popularity = popularity
+
+    async def _refresh_in_background(self, popularity: Dict[str, int]) -> None:
+        """
+        Rescore and re-rank in a worker thread; queries keep the current
+        rankings until the new ones are swapped in. Redone if catalog writes
+        landed meanwhile.
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            while self._refreshing is popularity:
+                writes = self._writes
+                scores, top = await loop.run_in_executor(None, self._rerank, popularity, *self._rescore_inputs())
+                if self._refreshing is popularity and writes == self._writes:
+                    self._score, self._top, self._popularity = scores, top, popularity
+                    return
+        except Exception:
+            logger.exception("Re-ranking autocomplete suggestions failed")
+        finally:
+            if self._refreshing is popularity:
+                self._refreshing = None
+
+    def _popularity_changed(self, popularity: Dict[str, int]) -> None:
+        if self._refreshing is popularity:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._refresh_popularity(popularity)  # no event loop to keep free
+            return
+        self._refreshing = popularity
+        self._refresher = loop.create_task(self._refresh_in_background(popularity))
+
+    async def drain(self) -> None:
+        """
+        Wait for a background re-rank to finish.
+        """
+        if self._refresher is not None:
+            await self._refresher
+
+    def suggest(self, query: str, limit: int = MAX_SUGGESTIONS) -> List[dict]:
+        """
+        Best suggestions whose text has a word starting with the query.
+        New order counts are picked up in the background.
+        """
+        popularity = copurchase_index.popularity()
+        if popularity is not self._popularity:
+            self._popularity_changed(popularity)
+
+        prefix = normalize(query)
+        if not prefix:
+            return []
+        ranked = self._ranked(prefix)
+        suggestions = []
+        for suggestion in ranked[:limit]:
+            item = {"text": self._text[suggestion], "type": self._kind[suggestion]}
+            if self._kind[suggestion] == "product":
+                item["id"] = self._ref[suggestion]
+            suggestions.append(item)
+        return suggestions
+
+
+autocomplete_index = AutocompleteIndex()
+catalog_events.register(autocomplete_index)
@@ -1,68 +1,174 @@
-from typing import Optional, Dict, Any
-from app.models.cart import Cart, CartItem, DiscountCode
-from app.models.product import Product
+from typing import Optional, Dict, Any, List
+from app.models.cart import Cart, CartItem
+from app.models.product import Product, ProductPricingView
+from app.services.catalog_index import catalog_index
+from app.services.discount_cache import discount_cache
 from datetime import datetime
 from beanie import PydanticObjectId
+from beanie.operators import In
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+# add_item retries when a concurrent request creates the cart or the line first
+_UPSERT_ATTEMPTS = 5
+
 
 class CartService:
     
     @staticmethod
     async def get_or_create_cart(user_id: str) -> Cart:
-        """Get existing cart or create new one for user"""
-        cart = await Cart.find_one(Cart.user_id == user_id)
-        if not cart:
-            cart = Cart(user_id=user_id)
-            await cart.insert()
-        return cart
+        """Get existing cart or create new one for user (single atomic upsert)"""
+        now = datetime.utcnow()
+        doc = await Cart.get_motor_collection().find_one_and_update(
+            {"user_id": user_id},
+            {"$setOnInsert": {"created_at": now, "updated_at": now, "applied_discount_code": None, "items": []}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        return Cart.model_validate(doc)
+    
+    @staticmethod
+    async def _product_snapshots(product_ids) -> Dict[str, Dict[str, Any]]:
+        """
+        Name/price/image/version per product id. Ids known to the catalog index
+        need no query; the rest are fetched together in one $in query. Unknown
+        or malformed ids are left out.
+        """
+        snapshots: Dict[str, Dict[str, Any]] = {}
+        object_ids = []
+        for product_id in set(product_ids):
+            entry = catalog_index.get(product_id)
+            if entry:
+                snapshots[product_id] = {
+                    "name": entry["name"],
+                    "price": entry["price"],
+                    "image_url": entry["image_url"],
+                    "product_version": catalog_index.version_of(product_id),
+                }
+                continue
+            try:
+                object_ids.append(PydanticObjectId(product_id))
+            except Exception:
+                continue
+
+        if object_ids:
+            products = await Product.find(In(Product.id, object_ids)).project(ProductPricingView).to_list()
+            for product in products:
+                snapshots[str(product.id)] = {
+                    "name": product.name,
+                    "price": product.price,
+                    "image_url": product.image_url,
+                    "product_version": product.version,
+                }
+        return snapshots
+    
+    @staticmethod
+    async def _product_snapshot(product_id: str) -> Optional[Dict[str, Any]]:
+        """Name/price/image/version for a single product"""
+        return (await CartService._product_snapshots([product_id])).get(product_id)
     
     @staticmethod
     async def add_item(user_id: str, product_id: str, quantity: int = 1, size: Optional[str] = None) -> Dict[str, Any]:
         """Add item to cart"""
-        cart = await CartService.get_or_create_cart(user_id)
-        
-        # Check if product exists
-        try:
-            product = await Product.get(PydanticObjectId(product_id))
-        except:
-            product = None
-            
-        if not product:
+        snapshot = await CartService._product_snapshot(product_id)
+        if not snapshot:
             return {"success": False, "message": "Product not found"}
         
-        # Check if item already in cart
-        existing_item = next((item for item in cart.items if item.product_id == product_id and item.size == size), None)
+        collection = Cart.get_motor_collection()
+        line = {"product_id": product_id, "size": size}
         
-        if existing_item:
-            existing_item.quantity += quantity
-        else:
-            cart_item = CartItem(
-                product_id=product_id,
-                quantity=quantity,
-                size=size
+        for _ in range(_UPSERT_ATTEMPTS):
+            now = datetime.utcnow()
+            
+            # Line already in cart: bump its quantity in place
+            updated = await collection.find_one_and_update(
+                {"user_id": user_id, "items": {"$elemMatch": line}},
+                {
+                    "$inc": {"items.$.quantity": quantity},
+                    "$set": {**{f"items.$.{key}": value for key, value in snapshot.items()}, "updated_at": now},
+                },
             )
-            cart.items.append(cart_item)
-        
-        cart.updated_at = datetime.utcnow()
-        await cart.save()
+            if updated:
+                break
+            
+            # New line: push it, creating the cart if needed. If the line or the cart
+            # appeared concurrently, the upsert hits the unique user_id index and we
+            # retry the $inc above.
+            try:
+                await collection.find_one_and_update(
+                    {"user_id": user_id, "items": {"$not": {"$elemMatch": line}}},
+                    {
+                        "$push": {"items": CartItem(product_id=product_id, quantity=quantity, size=size, **snapshot).model_dump()},
+                        "$set": {"updated_at": now},
+                        "$setOnInsert": {"created_at": now, "applied_discount_code": None},
+                    },
+                    upsert=True,
+                )
+                break
+            except DuplicateKeyError:
+                continue
+        else:
+            return {"success": False, "message": "Cart is busy, please try again"}
         
         return {
             "success": True,
-            "message": f"Added {product.name} to cart",
-            "product_name": product.name,
+            "message": f"Added {snapshot['name']} to cart",
+            "product_name": snapshot["name"],
             "quantity": quantity
         }
     
+    @staticmethod
+    async def replace_cart(user_id: str, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Replace the cart contents with the given lines in one write.
+        Each item has product_id, quantity and size. Repeated (product, size)
+        lines are merged as add_item would. Returns one add_item-style result
+        per input item.
+        """
+        snapshots = await CartService._product_snapshots([item["product_id"] for item in items])
+        
+        lines: Dict[tuple, CartItem] = {}
+        results = []
+        for item in items:
+            product_id, quantity, size = item["product_id"], item.get("quantity", 1), item.get("size")
+            snapshot = snapshots.get(product_id)
+            if not snapshot:
+                results.append({"success": False, "message": "Product not found"})
+                continue
+            
+            line = lines.get((product_id, size))
+            if line:
+                line.quantity += quantity
+            else:
+                lines[(product_id, size)] = CartItem(product_id=product_id, quantity=quantity, size=size, **snapshot)
+            results.append({
+                "success": True,
+                "message": f"Added {snapshot['name']} to cart",
+                "product_name": snapshot["name"],
+                "quantity": quantity
+            })
+        
+        now = datetime.utcnow()
+        await Cart.get_motor_collection().find_one_and_update(
+            {"user_id": user_id},
+            {
+                "$set": {"items": [line.model_dump() for line in lines.values()], "updated_at": now},
+                "$setOnInsert": {"created_at": now, "applied_discount_code": None},
+            },
+            upsert=True,
+        )
+        return results
+    
     @staticmethod
     async def remove_item(user_id: str, product_id: str, size: Optional[str] = None) -> Dict[str, Any]:
         """Remove item from cart"""
-        cart = await CartService.get_or_create_cart(user_id)
-        
-        initial_count = len(cart.items)
-        cart.items = [item for item in cart.items if not (item.product_id == product_id and item.size == size)]
+        line = {"product_id": product_id, "size": size}
+        updated = await Cart.get_motor_collection().find_one_and_update(
+            {"user_id": user_id, "items": {"$elemMatch": line}},
+            {"$pull": {"items": line}, "$set": {"updated_at": datetime.utcnow()}},
+        )
         
-        if len(cart.items) < initial_count:
-            cart.updated_at = datetime.utcnow()
-            await cart.save()
+        if updated:
             return {"success": True, "message": "Removed item from cart"}
         
         return {"success": False, "message": "Item not found in cart"}
@@ -70,22 +176,66 @@ class CartService:
     @staticmethod
     async def update_quantity(user_id: str, product_id: str, quantity: int, size: Optional[str] = None) -> Dict[str, Any]:
         """Update item quantity"""
-        cart = await CartService.get_or_create_cart(user_id)
+        if quantity <= 0:
+            result = await CartService.remove_item(user_id, product_id, size)
+            if result["success"]:
+                return result
+            return {"success": False, "message": "Item not found in cart"}
         
-        existing_item = next((item for item in cart.items if item.product_id == product_id and item.size == size), None)
+        line = {"product_id": product_id, "size": size}
+        updated = await Cart.get_motor_collection().find_one_and_update(
+            {"user_id": user_id, "items": {"$elemMatch": line}},
+            {"$set": {"items.$.quantity": quantity, "updated_at": datetime.utcnow()}},
+        )
         
-        if existing_item:
-            if quantity <= 0:
-                return await CartService.remove_item(user_id, product_id, size)
-            existing_item.quantity = quantity
-            cart.updated_at = datetime.utcnow()
-            await cart.save()
+        if updated:
             return {"success": True, "message": f"Updated quantity to {quantity}"}
         
         return {"success": False, "message": "Item not found in cart"}
     
     @staticmethod
-    async def get_cart_summary(user_id: str, discount_code: Optional[str] = None) -> Dict[str, Any]:
+    async def apply_discount_code(user_id: str, code: Optional[str]) -> None:
+        """Store the discount code on the cart without rewriting its items"""
+        await Cart.get_motor_collection().find_one_and_update(
+            {"user_id": user_id},
+            {"$set": {"applied_discount_code": code, "updated_at": datetime.utcnow()}},
+        )
+    
+    @staticmethod
+    async def _price_items(items, use_snapshots: bool = True) -> Dict[str, Dict[str, Any]]:
+        """
+        Current name/price/image for each cart line's product, keyed by product id.
+        Lines whose snapshot matches the catalog's product version are priced from
+        the snapshot; the rest are fetched together in one $in query.
+        """
+        priced: Dict[str, Dict[str, Any]] = {}
+        missing = set()
+        for item in items:
+            if (
+                use_snapshots
+                and item.price is not None
+                and item.product_version is not None
+                and catalog_index.version_of(item.product_id) == item.product_version
+            ):
+                priced[item.product_id] = {"name": item.name, "price": item.price, "image_url": item.image_url}
+            else:
+                missing.add(item.product_id)
+
+        object_ids = []
+        for product_id in missing:
+            try:
+                object_ids.append(PydanticObjectId(product_id))
+            except Exception:
+                continue
+
+        if object_ids:
+            products = await Product.find(In(Product.id, object_ids)).project(ProductPricingView).to_list()
+            for product in products:
+                priced[str(product.id)] = {"name": product.name, "price": product.price, "image_url": product.image_url}
+        return priced
+
+    @staticmethod
+    async def get_cart_summary(user_id: str, discount_code: Optional[str] = None, use_snapshots: bool = True) -> Dict[str, Any]:
         cart = await CartService.get_or_create_cart(user_id)
         
         # Use stored discount code if not provided
@@ -94,24 +244,22 @@ class CartService:
             
         subtotal = 0
         items_details = []
+        priced = await CartService._price_items(cart.items, use_snapshots)
         
         for item in cart.items:
-            try:
-                product = await Product.get(PydanticObjectId(item.product_id))
-                if product:
-                    item_total = product.price * item.quantity
-                    subtotal += item_total
-                    items_details.append({
-                        "id": item.product_id,
-                        "name": product.name,
-                        "price": product.price,
-                        "quantity": item.quantity,
-                        "size": item.size,
-                        "image_url": product.image_url,
-                        "total": item_total
-                    })
-            except:
-                continue
+            product = priced.get(item.product_id)
+            if product:
+                item_total = product["price"] * item.quantity
+                subtotal += item_total
+                items_details.append({
+                    "id": item.product_id,
+                    "name": product["name"],
+                    "price": product["price"],
+                    "quantity": item.quantity,
+                    "size": item.size,
+                    "image_url": product["image_url"],
+                    "total": item_total
+                })
                 
         shipping = 0 if subtotal > 1000 else 100
         discount_amount = 0
@@ -132,105 +280,10 @@ class CartService:
             "discount_code": discount_code if discount_amount > 0 else None
         }
 
-    @staticmethod
-    async def validate_discount_code(code: str, subtotal: float) -> Dict[str, Any]:
-        discount = await DiscountCode.find_one(DiscountCode.code == code, DiscountCode.active == True)
-        
-        if not discount:
-            return {"valid": False, "message": "Invalid discount code", "discount_amount": 0}
-            
-        if discount.valid_until and discount.valid_until < datetime.utcnow():
-            return {"valid": False, "message": "Discount code expired", "discount_amount": 0}
-            
-        if subtotal < discount.min_purchase:
-            return {"valid": False, "message": f"Minimum purchase of {discount.min_purchase} required", "discount_amount": 0}
-            
-        discount_amount = (subtotal * discount.discount_percent) / 100
-        return {"valid": True, "message": "Discount applied", "discount_amount": discount_amount}
-    
-    @staticmethod
-    async def clear_cart(user_id: str) -> bool:
-        cart = await CartService.get_or_create_cart(user_id)
-        cart.items = []
-        cart.applied_discount_code = None
-        cart.updated_at = datetime.utcnow()
-        await cart.save()
-        return True
-
-        """Get complete cart summary with pricing"""
-        cart = CartService.get_or_create_cart(db, user_id)
-        
-        items = []
-        subtotal = 0.0
-        
-        for cart_item in cart.items:
-            product = cart_item.product
-            item_total = product.price * cart_item.quantity
-            subtotal += item_total
-            
-            items.append({
-                "id": cart_item.id,
-                "product_id": product.id,
-                "product_name": product.name,
-                "quantity": cart_item.quantity,
-                "price": product.price,
-                "size": cart_item.size,
-                "image_url": product.image_url,
-                "item_total": item_total
-            })
-        
-        # Calculate shipping
-        shipping = 5.0 if subtotal > 0 else 0.0
-        if subtotal > 5000:
-            shipping = 0.0  # Free shipping above ₹5000
-        
-        # Apply discount
-        discount = 0.0
-        discount_applied = None
-        
-        # Check if discount code is passed OR if it's stored in the cart
-        code_to_check = discount_code
-        if not code_to_check and hasattr(cart, 'applied_discount_code') and cart.applied_discount_code:
-            code_to_check = cart.applied_discount_code
-            
-        if code_to_check:
-            discount_obj = db.query(DiscountCode).filter(
-                DiscountCode.code == code_to_check.upper(),
-                DiscountCode.active == True
-            ).first()
-            
-            if discount_obj:
-                if subtotal >= discount_obj.min_purchase:
-                    discount = subtotal * (discount_obj.discount_percent / 100)
-                    discount_applied = code_to_check.upper()
-        
-        total = subtotal + shipping - discount
-        
-        return {
-            "items": items,
-            "subtotal": round(subtotal, 2),
-            "shipping": round(shipping, 2),
-            "discount": round(discount, 2),
-            "total": round(total, 2),
-            "discount_code": discount_applied,
-            "item_count": len(items)
-        }
-    
-    @staticmethod
-    async def clear_cart(user_id: str) -> bool:
-        """Clear all items from cart"""
-        cart = await CartService.get_or_create_cart(user_id)
-        cart.items = []
-        await cart.save()
-        return True
-    
     @staticmethod
     async def validate_discount_code(code: str, subtotal: float) -> Dict[str, Any]:
         """Validate discount code"""
-        discount_obj = await DiscountCode.find_one(
-            DiscountCode.code == code.upper(),
-            DiscountCode.active == True
-        )
+        discount_obj = await discount_cache.get(code)
         
         if not discount_obj:
             return {"valid": False, "message": "Invalid discount code"}
@@ -248,3 +301,14 @@ class CartService:
             "discount_amount": round(discount_amount, 2),
             "message": f"{discount_obj.discount_percent}% discount applied!"
         }
+    
+    @staticmethod
+    async def clear_cart(user_id: str) -> bool:
+        """Clear all items from cart"""
+        now = datetime.utcnow()
+        await Cart.get_motor_collection().find_one_and_update(
+            {"user_id": user_id},
+            {"$set": {"items": [], "updated_at": now}, "$setOnInsert": {"created_at": now, "applied_discount_code": None}},
+            upsert=True,
+        )
+        return True
@@ -0,0 +1,200 @@
+"""
+Response cache for the public catalog endpoints.
+
+Serialized JSON bodies are kept in a bounded LRU keyed by (version, path,
+query), so a repeat request is answered without touching Mongo or
+re-serializing. Each body carries a strong ETag so clients can revalidate
+with If-None-Match and get a 304.
+
+The local version is bumped by the catalog change hook on every product
+write in this process. Every such write also increments a shared counter
+document in Mongo, as do scripts that write products directly (the seed
+script calls publish_change). Requests read that counter at most every
+CATALOG_VERSION_CHECK_SECONDS and drop the cache when it moved, so writes
+from other workers or scripts are served within that delay. Entries older
+than CATALOG_CACHE_MAX_AGE_SECONDS are rebuilt regardless.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Dict, NamedTuple, Optional, Set, Tuple
+
+from pymongo import ReturnDocument
+from pymongo.errors import PyMongoError
+
+from app.core.config import settings
+from ..models.product import Product
+from . import catalog_events
+
+logger = logging.getLogger(__name__)
+
+CacheKey = Tuple[int, str, str]
+
+VERSION_COLLECTION = "catalog_version"
+VERSION_ID = "catalog"
+
+
+class CachedResponse(NamedTuple):
+    body: bytes
+    etag: str
+    headers: Dict[str, str]
+
+
+def _serialize(payload) -> bytes:
+    # Same encoding as FastAPI's JSONResponse
+    return json.dumps(payload, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    If-None-Match check (weak comparison, as RFC 9110 requires for it).
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+def _version_collection():
+    return Product.get_motor_collection().database[VERSION_COLLECTION]
+
+
+async def publish_change() -> int:
+    """
+    Increment the shared catalog version, so every process drops its cached
+    responses. Call after writing products without the catalog change hook.
+    """
+    doc = await _version_collection().find_one_and_update(
+        {"_id": VERSION_ID}, {"$inc": {"version": 1}}, upsert=True, return_document=ReturnDocument.AFTER
+    )
+    return doc["version"]
+
+
+class CatalogResponseCache:
+    """
+    Bounded LRU of serialized catalog responses, invalidated by catalog version.
+    """
+
+    def __init__(self, max_entries: int, max_age_seconds: float = 300.0, check_seconds: float = 1.0) -> None:
+        self.max_entries = max_entries
+        self.max_age_seconds = max_age_seconds
+        self.check_seconds = check_seconds
+        self.version = 0
+        self._entries: "OrderedDict[CacheKey, Tuple[float, CachedResponse]]" = OrderedDict()
+        self._shared_version: Optional[int] = None
+        self._checked_at: Optional[float] = None
+        self._publishing: Set[asyncio.Task] = set()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def key(self, path: str, query: str) -> CacheKey:
+        return (self.version, path, query)
+
+    async def sync(self) -> None:
+        """
+        Drop the cached responses if the shared catalog version moved. The
+        counter is read at most every check_seconds.
+        """
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < self.check_seconds:
+            return
+        self._checked_at = now
+        try:
+            doc = await _version_collection().find_one({"_id": VERSION_ID}, {"version": 1})
+        except PyMongoError:
+            logger.warning("Could not read the catalog version; cached responses expire by age only")
+            return
+        shared = doc["version"] if doc else 0
+        if shared != self._shared_version:
+            self._shared_version = shared
+            self._invalidate()
+
+    def get(self, key: CacheKey) -> Optional[CachedResponse]:
+        cached = self._entries.get(key)
+        if cached is None:
+            return None
+        stored_at, entry = cached
+        if time.monotonic() - stored_at >= self.max_age_seconds:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key: CacheKey, payload, headers: Optional[Dict[str, str]] = None) -> CachedResponse:
+        """
+        Serialize a payload and cache it under the key. Payloads built while
+        the catalog changed (key version is no longer current) are returned
+        but not cached.
+        """
+        body = _serialize(payload)
+        entry = CachedResponse(body, '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"', headers or {})
+        if key[0] == self.version:
+            self._entries[key] = (time.monotonic(), entry)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def _invalidate(self) -> None:
+        self.version += 1
+        self._entries.clear()
+
+    def bump(self) -> None:
+        """
+        Start a new catalog version; responses cached for older versions are
+        dropped, here at once and in other processes at their next sync.
+        """
+        self._invalidate()
+        try:
+            task = asyncio.get_running_loop().create_task(self._publish())
+        except RuntimeError:
+            return  # no event loop (a script or a sync test): nothing else to tell
+        self._publishing.add(task)
+        task.add_done_callback(self._publishing.discard)
+
+    async def _publish(self) -> None:
+        try:
+            version = await publish_change()
+        except Exception:
+            logger.exception("Could not publish the catalog version")
+            return
+        # Our own increment needs no second invalidation
+        if self._shared_version == version - 1:
+            self._shared_version = version
+
+    async def drain(self) -> None:
+        """
+        Wait until this process's version bumps are published.
+        """
+        if self._publishing:
+            await asyncio.gather(*self._publishing)
+
+    # Catalog change hook
+
+    def on_product_saved(self, product: Product) -> None:
+        self.bump()
+
+    def on_products_saved(self, products) -> None:
+        self.bump()
+
+    def on_product_deleted(self, product_id: str) -> None:
+        self.bump()
+
+
+catalog_cache = CatalogResponseCache(
+    settings.CATALOG_CACHE_MAX_ENTRIES, settings.CATALOG_CACHE_MAX_AGE_SECONDS, settings.CATALOG_VERSION_CHECK_SECONDS
+)
+catalog_events.register(catalog_cache)
@@ -0,0 +1,77 @@
+"""
+Catalog change hook.
+
+In-memory indexes over the product catalog register a listener here and are
+updated incrementally whenever an endpoint creates, updates or deletes a
+product, instead of re-reading the products collection.
+"""
+
+import logging
+from typing import List, Protocol, Sequence
+
+from ..models.product import Product
+
+logger = logging.getLogger(__name__)
+
+
+class CatalogListener(Protocol):
+    """
+    Listeners may also define on_products_saved(products) to take a batch
+    of inserts (bulk import) in one call; otherwise they get one
+    on_product_saved call per product.
+    """
+
+    def on_product_saved(self, product: Product) -> None: ...
+
+    def on_product_deleted(self, product_id: str) -> None: ...
+
+
+_listeners: List[CatalogListener] = []
+
+
+def register(listener: CatalogListener) -> None:
+    """
+    Subscribe a listener to product writes.
+    """
+    if listener not in _listeners:
+        _listeners.append(listener)
+
+
+def notify_product_saved(product: Product) -> None:
+    """
+    Call after a product has been inserted or updated.
+    """
+    for listener in _listeners:
+        try:
+            listener.on_product_saved(product)
+        except Exception:
+            logger.exception("Catalog listener %r failed on save of %s", listener, product.id)
+
+
+def notify_products_saved(products: Sequence[Product]) -> None:
+    """
+    Call after a batch of products has been inserted or updated.
+    """
+    if not products:
+        return
+    for listener in _listeners:
+        batch = getattr(listener, "on_products_saved", None)
+        try:
+            if batch is not None:
+                batch(products)
+            else:
+                for product in products:
+                    listener.on_product_saved(product)
+        except Exception:
+            logger.exception("Catalog listener %r failed on a batch of %d products", listener, len(products))
+
+
+def notify_product_deleted(product_id: str) -> None:
+    """
+    Call after a product has been deleted.
+    """
+    for listener in _listeners:
+        try:
+            listener.on_product_deleted(str(product_id))
+        except Exception:
+            logger.exception("Catalog listener %r failed on delete of %s", listener, product_id)
@@ -0,0 +1,179 @@
+"""
+In-memory product name index used by the agent to resolve products in chat messages.
+"""
+
+import asyncio
+import re
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from ..models.product import Product
+from . import catalog_events
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Too common to identify a product on their own in partial matches
+_STOPWORDS = {"a", "an", "and", "the", "of", "for", "in", "on", "with", "to", "my", "me", "it", "this", "that"}
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercase alphanumeric tokens of a string.
+    """
+    return _TOKEN_RE.findall(text.lower()) if text else []
+
+
+class CatalogIndex:
+    """
+    Normalized product names, name tokens and ids, loaded once per process and
+    kept current through the catalog change hook.
+
+    Entries are product-card dicts (id, name, price, description, image_url),
+    so resolving a product needs no database round trip.
+    """
+
+    def __init__(self) -> None:
+        self._entries: Dict[str, dict] = {}
+        self._name_tokens: Dict[str, Tuple[str, ...]] = {}
+        self._versions: Dict[str, int] = {}
+        self._by_name: Dict[Tuple[str, ...], str] = {}
+        self._postings: Dict[str, Set[str]] = {}
+        self._max_name_len = 0
+        self._loaded = False
+        self._lock = asyncio.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def ensure_loaded(self) -> None:
+        """
+        Load the whole catalog once; later calls are no-ops.
+        """
+        if self._loaded:
+            return
+        async with self._lock:
+            if self._loaded:
+                return
+            products = await Product.find_all().to_list()
+            self.rebuild(products)
+
+    def rebuild(self, products: Iterable[Product]) -> None:
+        """
+        Replace the index contents with the given products.
+        """
+        self._entries.clear()
+        self._name_tokens.clear()
+        self._versions.clear()
+        self._by_name.clear()
+        self._postings.clear()
+        self._max_name_len = 0
+        for product in products:
+            self._add(product)
+        self._loaded = True
+
+    def _add(self, product: Product) -> None:
+        product_id = str(product.id)
+        tokens = tuple(tokenize(product.name))
+        self._entries[product_id] = {
+            "id": product_id,
+            "name": product.name,
+            "price": product.price,
+            "description": product.description,
+            "image_url": product.image_url,
+        }
+        self._name_tokens[product_id] = tokens
+        self._versions[product_id] = getattr(product, "version", 0)
+        if tokens:
+            self._by_name.setdefault(tokens, product_id)
+            self._max_name_len = max(self._max_name_len, len(tokens))
+        for token in set(tokens):
+            self._postings.setdefault(token, set()).add(product_id)
+
+    def _remove(self, product_id: str) -> None:
+        if self._entries.pop(product_id, None) is None:
+            return
+        tokens = self._name_tokens.pop(product_id)
+        self._versions.pop(product_id, None)
+        if self._by_name.get(tokens) == product_id:
+            del self._by_name[tokens]
+            # Another product may share the same name
+            for other_id, other_tokens in self._name_tokens.items():
+                if other_tokens == tokens:
+                    self._by_name[tokens] = other_id
+                    break
+        for token in set(tokens):
+            ids = self._postings.get(token)
+            if ids is not None:
+                ids.discard(product_id)
+                if not ids:
+                    del self._postings[token]
+
+    # Catalog change hook
+
+    def on_product_saved(self, product: Product) -> None:
+        if not self._loaded:
+            return  # The first load will pick it up
+        product_id = str(product.id)
+        self._remove(product_id)
+        self._add(product)
+
+    def on_product_deleted(self, product_id: str) -> None:
+        if self._loaded:
+            self._remove(product_id)
+
+    # Lookups
+
+    def get(self, product_id: str) -> Optional[dict]:
+        """
+        Product card for an id, or None.
+        """
+        return self._entries.get(str(product_id))
+
+    def version_of(self, product_id: str) -> Optional[int]:
+        """
+        Last known product version, or None if the product is not indexed.
+        """
+        return self._versions.get(str(product_id))
+
+    def find_in_text(self, text: str) -> Optional[dict]:
+        """
+        Longest full product name occurring in the text (as whole words).
+        """
+        tokens = tokenize(text)
+        for length in range(min(self._max_name_len, len(tokens)), 0, -1):
+            for start in range(len(tokens) - length + 1):
+                product_id = self._by_name.get(tuple(tokens[start:start + length]))
+                if product_id is not None:
+                    return self._entries[product_id]
+        return None
+
+    def match_words(self, text: str, min_multi_word_matches: int = 2) -> Optional[dict]:
+        """
+        Best partial name match by shared words. Multi-word names need at least
+        min_multi_word_matches shared words; single-word names need their word.
+        Ties go to the longer name.
+        """
+        counts: Dict[str, int] = {}
+        for token in set(tokenize(text)):
+            if token in _STOPWORDS:
+                continue
+            for product_id in self._postings.get(token, ()):
+                counts[product_id] = counts.get(product_id, 0) + 1
+
+        best = None
+        best_key = None
+        for product_id, matches in counts.items():
+            name_len = len(self._name_tokens[product_id])
+            if name_len > 1 and matches < min_multi_word_matches:
+                continue
+            key = (matches, len(self._entries[product_id]["name"]))
+            if best_key is None or key > best_key:
+                best, best_key = product_id, key
+        return self._entries[best] if best is not None else None
+
+
+catalog_index = CatalogIndex()
+catalog_events.register(catalog_index)
@@ -0,0 +1,267 @@
+"""
+Checkout pipeline.
+
+An order is only placed for a payment session of the same user that
+succeeded (payment/confirm-mock-payment); the session is read from Mongo.
+It is built from server-side state only: the user's cart, priced
+from the products collection in one batched read, with the discount code
+checked against the discount cache. Nothing the client says about items,
+prices or totals is used.
+
+Stock was held in bulk for the payment when it was started
+(payment/create-mock-payment). If that hold lapsed, or the cart changed
+since, the cart is held again in one bulk write. Committing the hold,
+inserting the order and emptying the cart then happen in one transaction,
+so a failure leaves the stock held, the cart intact and no order behind.
+Transactions need a replica set (a single-node one will do); on a standalone
+server the three writes run one after another instead.
+
+The result carries everything the confirmation page shows, so placing an
+order is one request.
+"""
+
+import logging
+from datetime import datetime
+from typing import Dict, Optional
+from uuid import uuid4
+
+from pymongo.errors import DuplicateKeyError
+
+from ..models.cart import Cart
+from ..models.order import Order, OrderItem
+from ..models.payment import PaymentSession
+from .cart import CartService
+from .catalog_index import catalog_index
+from .inventory import InventoryService
+
+logger = logging.getLogger(__name__)
+
+ESTIMATED_DELIVERY = "3-5 business days"
+
+# Whether each client's server runs transactions (replica set or mongos), checked once
+_transactions: Dict[int, bool] = {}
+
+
+class EmptyCart(Exception):
+    pass
+
+
+class PaymentNotConfirmed(Exception):
+    """
+    There is no successful payment by this user under the payment id.
+    """
+
+    def __init__(self, payment_id: str, status: Optional[str]) -> None:
+        super().__init__(f"Payment {payment_id} is {status or 'unknown'}")
+        self.payment_id = payment_id
+        self.status = status
+
+
+class AmountMismatch(Exception):
+    """
+    The cart no longer totals what was paid (it changed after the payment started).
+    """
+
+    def __init__(self, paid: float, total: float) -> None:
+        super().__init__(f"Paid {paid}, cart total is {total}")
+        self.paid = paid
+        self.total = total
+
+
+class HoldLapsed(Exception):
+    """
+    The stock hold was released between checking and committing it.
+    """
+
+
+async def supports_transactions(client) -> bool:
+    if id(client) not in _transactions:
+        try:
+            hello = await client.admin.command("hello")
+            _transactions[id(client)] = "setName" in hello or hello.get("msg") == "isdbgrid"
+        except Exception:
+            _transactions[id(client)] = False
+        if not _transactions[id(client)]:
+            logger.warning("MongoDB does not support transactions here; checkout writes will not be atomic")
+    return _transactions[id(client)]
+
+
+def _empty_cart_summary() -> dict:
+    return {"items": [], "subtotal": 0, "shipping": 0, "discount": 0, "total": 0, "discount_code": None}
+
+
+def _image_url(product_id: str) -> Optional[str]:
+    entry = catalog_index.get(product_id)
+    return entry["image_url"] if entry else None
+
+
+def order_summary(order: Order) -> dict:
+    """
+    The checkout response for a placed order.
+    """
+    return {
+        "success": True,
+        "order_id": str(order.id),
+        "total": order.total_amount,
+        "message": "Order placed successfully!",
+        "estimated_delivery": ESTIMATED_DELIVERY,
+        "order": {
+            "id": str(order.id),
+            "status": order.status,
+            "payment_status": order.payment_status,
+            "payment_id": order.razorpay_order_id,
+            "transaction_id": order.razorpay_payment_id,
+            "created_at": order.created_at.isoformat(),
+            "items": [
+                {**item.model_dump(), "image_url": _image_url(item.product_id), "total": item.price * item.quantity}
+                for item in order.items
+            ],
+            "subtotal": order.subtotal,
+            "shipping": order.shipping_cost,
+            "discount": order.discount_amount,
+            "discount_code": order.discount_code,
+            "total": order.total_amount,
+            "shipping_address": {
+                "full_name": order.shipping_name,
+                "email": order.shipping_email,
+                "phone": order.shipping_phone,
+                "address_line1": order.shipping_address_line1,
+                "address_line2": order.shipping_address_line2,
+                "city": order.shipping_city,
+                "state": order.shipping_state,
+                "zip_code": order.shipping_zip,
+                "country": order.shipping_country,
+            },
+        },
+        "cart_summary": _empty_cart_summary(),
+    }
+
+
+class CheckoutService:
+    """
+    Places orders from the server-side cart.
+    """
+
+    @staticmethod
+    async def place_order(
+        user_id: str,
+        payment_id: str,
+        transaction_id: str,
+        shipping_address: dict,
+        discount_code: Optional[str] = None,
+        notes: Optional[str] = None,
+    ) -> dict:
+        """
+        Place the order paid by payment_id and return its summary. Raises
+        PaymentNotConfirmed, EmptyCart, AmountMismatch or InsufficientStock
+        (nothing is written).
+        """
+        payment = await PaymentSession.get(payment_id)
+        if payment is not None and payment.user_id != user_id:
+            payment = None  # someone else's payment reads as missing
+        if payment is None or payment.status != "SUCCESS":
+            raise PaymentNotConfirmed(payment_id, payment.status if payment else None)
+
+        # One order per payment
+        existing = await Order.find_one(Order.razorpay_order_id == payment_id)
+        if existing:
+            return order_summary(existing)
+
+        summary = await CartService.get_cart_summary(user_id, discount_code, use_snapshots=False)
+        if not summary["items"]:
+            raise EmptyCart()
+        if abs(payment.amount - summary["total"]) > 0.01:
+            raise AmountMismatch(payment.amount, summary["total"])
+        lines = [(item["id"], item["quantity"]) for item in summary["items"]]
+
+        for _ in range(2):
+            # Sell the payment's hold if it covers the cart as priced; otherwise hold the cart again
+            reservation_id = payment_id
+            if not await InventoryService.holds(payment_id, lines):
+                await InventoryService.release(payment_id)
+                reservation_id = f"{payment_id}:{uuid4().hex}"
+                await InventoryService.reserve_items(reservation_id, lines, user_id)
+
+            order = CheckoutService._order(user_id, payment_id, transaction_id, shipping_address, notes, summary)
+            try:
+                await CheckoutService._write(order, reservation_id, user_id)
+            except HoldLapsed:
+                continue  # expired in between; hold the cart again
+            except DuplicateKeyError:
+                # A concurrent request for the same payment placed it first
+                if reservation_id != payment_id:
+                    await InventoryService.release(reservation_id)
+                return order_summary(await Order.find_one(Order.razorpay_order_id == payment_id))
+            except BaseException:
+                if reservation_id != payment_id:
+                    await InventoryService.release(reservation_id)
+                raise
+            return order_summary(order)
+        raise HoldLapsed()
+
+    @staticmethod
+    def _order(user_id: str, payment_id: str, transaction_id: str, shipping_address: dict,
+               notes: Optional[str], summary: dict) -> Order:
+        return Order(
+            user_id=user_id,
+            total_amount=summary["total"],
+            subtotal=summary["subtotal"],
+            shipping_cost=summary["shipping"],
+            discount_amount=summary["discount"],
+            discount_code=summary["discount_code"],
+            status="confirmed",
+            payment_status="success",
+            payment_method="mock_upi",
+            razorpay_order_id=payment_id,
+            razorpay_payment_id=transaction_id,
+            razorpay_signature="MOCK_PAYMENT",
+            shipping_name=shipping_address["full_name"],
+            shipping_email=shipping_address["email"],
+            shipping_phone=shipping_address["phone"],
+            shipping_address_line1=shipping_address["address_line1"],
+            shipping_address_line2=shipping_address.get("address_line2"),
+            shipping_city=shipping_address["city"],
+            shipping_state=shipping_address["state"],
+            shipping_zip=shipping_address["zip_code"],
+            shipping_country=shipping_address.get("country") or "India",
+            items=[
+                OrderItem(product_id=item["id"], product_name=item["name"], quantity=item["quantity"],
+                          price=item["price"], size=item["size"])
+                for item in summary["items"]
+            ],
+            notes=notes,
+            created_at=datetime.utcnow(),
+        )
+
+    @staticmethod
+    async def _write(order: Order, reservation_id: str, user_id: str) -> None:
+        """
+        Sell the held stock, insert the order and empty the cart, atomically when the server allows.
+        """
+        client = Order.get_motor_collection().database.client
+
+        async def writes(session) -> None:
+            if not await InventoryService.commit(reservation_id, session=session):
+                raise HoldLapsed()
+            await order.insert(session=session)
+            await CheckoutService._empty_cart(user_id, session)
+
+        if await supports_transactions(client):
+            async with await client.start_session() as session:
+                await session.with_transaction(writes)
+            return
+
+        # Order first, so a duplicate payment fails before the hold is sold
+        await order.insert()
+        if not await InventoryService.commit(reservation_id):
+            await order.delete()
+            raise HoldLapsed()
+        await CheckoutService._empty_cart(user_id)
+
+    @staticmethod
+    async def _empty_cart(user_id: str, session=None) -> None:
+        await Cart.get_motor_collection().update_one(
+            {"user_id": user_id},
+            {"$set": {"items": [], "applied_discount_code": None, "updated_at": datetime.utcnow()}},
+            session=session,
+        )
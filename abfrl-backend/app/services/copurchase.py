@@ -0,0 +1,334 @@
+"""
+"Frequently bought together" recommendations from order history.
+
+An offline job streams the orders collection and counts, for every pair of
+products, how many orders contained both. Counts live in a sparse
+item-item matrix (CSR, built with NumPy). The job persists the matrix
+together with the top COPURCHASE_TOP_N neighbours of every product and the
+(created_at, _id) of the last order it processed, all in one file, so the
+next run only reads newer orders. The number of orders containing each
+product is kept alongside as a popularity signal (used by autocomplete).
+
+Serving loads the neighbours into a dict (O(1) lookup per product) and
+reloads them when the job has written a new file.
+
+Run with:  python -m app.services.copurchase
+"""
+
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from bson import ObjectId
+
+from app.core.config import settings
+from ..models.order import Order
+
+logger = logging.getLogger(__name__)
+
+_FILE = "copurchase.npz"
+# Orders with more distinct products than this add no pairs (bulk orders say little
+# about what goes together, and cost O(n^2) pairs)
+_MAX_ITEMS_PER_ORDER = 50
+_EXCLUDED_STATUSES = ["cancelled"]
+# Queued pairs summed into the matrix at a time during a job
+_MERGE_EVERY_PAIRS = 5_000_000
+
+
+class CoPurchaseCounts:
+    """
+    Symmetric product-pair counts as CSR arrays over a product vocabulary,
+    plus the top-N neighbours of every product and the job cursor.
+    """
+
+    def __init__(self) -> None:
+        self.products: List[str] = []
+        self.index: Dict[str, int] = {}
+        self.indptr = np.zeros(1, dtype=np.int64)
+        self.indices = np.zeros(0, dtype=np.int32)
+        self.counts = np.zeros(0, dtype=np.int32)
+        self.top_indptr = np.zeros(1, dtype=np.int64)
+        self.top_indices = np.zeros(0, dtype=np.int32)
+        self.top_counts = np.zeros(0, dtype=np.int32)
+        self.order_counts = np.zeros(0, dtype=np.int64)
+        self.last_created_at: Optional[datetime] = None
+        self.last_order_id: Optional[str] = None
+        self.orders_processed = 0
+        self._pending: List[Tuple[np.ndarray, np.ndarray]] = []
+        self.pending_pairs = 0
+        self._touched: set = set()
+
+    # Persistence (one file, replaced atomically, so counts and cursor never disagree)
+
+    @classmethod
+    def load(cls, path: str) -> "CoPurchaseCounts":
+        state = cls()
+        if not os.path.exists(path):
+            return state
+        with np.load(path, allow_pickle=False) as data:
+            state.products = data["products"].tolist()
+            state.index = {product_id: i for i, product_id in enumerate(state.products)}
+            for name in ("indptr", "indices", "counts", "top_indptr", "top_indices", "top_counts"):
+                setattr(state, name, data[name])
+            # Files written before order counts were kept start counting from zero
+            state.order_counts = data["order_counts"] if "order_counts" in data else np.zeros(len(state.products), dtype=np.int64)
+            cursor = data["cursor"].tolist()
+            if cursor[0]:
+                state.last_created_at = datetime.fromisoformat(cursor[0])
+                state.last_order_id = cursor[1]
+            state.orders_processed = int(data["orders_processed"])
+        return state
+
+    def save(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        cursor = [self.last_created_at.isoformat() if self.last_created_at else "", self.last_order_id or ""]
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            np.savez(
+                f,
+                products=np.array(self.products, dtype=str),
+                indptr=self.indptr, indices=self.indices, counts=self.counts,
+                top_indptr=self.top_indptr, top_indices=self.top_indices, top_counts=self.top_counts,
+                order_counts=self.order_counts,
+                cursor=np.array(cursor, dtype=str),
+                orders_processed=np.int64(self.orders_processed),
+            )
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+    # Building
+
+    def _product_index(self, product_id: str) -> int:
+        i = self.index.get(product_id)
+        if i is None:
+            i = self.index[product_id] = len(self.products)
+            self.products.append(product_id)
+        return i
+
+    def add_orders(self, baskets: List[List[str]]) -> None:
+        """
+        Queue the product pairs of a batch of orders (lists of product ids).
+        They are summed into the matrix by merge_pending.
+        """
+        rows: List[int] = []
+        cols: List[int] = []
+        ordered: List[int] = []
+        for basket in baskets:
+            items = sorted({self._product_index(product_id) for product_id in basket})
+            ordered.extend(items)
+            if len(items) > _MAX_ITEMS_PER_ORDER:
+                continue
+            for a in range(len(items)):
+                for b in range(a + 1, len(items)):
+                    rows.append(items[a])
+                    cols.append(items[b])
+        self.orders_processed += len(baskets)
+        self._resize()
+        self.order_counts += np.bincount(np.array(ordered, dtype=np.int64), minlength=len(self.products))
+        if rows:
+            self._pending.append((np.array(rows + cols, dtype=np.int64), np.array(cols + rows, dtype=np.int64)))
+            self.pending_pairs += 2 * len(rows)
+
+    def merge_pending(self) -> None:
+        """
+        Sum the queued pairs into the CSR matrix.
+        """
+        self._resize()
+        if not self._pending:
+            return
+        rows = np.concatenate([r for r, _ in self._pending])
+        cols = np.concatenate([c for _, c in self._pending])
+        self._pending, self.pending_pairs = [], 0
+        self._merge(rows, cols, np.ones(len(rows), dtype=np.int64))
+        self._touched.update(np.unique(rows).tolist())
+
+    def finish(self, top_n: int) -> None:
+        """
+        Merge what is queued and refresh the neighbour lists of every product
+        whose counts changed.
+        """
+        self.merge_pending()
+        if self._touched:
+            self._refresh_top(self._touched, top_n)
+            self._touched = set()
+
+    def _resize(self) -> None:
+        # New products without pairs still need (empty) rows
+        n = len(self.products)
+        if len(self.order_counts) < n:
+            self.order_counts = np.concatenate([self.order_counts, np.zeros(n - len(self.order_counts), dtype=np.int64)])
+        for name in ("indptr", "top_indptr"):
+            indptr = getattr(self, name)
+            if len(indptr) < n + 1:
+                setattr(self, name, np.concatenate([indptr, np.full(n + 1 - len(indptr), indptr[-1], dtype=np.int64)]))
+
+    def _merge(self, rows: np.ndarray, cols: np.ndarray, values: np.ndarray) -> None:
+        self._resize()
+        n = len(self.products)
+        # Existing CSR back to COO, append the new pairs and sum duplicates
+        old_rows = np.repeat(np.arange(n, dtype=np.int64), np.diff(self.indptr))
+        keys = np.concatenate([old_rows * n + self.indices, rows * n + cols])
+        weights = np.concatenate([self.counts.astype(np.int64), values])
+        unique_keys, inverse = np.unique(keys, return_inverse=True)
+        summed = np.bincount(inverse, weights=weights).astype(np.int32)
+        new_rows = unique_keys // n
+        self.indices = (unique_keys % n).astype(np.int32)
+        self.counts = summed
+        self.indptr = np.concatenate([[0], np.cumsum(np.bincount(new_rows, minlength=n))]).astype(np.int64)
+
+    def _refresh_top(self, touched_set: set, top_n: int) -> None:
+        n = len(self.products)
+        indptr = [0]
+        indices: List[np.ndarray] = []
+        counts: List[np.ndarray] = []
+        for row in range(n):
+            if row in touched_set:
+                start, end = self.indptr[row], self.indptr[row + 1]
+                row_counts = self.counts[start:end]
+                row_indices = self.indices[start:end]
+                if len(row_counts) > top_n:
+                    keep = np.argpartition(-row_counts, top_n - 1)[:top_n]
+                    row_counts, row_indices = row_counts[keep], row_indices[keep]
+                # Highest count first; ties by product order for stable output
+                order = np.lexsort((row_indices, -row_counts))
+                row_indices, row_counts = row_indices[order], row_counts[order]
+            else:
+                start, end = self.top_indptr[row], self.top_indptr[row + 1]
+                row_indices, row_counts = self.top_indices[start:end], self.top_counts[start:end]
+            indices.append(row_indices)
+            counts.append(row_counts)
+            indptr.append(indptr[-1] + len(row_indices))
+        self.top_indptr = np.array(indptr, dtype=np.int64)
+        self.top_indices = np.concatenate(indices).astype(np.int32) if indices else np.zeros(0, dtype=np.int32)
+        self.top_counts = np.concatenate(counts).astype(np.int32) if counts else np.zeros(0, dtype=np.int32)
+
+    def neighbours(self) -> Dict[str, List[Tuple[str, int]]]:
+        """
+        Top neighbours of every product with at least one, as a plain dict.
+        """
+        result = {}
+        for row, product_id in enumerate(self.products):
+            start, end = self.top_indptr[row], self.top_indptr[row + 1]
+            if end > start:
+                result[product_id] = [
+                    (self.products[i], int(c)) for i, c in zip(self.top_indices[start:end], self.top_counts[start:end])
+                ]
+        return result
+
+    def popularity(self) -> Dict[str, int]:
+        """
+        Orders containing each product, for products in at least one.
+        """
+        return {self.products[i]: int(self.order_counts[i]) for i in np.flatnonzero(self.order_counts)}
+
+
+async def run_job(path: Optional[str] = None, batch_size: int = 1000) -> Dict[str, int]:
+    """
+    Process orders created after the stored cursor and persist the result.
+    """
+    path = path or os.path.join(settings.COPURCHASE_DIR, _FILE)
+    state = CoPurchaseCounts.load(path)
+
+    query: dict = {"status": {"$nin": _EXCLUDED_STATUSES}}
+    if state.last_created_at is not None:
+        # (created_at, _id) keyset so orders sharing a timestamp are neither skipped nor repeated
+        query["$or"] = [
+            {"created_at": {"$gt": state.last_created_at}},
+            {"created_at": state.last_created_at, "_id": {"$gt": ObjectId(state.last_order_id)}},
+        ]
+    cursor = (
+        Order.get_motor_collection()
+        .find(query, {"items.product_id": 1, "created_at": 1})
+        .sort([("created_at", 1), ("_id", 1)])
+        .batch_size(batch_size)
+    )
+
+    new_orders = 0
+    baskets: List[List[str]] = []
+    async for doc in cursor:
+        baskets.append([item["product_id"] for item in doc.get("items", []) if item.get("product_id")])
+        state.last_created_at, state.last_order_id = doc["created_at"], str(doc["_id"])
+        if len(baskets) >= batch_size:
+            state.add_orders(baskets)
+            new_orders += len(baskets)
+            baskets = []
+            # Bound memory on big backfills
+            if state.pending_pairs >= _MERGE_EVERY_PAIRS:
+                state.merge_pending()
+    if baskets:
+        state.add_orders(baskets)
+        new_orders += len(baskets)
+    state.finish(settings.COPURCHASE_TOP_N)
+
+    if new_orders:
+        state.save(path)
+    return {"new_orders": new_orders, "orders_processed": state.orders_processed, "products": len(state.products)}
+
+
+class CoPurchaseIndex:
+    """
+    In-memory neighbour lists for serving, reloaded when the job writes a
+    new file (checked at most every COPURCHASE_RELOAD_SECONDS).
+    """
+
+    def __init__(self, path: str, reload_seconds: float) -> None:
+        self.path = path
+        self.reload_seconds = reload_seconds
+        self._neighbours: Dict[str, List[Tuple[str, int]]] = {}
+        self._popularity: Dict[str, int] = {}
+        self._mtime: Optional[float] = None
+        self._checked_at = 0.0
+
+    def load(self) -> None:
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except OSError:
+            return
+        if mtime != self._mtime:
+            state = CoPurchaseCounts.load(self.path)
+            self._neighbours = state.neighbours()
+            self._popularity = state.popularity()
+            self._mtime = mtime
+
+    def _maybe_reload(self) -> None:
+        now = time.monotonic()
+        if now - self._checked_at >= self.reload_seconds:
+            self._checked_at = now
+            try:
+                self.load()
+            except Exception:
+                logger.exception("Reloading co-purchase neighbours failed")
+
+    def get(self, product_id: str, limit: int = 5) -> List[Tuple[str, int]]:
+        """
+        (product id, orders bought together) pairs, most frequent first.
+        """
+        self._maybe_reload()
+        return self._neighbours.get(str(product_id), [])[:limit]
+
+    def popularity(self) -> Dict[str, int]:
+        """
+        Orders containing each product. The same dict is returned until the
+        job writes a new file, so callers can tell a reload by identity.
+        """
+        self._maybe_reload()
+        return self._popularity
+
+
+copurchase_index = CoPurchaseIndex(os.path.join(settings.COPURCHASE_DIR, _FILE), settings.COPURCHASE_RELOAD_SECONDS)
+
+
+async def _main() -> None:
+    from app.db.mongodb import init_db
+
+    await init_db()
+    print(await run_job())
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
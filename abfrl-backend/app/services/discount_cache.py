@@ -0,0 +1,131 @@
+"""
+In-process cache of active discount codes.
+
+The discount_codes collection is tiny and rarely written, but it was queried
+on every cart summary that carried a code. The cache holds a full snapshot of
+the active codes, refreshed in the background every TTL and updated in place
+by the endpoints that write codes, so lookups are dictionary hits. Other
+worker processes pick up writes at their next refresh.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Dict, Optional
+
+from app.core.config import settings
+from app.models.cart import DiscountCode
+
+logger = logging.getLogger(__name__)
+
+
+class DiscountCodeCache:
+    """
+    Snapshot of active discount codes keyed by upper-cased code.
+    """
+
+    def __init__(self, ttl_seconds: float) -> None:
+        self.ttl_seconds = ttl_seconds
+        self._codes: Dict[str, DiscountCode] = {}
+        self._loaded_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+        self._refresher: Optional[asyncio.Task] = None
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.invalidations = 0
+
+    def _is_fresh(self) -> bool:
+        return self._loaded_at is not None and time.monotonic() - self._loaded_at < self.ttl_seconds
+
+    async def _load(self) -> None:
+        codes = await DiscountCode.find(DiscountCode.active == True).to_list()
+        self._codes = {code.code.upper(): code for code in codes}
+        self._loaded_at = time.monotonic()
+        self.refreshes += 1
+
+    async def refresh(self) -> None:
+        """
+        Reload every active code from the database.
+        """
+        async with self._lock:
+            await self._load()
+
+    async def get(self, code: str) -> Optional[DiscountCode]:
+        """
+        Active discount code for a (case-insensitive) code string, or None.
+        A lookup served from a fresh snapshot counts as a hit; one that has
+        to reload the snapshot first counts as a miss.
+        """
+        if self._is_fresh():
+            self.hits += 1
+        else:
+            self.misses += 1
+            async with self._lock:
+                # Concurrent misses share one reload
+                if not self._is_fresh():
+                    await self._load()
+        return self._codes.get(code.upper())
+
+    # Write-through from the endpoints that change codes
+
+    def on_code_saved(self, discount_code: DiscountCode) -> None:
+        key = discount_code.code.upper()
+        if discount_code.active:
+            self._codes[key] = discount_code
+        else:
+            self._codes.pop(key, None)
+        self.invalidations += 1
+
+    def on_code_deleted(self, code: str) -> None:
+        self._codes.pop(code.upper(), None)
+        self.invalidations += 1
+
+    def invalidate(self) -> None:
+        """
+        Drop the snapshot; the next lookup reloads it.
+        """
+        self._loaded_at = None
+        self.invalidations += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._codes),
+            "ttl_seconds": self.ttl_seconds,
+            "age_seconds": round(time.monotonic() - self._loaded_at, 1) if self._loaded_at is not None else None,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "refreshes": self.refreshes,
+            "invalidations": self.invalidations,
+        }
+
+    # Background refresh
+
+    async def _refresh_forever(self) -> None:
+        while True:
+            await asyncio.sleep(self.ttl_seconds)
+            try:
+                await self.refresh()
+            except Exception:
+                logger.exception("Discount code cache refresh failed")
+
+    def start(self) -> None:
+        """
+        Start refreshing the snapshot every TTL on the running event loop.
+        """
+        if self._refresher is None or self._refresher.done():
+            self._refresher = asyncio.create_task(self._refresh_forever())
+
+    async def stop(self) -> None:
+        if self._refresher is not None:
+            self._refresher.cancel()
+            try:
+                await self._refresher
+            except asyncio.CancelledError:
+                pass
+            self._refresher = None
+
+
+discount_cache = DiscountCodeCache(settings.DISCOUNT_CACHE_TTL_SECONDS)
@@ -0,0 +1,215 @@
+"""
+Versioned on-disk product embeddings shared by all workers.
+
+A pipeline run reads the catalog and re-embeds only the products whose text
+changed since the previous version (tracked by content hash). It then
+writes a new version to EMBEDDING_STORE_DIR:
+
+    vectors-000007.npy   float32 matrix, one row per product
+    ids-000007.json      product ids and content hashes, row-aligned
+    manifest.json        the current version (replaced atomically)
+
+Workers map the vectors with numpy memmap, so N workers share one copy in
+the page cache, and poll the manifest to hot-swap to new versions.
+
+Run once with:  python -m app.services.embedding_store
+"""
+
+import asyncio
+import fcntl
+import json
+import logging
+import os
+import time
+from typing import Dict, List, NamedTuple, Optional
+
+import numpy as np
+
+from app.core.config import settings
+from ..models.product import Product
+from .embeddings import EMBEDDER_VERSION, PRODUCT_TEXT_FIELDS, HashingEmbedder, content_hash, product_fields
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = "manifest.json"
+_LOCK_FILE = ".pipeline.lock"
+# Versions kept on disk: the current one plus older ones workers may still have mapped
+_KEEP_VERSIONS = 2
+
+
+class StoredEmbeddings(NamedTuple):
+    version: int
+    snapshot_at: float  # catalog read time of the run that produced this version
+    ids: List[str]
+    hashes: List[str]
+    vectors: np.ndarray  # copy-on-write memmap
+
+
+def read_manifest(directory: str) -> Optional[dict]:
+    try:
+        with open(os.path.join(directory, MANIFEST)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def load(directory: str, dim: int) -> Optional[StoredEmbeddings]:
+    """
+    Map the current version, or None if there is none compatible with this
+    embedder (dimension and embedder version must match).
+    """
+    manifest = read_manifest(directory)
+    if not manifest or manifest.get("dim") != dim or manifest.get("embedder_version") != EMBEDDER_VERSION:
+        return None
+    with open(os.path.join(directory, manifest["ids"])) as f:
+        rows = json.load(f)
+    # Copy-on-write: pages stay shared until this process writes a row
+    vectors = np.load(os.path.join(directory, manifest["vectors"]), mmap_mode="c")
+    return StoredEmbeddings(manifest["version"], manifest["snapshot_at"], rows["ids"], rows["hashes"], vectors)
+
+
+def _replace_atomically(path: str, write) -> None:
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        write(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def write_version(directory: str, snapshot_at: float, ids: List[str], hashes: List[str], vectors: np.ndarray) -> int:
+    """
+    Write a new version and point the manifest at it. Readers see either the
+    old or the new version, never a partial one.
+    """
+    os.makedirs(directory, exist_ok=True)
+    previous = read_manifest(directory)
+    version = (previous["version"] + 1) if previous else 1
+    vectors_name = f"vectors-{version:06d}.npy"
+    ids_name = f"ids-{version:06d}.json"
+
+    _replace_atomically(os.path.join(directory, vectors_name), lambda f: np.save(f, vectors.astype(np.float32, copy=False)))
+    _replace_atomically(os.path.join(directory, ids_name), lambda f: f.write(json.dumps({"ids": ids, "hashes": hashes}).encode()))
+    manifest = {
+        "version": version,
+        "snapshot_at": snapshot_at,
+        "count": len(ids),
+        "dim": int(vectors.shape[1]),
+        "embedder_version": EMBEDDER_VERSION,
+        "vectors": vectors_name,
+        "ids": ids_name,
+    }
+    _replace_atomically(os.path.join(directory, MANIFEST), lambda f: f.write(json.dumps(manifest).encode()))
+
+    # Unlinking files other workers still map is safe; the mapping keeps the data alive
+    for name in os.listdir(directory):
+        for prefix, suffix in (("vectors-", ".npy"), ("ids-", ".json")):
+            if name.startswith(prefix) and name.endswith(suffix):
+                try:
+                    old = int(name[len(prefix):-len(suffix)])
+                except ValueError:
+                    continue
+                if old <= version - _KEEP_VERSIONS:
+                    os.remove(os.path.join(directory, name))
+    return version
+
+
+def embed_catalog(directory: str, snapshot_at: float, docs: List[dict], dim: int) -> Dict[str, int]:
+    """
+    Embed the given product documents, reusing vectors of unchanged products
+    from the current version, and write a new version if anything changed.
+    """
+    embedder = HashingEmbedder(dim)
+    previous = load(directory, dim)
+    previous_rows = {product_id: row for row, product_id in enumerate(previous.ids)} if previous else {}
+
+    ids, hashes = [], []
+    vectors = np.empty((len(docs), dim), dtype=np.float32)
+    reused = 0
+    for i, doc in enumerate(docs):
+        product_id = str(doc["_id"])
+        digest = content_hash(doc, dim)
+        row = previous_rows.get(product_id)
+        if row is not None and previous.hashes[row] == digest:
+            vectors[i] = previous.vectors[row]
+            reused += 1
+        else:
+            vectors[i] = embedder.embed_fields(product_fields(doc))
+        ids.append(product_id)
+        hashes.append(digest)
+
+    stats = {"products": len(docs), "embedded": len(docs) - reused, "removed": len(set(previous_rows) - set(ids))}
+    if previous and stats["embedded"] == 0 and stats["removed"] == 0:
+        stats["version"] = previous.version
+        return stats
+    stats["version"] = write_version(directory, snapshot_at, ids, hashes, vectors)
+    return stats
+
+
+async def run_pipeline(directory: Optional[str] = None) -> Optional[Dict[str, int]]:
+    """
+    One incremental pipeline run. Returns None if another process is
+    already running it.
+    """
+    directory = directory or settings.EMBEDDING_STORE_DIR
+    os.makedirs(directory, exist_ok=True)
+    lock = open(os.path.join(directory, _LOCK_FILE), "w")
+    try:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return None
+        snapshot_at = time.time()
+        docs = await Product.get_motor_collection().find({}, PRODUCT_TEXT_FIELDS).to_list(length=None)
+        # Embedding is CPU-bound; keep it off the event loop
+        return await asyncio.to_thread(embed_catalog, directory, snapshot_at, docs, settings.VECTOR_DIM)
+    finally:
+        lock.close()
+
+
+class EmbeddingPipeline:
+    """
+    Runs the pipeline every EMBEDDING_PIPELINE_INTERVAL_SECONDS in the
+    background. Every worker may start it; the file lock lets one run at a time.
+    """
+
+    def __init__(self, interval_seconds: float) -> None:
+        self.interval_seconds = interval_seconds
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run_forever(self) -> None:
+        while True:
+            try:
+                stats = await run_pipeline()
+                if stats and stats["embedded"]:
+                    logger.info("Embedding pipeline wrote version %(version)s (%(embedded)s of %(products)s re-embedded)", stats)
+            except Exception:
+                logger.exception("Embedding pipeline run failed")
+            await asyncio.sleep(self.interval_seconds)
+
+    def start(self) -> None:
+        if self.interval_seconds > 0 and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._run_forever())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+embedding_pipeline = EmbeddingPipeline(settings.EMBEDDING_PIPELINE_INTERVAL_SECONDS)
+
+
+async def _main() -> None:
+    from app.db.mongodb import init_db
+
+    await init_db()
+    print(await run_pipeline())
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
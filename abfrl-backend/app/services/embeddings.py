@@ -0,0 +1,116 @@
+"""
+Deterministic local text embeddings for products.
+
+Word unigrams, word bigrams and character trigrams are hashed into a fixed
+number of signed buckets, so no model download or network call is needed.
+Used by the in-process vector index and by the offline embedding pipeline,
+which both need identical vectors for identical product text.
+"""
+
+import hashlib
+import json
+import math
+import zlib
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+
+from .catalog_index import tokenize
+
+# Bump whenever the features or weights change so stored vectors are recomputed
+EMBEDDER_VERSION = 1
+
+# Product fields read to embed a product (projection for raw queries)
+PRODUCT_TEXT_FIELDS = {"name": 1, "category": 1, "description": 1, "colors": 1, "metadata_info.colors": 1}
+
+# Per-kind feature weights: whole words carry most of the meaning, trigrams
+# make "shirt"/"shirts"/"tshirt" land close together
+_WORD_WEIGHT = 1.0
+_BIGRAM_WEIGHT = 0.7
+_TRIGRAM_WEIGHT = 0.4
+
+# Browse phrasing that says nothing about the product being asked for
+_QUERY_STOPWORDS = {
+    "a", "an", "and", "any", "are", "can", "do", "for", "have", "i", "im", "is", "looking", "me",
+    "my", "of", "please", "recommend", "show", "some", "something", "the", "to", "want", "what",
+    "with", "you",
+}
+
+
+@lru_cache(maxsize=200_000)
+def _bucket(feature: str, dim: int) -> Tuple[int, float]:
+    h = zlib.crc32(feature.encode("utf-8"))
+    return h % dim, (1.0 if h & 0x80000000 else -1.0)
+
+
+class HashingEmbedder:
+    """
+    Deterministic bag-of-features embedding into dim signed hash buckets,
+    L2-normalised so that a dot product is the cosine similarity.
+    """
+
+    def __init__(self, dim: int) -> None:
+        self.dim = dim
+
+    @staticmethod
+    def _features(tokens: Sequence[str], weight: float, features: Dict[str, float]) -> None:
+        counts: Counter = Counter()
+        for token in tokens:
+            counts["w:" + token] += 1
+            padded = f" {token} "
+            for i in range(len(padded) - 2):
+                counts["c:" + padded[i:i + 3]] += 1
+        for first, second in zip(tokens, tokens[1:]):
+            counts["b:" + first + " " + second] += 1
+        for feature, count in counts.items():
+            kind = feature[0]
+            kind_weight = _WORD_WEIGHT if kind == "w" else _BIGRAM_WEIGHT if kind == "b" else _TRIGRAM_WEIGHT
+            # Sublinear term frequency so repeated words do not dominate
+            features[feature] = features.get(feature, 0.0) + weight * kind_weight * (1.0 + math.log(count))
+
+    def embed_fields(self, fields: Iterable[Tuple[str, float]], stopwords=()) -> np.ndarray:
+        """
+        Embed several weighted text fields into one vector. Returns the zero
+        vector when there is nothing to embed.
+        """
+        features: Dict[str, float] = {}
+        for text, weight in fields:
+            tokens = [token for token in tokenize(text) if token not in stopwords]
+            self._features(tokens, weight, features)
+
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for feature, value in features.items():
+            index, sign = _bucket(feature, self.dim)
+            vector[index] += sign * value
+        norm = float(np.linalg.norm(vector))
+        if norm > 0:
+            vector /= norm
+        return vector
+
+    def embed_query(self, query: str) -> np.ndarray:
+        return self.embed_fields([(query, 1.0)], stopwords=_QUERY_STOPWORDS)
+
+
+def product_fields(product) -> List[Tuple[str, float]]:
+    """
+    Weighted text fields embedded for a product (a Product or a raw document).
+    """
+    get = product.get if isinstance(product, dict) else lambda key, default=None: getattr(product, key, default)
+    colors = get("colors") or (get("metadata_info") or {}).get("colors", [])
+    return [
+        (get("name") or "", 2.0),
+        (get("category") or "", 1.5),
+        (" ".join(colors), 1.0),
+        (get("description") or "", 1.0),
+    ]
+
+
+def content_hash(product, dim: int) -> str:
+    """
+    Hash of everything that determines a product's vector, used to skip
+    products whose text has not changed since their vector was computed.
+    """
+    payload = json.dumps([EMBEDDER_VERSION, dim, product_fields(product)], ensure_ascii=False)
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=12).hexdigest()
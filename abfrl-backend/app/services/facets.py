@@ -0,0 +1,256 @@
+"""
+Facet counts (category, size, color, price bucket) for the shop page.
+
+The unfiltered counts are a materialized table built with one `$facet`
+aggregation. For filtered counts every facet value also has a posting
+list of the products carrying it, held as a bitset (a Python int with bit
+`row` set), so counting under a filter is a few ANDs and popcounts
+instead of a catalog scan. Values in one facet are ORed and facets are
+ANDed; each facet is counted under the filters of the other facets only,
+so selecting "jeans" still shows how many products the other categories
+have.
+
+The table and postings are built once per process and kept current
+through the catalog change hook (inventory changes arrive as product
+saves, which re-derive the sizes).
+"""
+
+import asyncio
+from bisect import bisect_right
+from typing import Dict, List, Optional, Tuple
+
+from ..models.product import Product
+from . import catalog_events
+
+FACETS = ("category", "size", "color", "price")
+
+# Price bucket lower bounds; the last bucket is open-ended
+PRICE_BOUNDARIES = [0, 500, 1000, 2000, 5000, 10000]
+PRICE_BUCKETS = [f"{low}-{high}" for low, high in zip(PRICE_BOUNDARIES, PRICE_BOUNDARIES[1:])] + [f"{PRICE_BOUNDARIES[-1]}+"]
+
+# Apparel sizes in the order shoppers expect; anything else sorts after them
+_SIZE_ORDER = {size: i for i, size in enumerate(["XXS", "XS", "S", "M", "L", "XL", "XXL", "XXXL"])}
+
+_FIELDS = {"category": 1, "sizes": 1, "colors": 1, "price": 1}
+
+FacetValues = Tuple[Tuple[str, ...], ...]  # per facet, the values one product carries
+
+
+def price_bucket(price) -> str:
+    if price is None or price < PRICE_BOUNDARIES[0]:
+        return PRICE_BUCKETS[0]
+    return PRICE_BUCKETS[bisect_right(PRICE_BOUNDARIES, price) - 1]
+
+
+def _facet_values(product) -> FacetValues:
+    get = product.get if isinstance(product, dict) else lambda key, default=None: getattr(product, key, default)
+    category = get("category")
+    return (
+        (category,) if category else (),
+        tuple(dict.fromkeys(get("sizes") or [])),
+        tuple(dict.fromkeys(get("colors") or [])),
+        (price_bucket(get("price")),),
+    )
+
+
+def _facet_pipeline() -> List[dict]:
+    """
+    One aggregation producing the count table for every facet.
+    """
+    count = {"count": {"$sum": 1}}
+    buckets = {
+        "groupBy": "$price",
+        "boundaries": PRICE_BOUNDARIES + [float("inf")],
+        "default": "other",  # missing or negative prices
+        "output": count,
+    }
+    return [
+        {"$project": {
+            "category": 1,
+            "price": 1,
+            # Each value once per product, as in the postings
+            "sizes": {"$setUnion": [{"$ifNull": ["$sizes", []]}, []]},
+            "colors": {"$setUnion": [{"$ifNull": ["$colors", []]}, []]},
+        }},
+        {"$facet": {
+            "category": [{"$match": {"category": {"$nin": [None, ""]}}}, {"$group": {"_id": "$category", **count}}],
+            "size": [{"$unwind": "$sizes"}, {"$group": {"_id": "$sizes", **count}}],
+            "color": [{"$unwind": "$colors"}, {"$group": {"_id": "$colors", **count}}],
+            "price": [{"$bucket": buckets}],
+        }},
+    ]
+
+
+def _table_from_facet(result: dict) -> Dict[str, Dict[str, int]]:
+    table: Dict[str, Dict[str, int]] = {facet: {} for facet in FACETS}
+    for facet in ("category", "size", "color"):
+        for row in result.get(facet, []):
+            table[facet][row["_id"]] = row["count"]
+    for row in result.get("price", []):
+        # $bucket ids are lower bounds; unusable prices count in the first bucket, as in price_bucket
+        bucket = price_bucket(row["_id"]) if row["_id"] != "other" else PRICE_BUCKETS[0]
+        table["price"][bucket] = table["price"].get(bucket, 0) + row["count"]
+    return table
+
+
+class FacetIndex:
+    """
+    Facet count table plus per-value bitsets of product rows.
+    """
+
+    def __init__(self) -> None:
+        self._clear()
+        self._loaded = False
+        self._lock = asyncio.Lock()
+
+    def _clear(self) -> None:
+        self._table: Dict[str, Dict[str, int]] = {facet: {} for facet in FACETS}
+        self._postings: Dict[str, Dict[str, int]] = {facet: {} for facet in FACETS}
+        self._row_of: Dict[str, int] = {}
+        self._values: List[Optional[FacetValues]] = []
+        self._free_rows: List[int] = []  # rows of deleted products, reused to keep bitsets short
+        self._all = 0
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def __len__(self) -> int:
+        return len(self._row_of)
+
+    async def ensure_loaded(self) -> None:
+        """
+        Build the table and postings once; later calls are no-ops.
+        """
+        if self._loaded:
+            return
+        async with self._lock:
+            if self._loaded:
+                return
+            collection = Product.get_motor_collection()
+            facet_result = await collection.aggregate(_facet_pipeline()).to_list(length=1)
+            docs = await collection.find({}, _FIELDS).to_list(length=None)
+            self.rebuild(docs, _table_from_facet(facet_result[0] if facet_result else {}))
+
+    def rebuild(self, products, table: Optional[Dict[str, Dict[str, int]]] = None) -> None:
+        """
+        Index the given products. `table` is the `$facet` count table for the
+        same products; without one the counts are taken from the postings.
+        """
+        self._clear()
+        for product in products:
+            self._add(product, count=table is None)
+        if table is not None:
+            self._table = {facet: dict(table.get(facet, {})) for facet in FACETS}
+        self._loaded = True
+
+    # Postings
+
+    def _add(self, product, count: bool = True) -> None:
+        product_id = str(product["_id"] if isinstance(product, dict) else product.id)
+        row = self._free_rows.pop() if self._free_rows else len(self._values)
+        if row == len(self._values):
+            self._values.append(None)
+        values = _facet_values(product)
+        self._row_of[product_id] = row
+        self._values[row] = values
+        bit = 1 << row
+        self._all |= bit
+        for facet, facet_values in zip(FACETS, values):
+            postings = self._postings[facet]
+            for value in facet_values:
+                postings[value] = postings.get(value, 0) | bit
+                if count:
+                    self._table[facet][value] = self._table[facet].get(value, 0) + 1
+
+    def _remove(self, product_id: str) -> None:
+        row = self._row_of.pop(product_id, None)
+        if row is None:
+            return
+        values, self._values[row] = self._values[row], None
+        mask = ~(1 << row)
+        self._all &= mask
+        for facet, facet_values in zip(FACETS, values):
+            postings, counts = self._postings[facet], self._table[facet]
+            for value in facet_values:
+                postings[value] &= mask
+                counts[value] = counts.get(value, 1) - 1
+                if not postings[value]:
+                    del postings[value]
+                if counts[value] <= 0:
+                    del counts[value]
+        self._free_rows.append(row)
+
+    # Catalog change hook
+
+    def on_product_saved(self, product: Product) -> None:
+        if self._loaded:
+            self._remove(str(product.id))
+            self._add(product)
+
+    def on_product_deleted(self, product_id: str) -> None:
+        if self._loaded:
+            self._remove(product_id)
+
+    # Queries
+
+    def _union(self, facet: str, selected: List[str]) -> int:
+        postings = self._postings[facet]
+        bits = 0
+        for value in selected:
+            bits |= postings.get(value, 0)
+        return bits
+
+    def counts(self, filters: Optional[Dict[str, List[str]]] = None) -> dict:
+        """
+        Matching product total and per-facet value counts under the filters
+        (facet -> selected values). Selected values are always listed, even
+        with a zero count.
+        """
+        filters = {facet: values for facet, values in (filters or {}).items() if values}
+        if not filters:
+            return {"total": len(self._row_of), "facets": {facet: self._sorted(facet, self._table[facet], []) for facet in FACETS}}
+
+        selections = {facet: self._union(facet, values) for facet, values in filters.items()}
+        matching = self._all
+        for bits in selections.values():
+            matching &= bits
+
+        facets = {}
+        for facet in FACETS:
+            # Disjunctive faceting: a facet is counted under the other facets' filters only
+            mask = self._all
+            for other, bits in selections.items():
+                if other != facet:
+                    mask &= bits
+            if mask == self._all:
+                counts = self._table[facet]
+            else:
+                counts = {}
+                for value, bits in self._postings[facet].items():
+                    count = (bits & mask).bit_count()
+                    if count:
+                        counts[value] = count
+            facets[facet] = self._sorted(facet, counts, filters.get(facet, []))
+        return {"total": matching.bit_count(), "facets": facets}
+
+    @staticmethod
+    def _sorted(facet: str, counts: Dict[str, int], selected: List[str]) -> List[dict]:
+        counts = dict(counts)
+        for value in selected:
+            counts.setdefault(value, 0)
+        if facet == "price":
+            order = sorted(counts, key=lambda value: PRICE_BUCKETS.index(value) if value in PRICE_BUCKETS else len(PRICE_BUCKETS))
+        elif facet == "size":
+            order = sorted(counts, key=lambda value: (
+                _SIZE_ORDER.get(str(value).upper(), len(_SIZE_ORDER)),
+                int(value) if str(value).isdigit() else 0,
+                str(value),
+            ))
+        else:
+            order = sorted(counts, key=lambda value: (-counts[value], str(value)))
+        return [{"value": value, "count": counts[value]} for value in order]
+
+
+facet_index = FacetIndex()
+catalog_events.register(facet_index)
@@ -0,0 +1,85 @@
+"""
+Idempotent requests.
+
+A client retrying a request (after a timeout, or a double click) sends the
+same idempotency key. The first request to insert the key's record owns it
+and does the work; the record then stores its response. Any other request
+with the key reads that record by _id and returns the stored response, so
+the work runs once however many copies arrive, at once or later. Copies
+that arrive while the owner is still working wait for it.
+
+If the owner fails, its record is deleted so a retry can try again. A record
+left in progress by a process that died is taken over once it is older than
+IDEMPOTENCY_LOCK_SECONDS.
+"""
+
+import asyncio
+import hashlib
+import json
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable
+
+from pymongo.errors import DuplicateKeyError
+
+from app.core.config import settings
+from ..models.idempotency import IdempotencyRecord
+
+
+class IdempotencyConflict(Exception):
+    """
+    The key was already used for a different request.
+    """
+
+
+class RequestInProgress(Exception):
+    """
+    Another request with the key is still running.
+    """
+
+
+def fingerprint(payload) -> str:
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+async def run(scope: str, key: str, payload, handler: Callable[[], Awaitable[dict]]) -> dict:
+    """
+    Run handler() once per (scope, key) and return its response to every
+    request with that key. payload identifies the request; reusing a key
+    with a different payload raises IdempotencyConflict.
+    """
+    record_id = f"{scope}:{key}"
+    digest = fingerprint(payload)
+    collection = IdempotencyRecord.get_motor_collection()
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + settings.IDEMPOTENCY_WAIT_SECONDS
+    delay = 0.05
+    while True:
+        record = await collection.find_one({"_id": record_id})
+        if record is None:
+            try:
+                await collection.insert_one({
+                    "_id": record_id, "fingerprint": digest, "status": "in_progress",
+                    "response": None, "created_at": datetime.utcnow(),
+                })
+            except DuplicateKeyError:
+                continue  # claimed by a concurrent copy; read its record
+            try:
+                response = await handler()
+            except BaseException:
+                await collection.delete_one({"_id": record_id, "status": "in_progress"})
+                raise
+            await collection.update_one({"_id": record_id}, {"$set": {"status": "done", "response": response}})
+            return response
+
+        if record["fingerprint"] != digest:
+            raise IdempotencyConflict(key)
+        if record["status"] == "done":
+            return record["response"]
+        if record["created_at"] < datetime.utcnow() - timedelta(seconds=settings.IDEMPOTENCY_LOCK_SECONDS):
+            # Abandoned by its owner; whoever deletes it claims the key next
+            await collection.delete_one({"_id": record_id, "status": "in_progress", "created_at": record["created_at"]})
+            continue
+        if loop.time() >= deadline:
+            raise RequestInProgress(key)
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, 0.5)
@@ -1,8 +1,78 @@
 """
 Inventory service for stock management.
+
+Stock is only ever taken with a conditional update (`stock >= qty` with
+`$inc: -qty`), so concurrent buyers cannot drive it negative.
+
+Checkout holds stock while a payment is pending. The products are
+decremented up front, and a StockReservation records the hold. Each held
+product also carries the reservation id in HOLDS_FIELD until the hold is
+committed (order placed) or released (payment abandoned). Giving stock back
+is conditional on that marker, so it happens at most once whoever releases.
+A bulk reserve that comes up short also uses the marker to undo the
+products it did take.
+
+Holds past their expiry are released by a background sweep. A TTL index
+deletes reservations some time after they were committed or released;
+held ones are never deleted, so their stock can always be given back.
+
+Every stock move is reported to the low-stock detector, which re-checks
+just the products that moved.
 """
 
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import ReturnDocument, UpdateOne
+
+from app.core.config import settings
+from ..models.inventory import ReservedItem, StockReservation
 from ..models.product import Product
+from .low_stock import low_stock_detector
+
+logger = logging.getLogger(__name__)
+
+HOLDS_FIELD = "stock_holds"  # ids of the reservations holding a product's stock
+
+
+class InsufficientStock(Exception):
+    """
+    Some products could not be reserved; nothing was held.
+    """
+
+    def __init__(self, product_ids: List[str]) -> None:
+        super().__init__(f"Insufficient stock for: {', '.join(product_ids)}")
+        self.product_ids = product_ids
+
+
+def _object_id(product_id: str) -> Optional[ObjectId]:
+    try:
+        return ObjectId(product_id)
+    except (InvalidId, TypeError):
+        return None
+
+
+def _quantities(items: Iterable[Tuple[str, int]]) -> Dict[str, int]:
+    # Sizes of one product share its stock, so lines are summed per product
+    quantities: Dict[str, int] = {}
+    for product_id, quantity in items:
+        if quantity > 0:
+            quantities[product_id] = quantities.get(product_id, 0) + quantity
+    return quantities
+
+
+def _take(product_id: ObjectId, quantity: int, reservation_id: str) -> Tuple[dict, dict]:
+    """
+    Filter and update holding `quantity` of a product for a reservation.
+    """
+    return (
+        {"_id": product_id, "stock": {"$gte": quantity}, HOLDS_FIELD: {"$ne": reservation_id}},
+        {"$inc": {"stock": -quantity}, "$push": {HOLDS_FIELD: reservation_id}},
+    )
 
 
 class InventoryService:
@@ -23,27 +93,217 @@ class InventoryService:
                 product = await Product.find_one(Product.id == int(product_id))
             except ValueError:
                 pass
-        
+
         if not product:
             return False
-            
+
         # Check stock
         if hasattr(product, 'stock'):
             return product.stock >= quantity
         return False
 
     @staticmethod
-    async def update_stock(product_id: str, quantity: int) -> None:
+    async def update_stock(product_id: str, quantity: int) -> bool:
         """
-        Update stock after sale.
+        Take stock after a sale outside checkout; False if there is not enough.
         """
-        product = await Product.get(product_id)
-        if not product:
+        oid = _object_id(product_id)
+        if oid is None:
+            return False
+        taken = await Product.get_motor_collection().find_one_and_update(
+            {"_id": oid, "stock": {"$gte": quantity}},
+            {"$inc": {"stock": -quantity}},
+            projection={"_id": 1},
+        )
+        if taken is None:
+            return False
+        low_stock_detector.stock_changed([oid])
+        return True
+
+    # Reservations
+
+    @staticmethod
+    async def _open(reservation_id: str, quantities: Dict[str, int], user_id: Optional[str]) -> StockReservation:
+        # Recorded before any stock is taken, so a crash in between leaves nothing to give back
+        reservation = StockReservation(
+            reservation_id=reservation_id,
+            user_id=user_id,
+            items=[ReservedItem(product_id=product_id, quantity=quantity) for product_id, quantity in quantities.items()],
+            expires_at=datetime.utcnow() + timedelta(minutes=settings.STOCK_HOLD_MINUTES),
+        )
+        await reservation.insert()
+        return reservation
+
+    @staticmethod
+    async def reserve(reservation_id: str, product_id: str, quantity: int, user_id: Optional[str] = None) -> bool:
+        """
+        Hold stock of one product under a new reservation; False if there is not enough.
+        """
+        oid = _object_id(product_id)
+        if oid is None or quantity <= 0:
+            return False
+        reservation = await InventoryService._open(reservation_id, {product_id: quantity}, user_id)
+        query, update = _take(oid, quantity, reservation_id)
+        taken = await Product.get_motor_collection().find_one_and_update(query, update, projection={"_id": 1})
+        if taken is None:
+            await reservation.delete()
+            return False
+        low_stock_detector.stock_changed([oid])
+        return True
+
+    @staticmethod
+    async def reserve_items(reservation_id: str, items: Iterable[Tuple[str, int]], user_id: Optional[str] = None) -> StockReservation:
+        """
+        Hold stock for a whole cart ((product id, quantity) lines) in one
+        bulk write. Either every product is held or none is; raises
+        InsufficientStock naming the products that were short.
+        """
+        quantities = _quantities(items)
+        unknown = [product_id for product_id in quantities if _object_id(product_id) is None]
+        if unknown:
+            raise InsufficientStock(unknown)
+        reservation = await InventoryService._open(reservation_id, quantities, user_id)
+        if not quantities:
+            return reservation
+
+        collection = Product.get_motor_collection()
+        result = await collection.bulk_write(
+            [UpdateOne(*_take(ObjectId(product_id), quantity, reservation_id)) for product_id, quantity in quantities.items()],
+            ordered=False,
+        )
+        if result.modified_count == len(quantities):
+            low_stock_detector.stock_changed(quantities)
+            return reservation
+
+        # Some products were short: the marker tells which ones were taken and need giving back
+        held = await collection.find(
+            {"_id": {"$in": [ObjectId(product_id) for product_id in quantities]}, HOLDS_FIELD: reservation_id},
+            {"_id": 1},
+        ).to_list(length=None)
+        held_ids = {str(doc["_id"]) for doc in held}
+        await InventoryService.release(reservation_id)
+        raise InsufficientStock([product_id for product_id in quantities if product_id not in held_ids])
+
+    @staticmethod
+    async def holds(reservation_id: str, items: Iterable[Tuple[str, int]]) -> bool:
+        """
+        True if the reservation is still held for exactly these (product id, quantity) lines.
+        """
+        reservation = await StockReservation.get_motor_collection().find_one(
+            {"reservation_id": reservation_id, "status": "held"}, {"items": 1}
+        )
+        if reservation is None:
+            return False
+        return {item["product_id"]: item["quantity"] for item in reservation["items"]} == _quantities(items)
+
+    @staticmethod
+    async def _claim(reservation_id: str, status: str, session=None) -> Optional[dict]:
+        """
+        Move a held reservation to `status`; None if it is no longer held.
+        Commit and release both claim first, so only one of them wins.
+        """
+        return await StockReservation.get_motor_collection().find_one_and_update(
+            {"reservation_id": reservation_id, "status": "held"},
+            {"$set": {"status": status, "closed_at": datetime.utcnow()}},
+            return_document=ReturnDocument.AFTER,
+            session=session,
+        )
+
+    @staticmethod
+    async def commit(reservation_id: str, session=None) -> bool:
+        """
+        The order was placed: the held stock is sold. False if the hold was
+        already released (e.g. it expired) or never existed. Pass a session
+        to commit inside a transaction.
+        """
+        reservation = await InventoryService._claim(reservation_id, "committed", session)
+        if reservation is None:
+            return False
+        oids = [oid for oid in (_object_id(item["product_id"]) for item in reservation["items"]) if oid is not None]
+        if oids:
+            await Product.get_motor_collection().update_many(
+                {"_id": {"$in": oids}}, {"$pull": {HOLDS_FIELD: reservation_id}}, session=session
+            )
+        return True
+
+    @staticmethod
+    async def release(reservation_id: str) -> bool:
+        """
+        Give held stock back (payment abandoned or failed). False if the
+        reservation was not held.
+        """
+        reservation = await InventoryService._claim(reservation_id, "released")
+        if reservation is None:
+            return False
+        await InventoryService._give_back(reservation_id, reservation["items"])
+        return True
+
+    @staticmethod
+    async def _give_back(reservation_id: str, items: List[dict]) -> None:
+        requests = []
+        for item in items:
+            oid = _object_id(item["product_id"])
+            if oid is not None:
+                # Only products still marked with this hold, so stock is returned at most once
+                requests.append(UpdateOne(
+                    {"_id": oid, HOLDS_FIELD: reservation_id},
+                    {"$inc": {"stock": item["quantity"]}, "$pull": {HOLDS_FIELD: reservation_id}},
+                ))
+        if requests:
+            await Product.get_motor_collection().bulk_write(requests, ordered=False)
+            low_stock_detector.stock_changed(item["product_id"] for item in items)
+
+    @staticmethod
+    async def release_expired(now: Optional[datetime] = None) -> int:
+        """
+        Release every hold past its expiry; returns how many were released.
+        """
+        now = now or datetime.utcnow()
+        released = 0
+        collection = StockReservation.get_motor_collection()
+        while True:
+            reservation = await collection.find_one_and_update(
+                {"status": "held", "expires_at": {"$lte": now}},
+                {"$set": {"status": "released", "closed_at": datetime.utcnow()}},
+                return_document=ReturnDocument.AFTER,
+            )
+            if reservation is None:
+                return released
+            await InventoryService._give_back(reservation["reservation_id"], reservation["items"])
+            released += 1
+
+
+class ReservationSweeper:
+    """
+    Releases lapsed holds on the running event loop.
+    """
+
+    def __init__(self, interval_seconds: float) -> None:
+        self.interval_seconds = interval_seconds
+        self._task: Optional[asyncio.Task] = None
+
+    async def _sweep_forever(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval_seconds)
             try:
-                product = await Product.find_one(Product.id == int(product_id))
-            except ValueError:
+                released = await InventoryService.release_expired()
+                if released:
+                    logger.info("Released %d expired stock holds", released)
+            except Exception:
+                logger.exception("Stock hold sweep failed")
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._sweep_forever())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
                 pass
-                
-        if product and hasattr(product, 'stock'):
-            product.stock -= quantity
-            db.commit()
\ No newline at end of file
+            self._task = None
+
+
+reservation_sweeper = ReservationSweeper(settings.STOCK_HOLD_SWEEP_SECONDS)
@@ -0,0 +1,294 @@
+"""
+Low-stock detection and alerts.
+
+A product is low when its stock is at or below its reorder threshold
+(Product.reorder_threshold, else LOW_STOCK_THRESHOLD). A store's entry for
+one size is low when its quantity is at or below the store's threshold
+(Store.reorder_threshold, else STORE_LOW_STOCK_THRESHOLD). Both carry a
+`low_stock` flag with a partial index over the flagged documents only, so
+counting or listing low stock reads those index keys and nothing else.
+
+Flags are kept current incrementally. Stock moves (sales, holds, give-backs)
+and product saves queue the product ids; a background checker re-reads just
+those products and flips the flags whose state changed. Store entries are
+flagged when store_inventory writes them. Each transition to low publishes
+an alert to the SSE subscribers of this process: admins see every alert,
+shopkeepers the alerts for their own products.
+"""
+
+import asyncio
+import json
+import logging
+from datetime import datetime
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Sequence
+
+from bson import ObjectId
+from bson.errors import InvalidId
+
+from app.core.config import settings
+from ..models.inventory import STORE_LOW_STOCK_INDEX, StoreInventory
+from ..models.product import LOW_STOCK_INDEX, Product
+from ..models.store import Store
+from . import catalog_events
+
+logger = logging.getLogger(__name__)
+
+LOW_STOCK_FIELD = "low_stock"
+CHECK_BATCH = 500  # product ids re-read per query
+HEARTBEAT_SECONDS = 15.0  # SSE comment sent when idle, so proxies keep the stream open
+
+
+def product_threshold(doc: dict) -> int:
+    threshold = doc.get("reorder_threshold")
+    return settings.LOW_STOCK_THRESHOLD if threshold is None else threshold
+
+
+def _low_stock_expression() -> dict:
+    return {"$lte": [{"$ifNull": ["$stock", 0]}, {"$ifNull": ["$reorder_threshold", settings.LOW_STOCK_THRESHOLD]}]}
+
+
+def _object_ids(product_ids: Iterable) -> List[ObjectId]:
+    oids = []
+    for product_id in product_ids:
+        try:
+            oids.append(ObjectId(str(product_id)))
+        except (InvalidId, TypeError):
+            continue
+    return oids
+
+
+async def recompute() -> None:
+    """
+    Set every product's flag from its stock and threshold, server-side
+    (after seeding, or when LOW_STOCK_THRESHOLD changes).
+    """
+    await Product.get_motor_collection().update_many({}, [{"$set": {LOW_STOCK_FIELD: _low_stock_expression()}}])
+
+
+async def ensure_flagged() -> None:
+    """
+    Flag the products if they never were (e.g. an existing database).
+    """
+    if await Product.get_motor_collection().find_one({LOW_STOCK_FIELD: {"$exists": False}}, {"_id": 1}):
+        await recompute()
+
+
+async def count_low_stock(shopkeeper_id: Optional[str] = None) -> int:
+    """
+    Products at or below their reorder threshold, optionally one shopkeeper's.
+    """
+    query: Dict[str, object] = {LOW_STOCK_FIELD: True}
+    if shopkeeper_id is not None:
+        query["shopkeeper_id"] = shopkeeper_id
+    return await Product.get_motor_collection().count_documents(query, hint=LOW_STOCK_INDEX)
+
+
+async def low_stock_products(shopkeeper_id: Optional[str] = None, limit: int = 100) -> List[dict]:
+    query: Dict[str, object] = {LOW_STOCK_FIELD: True}
+    if shopkeeper_id is not None:
+        query["shopkeeper_id"] = shopkeeper_id
+    cursor = Product.get_motor_collection().find(
+        query, {"name": 1, "stock": 1, "reorder_threshold": 1, "shopkeeper_id": 1}
+    ).hint(LOW_STOCK_INDEX).limit(limit)
+    return [
+        {"product_id": str(doc["_id"]), "name": doc.get("name"), "stock": doc.get("stock", 0),
+         "threshold": product_threshold(doc), "shopkeeper_id": doc.get("shopkeeper_id")}
+        async for doc in cursor
+    ]
+
+
+async def low_stock_entries(store_location: Optional[str] = None, limit: int = 100) -> List[dict]:
+    """
+    Store entries (product, store, size) at or below their store's threshold.
+    """
+    query: Dict[str, object] = {"low_stock": True}
+    if store_location is not None:
+        query["store_location"] = store_location
+    cursor = StoreInventory.get_motor_collection().find(
+        query, {"product_id": 1, "store_location": 1, "size": 1, "quantity": 1}
+    ).hint(STORE_LOW_STOCK_INDEX).limit(limit)
+    return await cursor.to_list(length=limit)
+
+
+class LowStockAlerts:
+    """
+    Fan-out of alerts to SSE subscribers. A subscriber that stops reading
+    loses its oldest alerts rather than holding memory.
+    """
+
+    def __init__(self, max_queued: int = 100) -> None:
+        self.max_queued = max_queued
+        self._subscribers: Dict[asyncio.Queue, Optional[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(self, shopkeeper_id: Optional[str] = None) -> asyncio.Queue:
+        """
+        Queue of alerts: all of them, or only one shopkeeper's products'.
+        """
+        queue: asyncio.Queue = asyncio.Queue(self.max_queued)
+        self._subscribers[queue] = shopkeeper_id
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        self._subscribers.pop(queue, None)
+
+    def publish(self, alert: dict) -> None:
+        for queue, shopkeeper_id in list(self._subscribers.items()):
+            if shopkeeper_id is not None and alert.get("shopkeeper_id") != shopkeeper_id:
+                continue
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(alert)
+
+    async def events(self, shopkeeper_id: Optional[str] = None) -> AsyncIterator[str]:
+        """
+        Server-Sent Events stream of alerts, with a comment line when idle.
+        """
+        queue = self.subscribe(shopkeeper_id)
+        try:
+            while True:
+                try:
+                    alert = await asyncio.wait_for(queue.get(), HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"event: low_stock\ndata: {json.dumps(alert)}\n\n"
+        finally:
+            self.unsubscribe(queue)
+
+
+class LowStockDetector:
+    """
+    Catalog listener and stock-move hook queueing product ids for a
+    background checker that keeps the low-stock flags current.
+    """
+
+    def __init__(self, alerts: LowStockAlerts) -> None:
+        self.alerts = alerts
+        self._queue: Optional[asyncio.Queue] = None
+        self._checker: Optional[asyncio.Task] = None
+        self._store_thresholds: Optional[Dict[str, int]] = None
+
+    # Thresholds
+
+    async def ensure_loaded(self) -> None:
+        if self._store_thresholds is None:
+            await self.load_store_thresholds()
+
+    async def load_store_thresholds(self) -> None:
+        cursor = Store.get_motor_collection().find({"reorder_threshold": {"$ne": None}}, {"_id": 0, "name": 1, "reorder_threshold": 1})
+        self._store_thresholds = {doc["name"]: doc["reorder_threshold"] async for doc in cursor}
+
+    def store_threshold(self, store_location: str) -> int:
+        return (self._store_thresholds or {}).get(store_location, settings.STORE_LOW_STOCK_THRESHOLD)
+
+    # Hooks
+
+    def stock_changed(self, product_ids: Iterable) -> None:
+        """
+        Call after stock of these products moved (either way).
+        """
+        if self._queue is not None:
+            self._queue.put_nowait([str(product_id) for product_id in product_ids])
+
+    def on_product_saved(self, product: Product) -> None:
+        self.stock_changed([product.id])
+
+    def on_products_saved(self, products) -> None:
+        self.stock_changed(product.id for product in products)
+
+    def on_product_deleted(self, product_id: str) -> None:
+        pass  # the flag goes with the document
+
+    # Checking
+
+    async def check(self, product_ids: Sequence) -> List[dict]:
+        """
+        Bring these products' flags up to date; returns the alerts published.
+        """
+        alerts = []
+        collection = Product.get_motor_collection()
+        oids = _object_ids(product_ids)
+        for start in range(0, len(oids), CHECK_BATCH):
+            cursor = collection.find(
+                {"_id": {"$in": oids[start:start + CHECK_BATCH]}},
+                {"name": 1, "stock": 1, "reorder_threshold": 1, "shopkeeper_id": 1, LOW_STOCK_FIELD: 1},
+            )
+            async for doc in cursor:
+                stock, threshold = doc.get("stock", 0), product_threshold(doc)
+                low = stock <= threshold
+                if low == doc.get(LOW_STOCK_FIELD):
+                    continue
+                # Only if the stock is still what was read; a later move queued its own check
+                result = await collection.update_one({"_id": doc["_id"], "stock": stock}, {"$set": {LOW_STOCK_FIELD: low}})
+                if low and result.modified_count:
+                    alert = {"kind": "product", "product_id": str(doc["_id"]), "name": doc.get("name"),
+                             "shopkeeper_id": doc.get("shopkeeper_id"), "stock": stock, "threshold": threshold,
+                             "at": datetime.utcnow().isoformat()}
+                    self.alerts.publish(alert)
+                    alerts.append(alert)
+        return alerts
+
+    async def store_entries_low(self, entries: Sequence[dict]) -> None:
+        """
+        Publish alerts for store entries (as written by store_inventory) that just became low.
+        """
+        if not entries:
+            return
+        products = {
+            str(doc["_id"]): doc
+            async for doc in Product.get_motor_collection().find(
+                {"_id": {"$in": _object_ids({entry["product_id"] for entry in entries})}}, {"name": 1, "shopkeeper_id": 1}
+            )
+        }
+        for entry in entries:
+            product = products.get(entry["product_id"], {})
+            self.alerts.publish({
+                "kind": "store", "product_id": entry["product_id"], "name": product.get("name"),
+                "shopkeeper_id": product.get("shopkeeper_id"), "store_location": entry["store_location"],
+                "size": entry["size"], "quantity": entry["quantity"],
+                "threshold": self.store_threshold(entry["store_location"]), "at": datetime.utcnow().isoformat(),
+            })
+
+    async def _check_forever(self) -> None:
+        while True:
+            batches = [await self._queue.get()]
+            while not self._queue.empty():
+                batches.append(self._queue.get_nowait())
+            try:
+                await self.check(list(dict.fromkeys(product_id for batch in batches for product_id in batch)))
+            except Exception:
+                logger.exception("Low-stock check failed")
+            finally:
+                for _ in batches:
+                    self._queue.task_done()
+
+    def start(self) -> None:
+        if self._checker is None or self._checker.done():
+            self._queue = asyncio.Queue()
+            self._checker = asyncio.create_task(self._check_forever())
+
+    async def drain(self) -> None:
+        """
+        Wait until every queued product has been checked.
+        """
+        if self._queue is not None:
+            await self._queue.join()
+
+    async def stop(self) -> None:
+        if self._checker is not None:
+            await self.drain()
+            self._checker.cancel()
+            try:
+                await self._checker
+            except asyncio.CancelledError:
+                pass
+            self._checker = None
+            self._queue = None
+
+
+low_stock_alerts = LowStockAlerts()
+low_stock_detector = LowStockDetector(low_stock_alerts)
+catalog_events.register(low_stock_detector)
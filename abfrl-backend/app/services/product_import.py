@@ -0,0 +1,216 @@
+"""
+Streaming bulk product import (NDJSON or CSV).
+
+The upload is read chunk by chunk from the request body and parsed into
+rows as lines complete. Rows are validated and inserted in batches of
+IMPORT_BATCH_SIZE with insert_many(ordered=False), so a bad row costs only
+itself. Memory stays bounded by one batch (plus at most MAX_REPORTED_ERRORS
+error entries) whatever the file size.
+
+CSV files need a header row; `colors` cells hold "red|blue". NDJSON rows
+are JSON objects and may also carry `inventory` entries.
+"""
+
+import codecs
+import csv
+import json
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from beanie import PydanticObjectId
+from pydantic import ValidationError
+from pymongo.errors import BulkWriteError
+
+from ..models.product import Product
+from ..schemas.product import ProductImportRow
+from . import catalog_events
+
+IMPORT_BATCH_SIZE = 500
+MAX_REPORTED_ERRORS = 1000
+MAX_LINE_BYTES = 1 << 20  # a longer line means a broken file, not a product
+
+FORMATS = ("ndjson", "csv")
+
+
+class ImportFormatError(ValueError):
+    """
+    The file cannot be parsed any further.
+    """
+
+
+def format_for_content_type(content_type: Optional[str]) -> Optional[str]:
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    if media_type in ("application/x-ndjson", "application/ndjson", "application/jsonl", "application/x-jsonlines"):
+        return "ndjson"
+    if media_type in ("text/csv", "application/csv"):
+        return "csv"
+    return None
+
+
+async def _lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, str]]:
+    """
+    (line number, text) of each line, decoded incrementally.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    line_no = 0
+    try:
+        async for chunk in chunks:
+            pending += decoder.decode(chunk)
+            *lines, pending = pending.split("\n")
+            for line in lines:
+                line_no += 1
+                yield line_no, line[:-1] if line.endswith("\r") else line
+            if len(pending) > MAX_LINE_BYTES:
+                raise ImportFormatError(f"Line {line_no + 1} is longer than {MAX_LINE_BYTES} bytes")
+        pending += decoder.decode(b"", final=True)
+    except UnicodeDecodeError:
+        raise ImportFormatError(f"Line {line_no + 1} is not valid UTF-8")
+    if pending:
+        yield line_no + 1, pending[:-1] if pending.endswith("\r") else pending
+
+
+async def ndjson_rows(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, Optional[dict], Optional[str]]]:
+    """
+    (row number, row, error) per non-blank line.
+    """
+    async for line_no, line in _lines(chunks):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield line_no, None, f"Invalid JSON: {e}"
+            continue
+        if not isinstance(row, dict):
+            yield line_no, None, "Expected a JSON object"
+            continue
+        yield line_no, row, None
+
+
+async def csv_rows(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, Optional[dict], Optional[str]]]:
+    """
+    (row number, row, error) per record; the row number is the line the
+    record starts on. Quoted fields may span lines.
+    """
+    header: Optional[List[str]] = None
+    parts: List[str] = []
+    start = 0
+    async for line_no, line in _lines(chunks):
+        if not parts:
+            start = line_no
+        parts.append(line)
+        record = "\n".join(parts)
+        # An odd number of quotes means a quoted field continues on the next line
+        if record.count('"') % 2:
+            if len(record) > MAX_LINE_BYTES:
+                raise ImportFormatError(f"Unterminated quoted field starting on line {start}")
+            continue
+        parts = []
+        if not record.strip():
+            continue
+        try:
+            values = next(csv.reader([record]))
+        except csv.Error as e:
+            yield start, None, f"Invalid CSV: {e}"
+            continue
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        if len(values) != len(header):
+            yield start, None, f"Expected {len(header)} fields, got {len(values)}"
+            continue
+        # Empty cells fall back to the field defaults
+        yield start, {name: value for name, value in zip(header, values) if value != ""}, None
+    if parts:
+        raise ImportFormatError(f"Unterminated quoted field starting on line {start}")
+
+
+def _error_messages(error: ValidationError) -> List[str]:
+    return [f"{'.'.join(str(part) for part in item['loc']) or 'row'}: {item['msg']}" for item in error.errors()]
+
+
+class ProductImport:
+    """
+    Collects one import's rows into batches, inserts them and keeps the
+    summary reported back to the uploader.
+    """
+
+    def __init__(self, owner: Optional[Dict[str, object]] = None) -> None:
+        # Fields set on every imported product (e.g. the importing shopkeeper)
+        self.owner = owner or {}
+        self.received = 0
+        self.inserted = 0
+        self.failed = 0
+        self.errors: List[dict] = []
+        self._batch: List[Tuple[int, Product]] = []
+
+    def _error(self, row_no: int, messages: List[str]) -> None:
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"row": row_no, "errors": messages})
+
+    async def add(self, row_no: int, row: Optional[dict], error: Optional[str]) -> None:
+        self.received += 1
+        if error is not None:
+            self._error(row_no, [error])
+            return
+        try:
+            data = ProductImportRow.model_validate(row)
+        except ValidationError as e:
+            self._error(row_no, _error_messages(e))
+            return
+        fields = data.model_dump(exclude={"colors"})
+        product = Product(**fields, metadata_info={"colors": data.colors} if data.colors else {}, **self.owner)
+        # insert_many skips document event hooks, so derive the listing fields here
+        product.denormalize_listing_fields()
+        product.id = PydanticObjectId()
+        self._batch.append((row_no, product))
+        if len(self._batch) >= IMPORT_BATCH_SIZE:
+            await self.flush()
+
+    async def flush(self) -> None:
+        if not self._batch:
+            return
+        batch, self._batch = self._batch, []
+        failed: Dict[int, str] = {}
+        try:
+            await Product.insert_many([product for _, product in batch], ordered=False)
+        except BulkWriteError as e:
+            failed = {error["index"]: error.get("errmsg", "write failed") for error in e.details.get("writeErrors", [])}
+        saved = []
+        for index, (row_no, product) in enumerate(batch):
+            if index in failed:
+                self._error(row_no, [failed[index]])
+            else:
+                saved.append(product)
+        self.inserted += len(saved)
+        catalog_events.notify_products_saved(saved)
+
+    def summary(self, error: Optional[str] = None) -> dict:
+        result = {
+            "received": self.received,
+            "inserted": self.inserted,
+            "failed": self.failed,
+            "errors": self.errors,
+            "errors_truncated": self.failed > len(self.errors),
+        }
+        if error:
+            # Rows before the point of failure were imported
+            result["aborted"] = error
+        return result
+
+
+async def import_products(chunks: AsyncIterator[bytes], file_format: str, owner: Optional[Dict[str, object]] = None) -> dict:
+    """
+    Import every row of an NDJSON or CSV byte stream and return the summary.
+    """
+    rows = ndjson_rows(chunks) if file_format == "ndjson" else csv_rows(chunks)
+    job = ProductImport(owner)
+    try:
+        async for row_no, row, error in rows:
+            await job.add(row_no, row, error)
+    except ImportFormatError as e:
+        await job.flush()
+        return job.summary(str(e))
+    await job.flush()
+    return job.summary()
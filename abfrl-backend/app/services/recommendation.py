@@ -4,6 +4,8 @@ Recommendation service using vector store.
 
 from typing import List
 
+from .catalog_index import catalog_index
+from .copurchase import copurchase_index
 from .vector_store import VectorStoreService
 
 
@@ -13,8 +15,27 @@ class RecommendationService:
     """
 
     @staticmethod
-    def get_recommendations(query: str) -> List[str]:
+    async def get_recommendations(query: str, limit: int = 5) -> List[dict]:
         """
         Get product recommendations based on query.
         """
-        return VectorStoreService.search(query)
\ No newline at end of file
+        await catalog_index.ensure_loaded()
+        product_ids = await VectorStoreService.search(query, limit)
+        return [dict(catalog_index.get(product_id)) for product_id in product_ids if catalog_index.get(product_id)]
+
+
+    @staticmethod
+    async def get_frequently_bought_together(product_id: str, limit: int = 5) -> List[dict]:
+        """
+        Products most often ordered together with the given one, most frequent first.
+        """
+        await catalog_index.ensure_loaded()
+        products = []
+        # Neighbours may include products deleted since the co-purchase job ran
+        for other_id, count in copurchase_index.get(product_id, limit=limit * 2):
+            card = catalog_index.get(other_id)
+            if card:
+                products.append({**card, "bought_together_count": count})
+            if len(products) == limit:
+                break
+        return products
@@ -0,0 +1,418 @@
+"""
+Typo-tolerant product search.
+
+Every word of a product's name, category and description goes into a
+vocabulary. The vocabulary is indexed by character trigrams, so for a query
+word ("jens", "tshrit") the words sharing trigrams with it are found with
+one bincount over NumPy posting arrays. The best of those are re-ranked by
+edit distance (with transpositions). Each vocabulary word points at the
+products containing it, weighted by the field it appears in, and products
+are scored with vectorised array updates that stop as soon as the top
+results are settled.
+
+The index is built once per process and kept current through the catalog
+change hook. Updated or deleted products are tombstoned in an alive mask,
+and the postings are compacted when tombstones pile up.
+"""
+
+import asyncio
+import re
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from ..models.product import Product
+from . import catalog_events
+from .catalog_index import tokenize
+
+# A word in the name says more than one in the description
+FIELD_WEIGHTS = (("name", 3.0), ("category", 2.0), ("description", 1.0))
+
+_MIN_WORD_SIMILARITY = 0.6
+_CANDIDATE_WORDS = 24  # trigram candidates re-ranked by edit distance per query word
+_MATCHED_WORDS = 6  # vocabulary words used per query word
+_SIMILAR_CACHE_SIZE = 10_000  # memoised query word -> similar words
+_CHUNK_ROWS = 512  # postings scored between early-stop checks
+_SCORE_TOLERANCE = 1e-4  # well below the 3 decimals scores are reported with
+
+# Hyphenated words are also indexed joined up, so "tshirt" finds "T-Shirt"
+_COMPOUND_RE = re.compile(r"[a-z0-9]+(?:-[a-z0-9]+)+")
+
+# Query words that match half the catalog and say nothing about the product
+_QUERY_STOPWORDS = {"a", "an", "and", "for", "in", "of", "on", "the", "to", "with"}
+
+
+def _words(text: str) -> List[str]:
+    if not text:
+        return []
+    return tokenize(text) + [compound.replace("-", "") for compound in _COMPOUND_RE.findall(text.lower())]
+
+
+def _trigrams(word: str) -> List[str]:
+    padded = f" {word} "
+    return list({padded[i:i + 3] for i in range(len(padded) - 2)})
+
+
+def _edit_distance(a: str, b: str) -> int:
+    """
+    Optimal string alignment distance (Levenshtein plus adjacent transpositions).
+    """
+    previous2: List[int] = []
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        previous2, previous = previous, current
+    return previous[len(b)]
+
+
+def word_similarity(query_word: str, word: str) -> float:
+    if query_word == word:
+        return 1.0
+    # A query word that is a prefix of a longer word (typing in progress) matches it well
+    if len(query_word) >= 3 and word.startswith(query_word):
+        return 0.9
+    return 1.0 - _edit_distance(query_word, word) / max(len(query_word), len(word))
+
+
+class _Postings:
+    """
+    Append-only int32 lists with NumPy views rebuilt on demand.
+    """
+
+    __slots__ = ("values", "weights", "_array", "_segments")
+
+    def __init__(self) -> None:
+        self.values: List[int] = []
+        self.weights: List[float] = []
+        self._array: Optional[np.ndarray] = None
+        self._segments: Optional[List[Tuple[float, np.ndarray]]] = None
+
+    def append(self, value: int, weight: float = 1.0) -> None:
+        self.values.append(value)
+        self.weights.append(weight)
+        self._array = self._segments = None
+
+    def reset(self, values: List[int], weights: List[float]) -> None:
+        self.values, self.weights = values, weights
+        self._array = self._segments = None
+
+    def array(self) -> np.ndarray:
+        if self._array is None:
+            self._array = np.array(self.values, dtype=np.int32)
+        return self._array
+
+    def segments(self) -> List[Tuple[float, np.ndarray]]:
+        """
+        The values grouped by weight, highest weight first.
+        """
+        if self._segments is None:
+            values, weights = self.array(), np.array(self.weights, dtype=np.float32)
+            self._segments = [(float(weight), values[weights == weight]) for weight in sorted(set(self.weights), reverse=True)]
+        return self._segments
+
+
+class SearchIndex:
+    """
+    Trigram index over the catalog vocabulary plus word -> product postings.
+    """
+
+    def __init__(self) -> None:
+        self._clear()
+        self._loaded = False
+        self._lock = asyncio.Lock()
+
+    def _clear(self) -> None:
+        # Products (rows are never reused; a re-saved product gets a new row)
+        self._ids: List[Optional[str]] = []
+        self._row_of: Dict[str, int] = {}
+        self._alive = np.zeros(0, dtype=bool)
+        # Vocabulary
+        self._words: List[str] = []
+        self._word_id: Dict[str, int] = {}
+        self._trigram_counts = np.zeros(0, dtype=np.float32)
+        self._trigram_postings: Dict[str, _Postings] = {}
+        self._word_postings: List[_Postings] = []
+        self._similar_cache: Dict[str, List[Tuple[int, float]]] = {}
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def __len__(self) -> int:
+        return len(self._row_of)
+
+    async def ensure_loaded(self) -> None:
+        """
+        Index the whole catalog once; later calls are no-ops.
+        """
+        if self._loaded:
+            return
+        async with self._lock:
+            if self._loaded:
+                return
+            fields = {name: 1 for name, _ in FIELD_WEIGHTS}
+            docs = await Product.get_motor_collection().find({}, fields).to_list(length=None)
+            self.rebuild(docs)
+
+    def rebuild(self, products) -> None:
+        self._clear()
+        for product in products:
+            self._add(product)
+        self._loaded = True
+
+    # Building
+
+    def _word(self, word: str) -> int:
+        word_id = self._word_id.get(word)
+        if word_id is None:
+            word_id = self._word_id[word] = len(self._words)
+            self._words.append(word)
+            self._word_postings.append(_Postings())
+            self._similar_cache.clear()
+            grams = _trigrams(word)
+            for gram in grams:
+                self._trigram_postings.setdefault(gram, _Postings()).append(word_id)
+            if word_id >= len(self._trigram_counts):
+                self._trigram_counts = np.resize(self._trigram_counts, max(64, 2 * len(self._trigram_counts)))
+            self._trigram_counts[word_id] = len(grams)
+        return word_id
+
+    def _add(self, product) -> None:
+        get = product.get if isinstance(product, dict) else lambda key, default=None: getattr(product, key, default)
+        product_id = str(get("_id") if isinstance(product, dict) else product.id)
+        row = len(self._ids)
+        self._ids.append(product_id)
+        self._row_of[product_id] = row
+        if row >= len(self._alive):
+            self._alive = np.resize(self._alive, max(64, 2 * len(self._alive)))
+        self._alive[row] = True
+
+        # Highest field weight per word
+        weights: Dict[str, float] = {}
+        for field, weight in FIELD_WEIGHTS:
+            for word in _words(get(field) or ""):
+                if weights.get(word, 0.0) < weight:
+                    weights[word] = weight
+        for word, weight in weights.items():
+            self._word_postings[self._word(word)].append(row, weight)
+
+    def _remove(self, product_id: str) -> None:
+        row = self._row_of.pop(product_id, None)
+        if row is not None:
+            self._alive[row] = False
+            self._ids[row] = None
+
+    def _maybe_compact(self) -> None:
+        dead = len(self._ids) - len(self._row_of)
+        if dead > 1024 and dead > len(self._row_of):
+            self._compact()
+
+    def _compact(self) -> None:
+        """
+        Drop tombstoned rows from every posting and renumber products.
+        """
+        live = np.flatnonzero(self._alive[:len(self._ids)])
+        new_row = np.full(len(self._ids), -1, dtype=np.int32)
+        new_row[live] = np.arange(len(live), dtype=np.int32)
+        for postings in self._word_postings:
+            rows, weights = postings.array(), np.array(postings.weights, dtype=np.float32)
+            keep = new_row[rows] >= 0 if len(rows) else np.zeros(0, dtype=bool)
+            postings.reset(new_row[rows[keep]].tolist(), weights[keep].tolist())
+        self._ids = [self._ids[row] for row in live]
+        self._row_of = {product_id: row for row, product_id in enumerate(self._ids)}
+        self._alive = np.ones(len(self._ids), dtype=bool)
+
+    # Catalog change hook
+
+    def on_product_saved(self, product: Product) -> None:
+        if self._loaded:
+            self._remove(str(product.id))
+            self._add(product)
+            self._maybe_compact()
+
+    def on_product_deleted(self, product_id: str) -> None:
+        if self._loaded:
+            self._remove(product_id)
+            self._maybe_compact()
+
+    # Search
+
+    def similar_words(self, query_word: str) -> List[Tuple[int, float]]:
+        """
+        Vocabulary words close to the query word as (word id, similarity), best first.
+        """
+        cached = self._similar_cache.get(query_word)
+        if cached is not None:
+            return cached
+
+        matches: Dict[int, float] = {}
+        exact = self._word_id.get(query_word)
+        if exact is not None:
+            matches[exact] = 1.0
+        grams = _trigrams(query_word)
+        postings = [self._trigram_postings[gram].array() for gram in grams if gram in self._trigram_postings]
+        if postings:
+            shared = np.bincount(np.concatenate(postings), minlength=len(self._words))
+            candidates = np.flatnonzero(shared)
+            # Dice coefficient on trigrams picks the candidates worth an edit distance
+            dice = 2.0 * shared[candidates] / (len(grams) + self._trigram_counts[candidates])
+            if len(candidates) > _CANDIDATE_WORDS:
+                best = np.argpartition(-dice, _CANDIDATE_WORDS - 1)[:_CANDIDATE_WORDS]
+                candidates = candidates[best]
+            for word_id in candidates.tolist():
+                if word_id in matches:
+                    continue
+                word = self._words[word_id]
+                # The length difference alone bounds the edit distance from below
+                too_far = abs(len(word) - len(query_word)) > (1 - _MIN_WORD_SIMILARITY) * max(len(word), len(query_word))
+                if too_far and not word.startswith(query_word):
+                    continue
+                similarity = word_similarity(query_word, word)
+                if similarity >= _MIN_WORD_SIMILARITY:
+                    matches[word_id] = similarity
+
+        result = sorted(matches.items(), key=lambda item: -item[1])[:_MATCHED_WORDS]
+        if len(self._similar_cache) >= _SIMILAR_CACHE_SIZE:
+            self._similar_cache.clear()
+        self._similar_cache[query_word] = result
+        return result
+
+    def search(self, query: str, limit: int = 20) -> List[Tuple[str, float]]:
+        """
+        (product id, score) pairs ranked by how well the products match the
+        query words. Each query word contributes its best-matching word in a
+        product (similarity times field weight).
+
+        Each query word's postings are visited best-first in impact segments
+        (one vocabulary word, one field weight) cut into chunks of rows, the
+        query words taking turns, and the walk stops once no unvisited
+        product, and no partially scored one, can still make the top `limit`
+        (the threshold algorithm), so broad words like "shirt" don't cost a
+        pass over every product containing them. Chunks of equal impact are
+        walked in row order, so products matching several query words are
+        completed early.
+        """
+        words = list(dict.fromkeys(word for word in tokenize(query) if word not in _QUERY_STOPWORDS))
+        if not words or not self._row_of:
+            return []
+
+        segments = []
+        for token, query_word in enumerate(words):
+            for word_id, similarity in self.similar_words(query_word):
+                for weight, rows in self._word_postings[word_id].segments():
+                    segments.append((similarity * weight, token, rows))
+        if not segments:
+            return []
+        segments.sort(key=lambda segment: -segment[0])
+        chunks = [
+            (value, token, rows[start:start + _CHUNK_ROWS], number, min(start + _CHUNK_ROWS, len(rows)))
+            for number, (value, token, rows) in enumerate(segments)
+            for start in range(0, len(rows), _CHUNK_ROWS)
+        ]
+        # Each query word's chunks best first (equal impact in row order), the words taking turns
+        chunks.sort(key=lambda chunk: (-chunk[0], chunk[2][0]))
+        turn = [0] * len(words)
+        ranked = []
+        for chunk in chunks:
+            ranked.append((turn[chunk[1]], chunk[1], chunk))
+            turn[chunk[1]] += 1
+        chunks = [chunk for _, _, chunk in sorted(ranked, key=lambda item: item[:2])]
+
+        # upper[token]: best contribution the token can still make (its next chunk)
+        upper = [0.0] * len(words)
+        next_value = [0.0] * len(chunks)
+        for i in range(len(chunks) - 1, -1, -1):
+            value, token = chunks[i][:2]
+            next_value[i] = upper[token]
+            upper[token] = value
+
+        n = len(self._ids)
+        total = np.zeros(n, dtype=np.float32)
+        # hit[token][row]: the product already got its best contribution for that token
+        hit = [np.zeros(n, dtype=bool) for _ in words]
+        seen_rows: List[np.ndarray] = []
+        best_seen = [0.0] * len(words)
+        walked = [0] * len(segments)  # rows of each segment visited so far (a prefix)
+        has_dead = len(self._row_of) < n
+        for i, (value, token, rows, number, end) in enumerate(chunks):
+            new = rows[~hit[token][rows]]
+            hit[token][new] = True
+            before = total[new]
+            total[new] = before + value
+            # Every contribution is positive, so a zero total means not seen before
+            first = new[before == 0]
+            if has_dead:
+                first = first[self._alive[first]]
+            seen_rows.append(first)
+            best_seen[token] = max(best_seen[token], value)
+            upper[token] = next_value[i]
+            walked[number] = end
+            # No seen product can outscore an unseen one yet, so there is nothing to check
+            if sum(upper) > sum(best_seen):
+                continue
+            if i + 1 < len(chunks):
+                remaining = [
+                    (value, token, rows[walked[number]:])
+                    for number, (value, token, rows) in enumerate(segments) if walked[number] < len(rows)
+                ]
+                final = self._final_candidates(total, hit, upper, seen_rows, limit, remaining)
+                if final is not None:
+                    rows, scores = final
+                    break
+        else:
+            rows = np.concatenate(seen_rows)
+            scores = total[rows]
+
+        if len(rows) == 0:
+            return []
+        k = min(limit, len(rows))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(self._ids[rows[i]], round(float(scores[i]), 3)) for i in top]
+
+    @staticmethod
+    def _final_candidates(total, hit, upper, seen_rows, limit, remaining) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """
+        The products making the top `limit` with their final scores, if no
+        other product can still overtake them; None if the walk must go on.
+        """
+        if sum(len(rows) for rows in seen_rows) < limit:
+            return None
+        rows = np.concatenate(seen_rows)
+        scores = total[rows]
+        # Scores add up in float32; a bound that only ties the kth must not look like it beats it
+        kth = np.partition(scores, len(scores) - limit)[len(scores) - limit] + _SCORE_TOLERANCE
+        if sum(upper) > kth:
+            return None
+        # Products outside the top may still gain from query words they have not matched yet
+        open_rows = (scores < kth - _SCORE_TOLERANCE) & (scores + sum(upper) > kth)
+        bound = scores[open_rows]
+        candidates = rows[open_rows]
+        for token_hit, token_upper in zip(hit, upper):
+            if token_upper:
+                bound = bound + token_upper * ~token_hit[candidates]
+        if np.any(bound > kth):
+            return None
+
+        keep = scores >= kth - _SCORE_TOLERANCE
+        rows, scores = rows[keep], scores[keep]
+        # The top products can still gain too: look them up in the segments not walked
+        # yet (best first, and each segment's rows are sorted) to settle their scores
+        pending = [~token_hit[rows] for token_hit in hit]
+        for value, token, segment_rows in remaining:
+            todo = np.flatnonzero(pending[token])
+            if len(todo) == 0 or len(segment_rows) == 0:
+                continue
+            at = np.searchsorted(segment_rows, rows[todo])
+            found = todo[segment_rows[np.minimum(at, len(segment_rows) - 1)] == rows[todo]]
+            scores[found] += value
+            pending[token][found] = False
+        return rows, scores
+
+search_index = SearchIndex()
+catalog_events.register(search_index)
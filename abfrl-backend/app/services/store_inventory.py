@@ -0,0 +1,253 @@
+"""
+Per-store availability.
+
+Product.inventory (store, size, quantity entries) stays the record admins
+and shopkeepers edit. The store_inventory collection holds the same
+entries one document per (product, store, size), so questions like "is
+this in M at store X" are index reads instead of product scans. Both of
+its indexes end in the fields the queries return, so the reads are
+covered: answered from the index without touching the documents.
+
+The collection is rebuilt server-side from products with one aggregation
+when it is empty at startup and after seeding. Product writes then reach
+it through the catalog change hook: each save queues that product's
+entries, and a background writer applies the queue in order. Entries at or
+below their store's reorder threshold are flagged low_stock on the way in
+(see services/low_stock.py).
+"""
+
+import asyncio
+import logging
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from pymongo import DeleteMany, ReplaceOne
+
+from app.core.config import settings
+from ..models.inventory import PRODUCT_AVAILABILITY_INDEX, STORE_AVAILABILITY_INDEX, StoreInventory
+from ..models.product import Product
+from ..models.store import Store
+from . import catalog_events
+from .low_stock import low_stock_detector
+
+logger = logging.getLogger(__name__)
+
+_COVERED = {"_id": 0, "product_id": 1, "store_location": 1, "size": 1, "quantity": 1}
+
+
+def entry_key(product_id: str, store_location: str, size: str) -> str:
+    return f"{product_id}|{store_location}|{size}"
+
+
+def _entries(product) -> Tuple[str, List[dict]]:
+    product_id = str(product.id)
+    entries = {}
+    for inv in product.inventory:
+        key = entry_key(product_id, inv.store_location, inv.size)
+        # Repeated (store, size) entries add up
+        quantity = entries[key]["quantity"] + inv.quantity if key in entries else inv.quantity
+        entries[key] = {"_id": key, "product_id": product_id, "store_location": inv.store_location, "size": inv.size, "quantity": quantity}
+    return product_id, list(entries.values())
+
+
+def _rebuild_pipeline() -> List[dict]:
+    return [
+        {"$unwind": "$inventory"},
+        {"$group": {
+            "_id": {"product": "$_id", "store": "$inventory.store_location", "size": "$inventory.size"},
+            "quantity": {"$sum": "$inventory.quantity"},
+        }},
+        {"$project": {
+            "_id": {"$concat": [{"$toString": "$_id.product"}, "|", "$_id.store", "|", "$_id.size"]},
+            "product_id": {"$toString": "$_id.product"},
+            "store_location": "$_id.store",
+            "size": "$_id.size",
+            "quantity": 1,
+        }},
+        {"$lookup": {"from": Store.get_settings().name, "localField": "store_location", "foreignField": "name", "as": "store"}},
+        {"$project": {
+            "product_id": 1, "store_location": 1, "size": 1, "quantity": 1,
+            "low_stock": {"$lte": ["$quantity", {"$ifNull": [
+                {"$arrayElemAt": ["$store.reorder_threshold", 0]}, settings.STORE_LOW_STOCK_THRESHOLD,
+            ]}]},
+        }},
+        # Replaces the collection in one step and keeps its indexes
+        {"$out": StoreInventory.get_settings().name},
+    ]
+
+
+async def rebuild() -> None:
+    """
+    Recreate every entry from the products collection.
+    """
+    await Product.get_motor_collection().aggregate(_rebuild_pipeline()).to_list(length=None)
+
+
+async def ensure_built() -> None:
+    """
+    Build the collection if it has never been built (e.g. an existing database).
+    """
+    if not await StoreInventory.get_motor_collection().estimated_document_count():
+        await rebuild()
+
+
+def _in_stock(query: dict, in_stock_only: bool) -> dict:
+    if in_stock_only:
+        query["quantity"] = {"$gt": 0}
+    return query
+
+
+async def availability(product_id: str, size: Optional[str] = None, store_location: Optional[str] = None,
+                       in_stock_only: bool = True) -> List[dict]:
+    """
+    (store_location, size, quantity) entries of one product, optionally for one size and/or store.
+    """
+    query: Dict[str, object] = {"product_id": product_id}
+    if store_location is not None:
+        query["store_location"] = store_location
+    if size is not None:
+        query["size"] = size
+    cursor = StoreInventory.get_motor_collection().find(_in_stock(query, in_stock_only), _COVERED).hint(PRODUCT_AVAILABILITY_INDEX)
+    return [
+        {"store_location": doc["store_location"], "size": doc["size"], "quantity": doc["quantity"]}
+        async for doc in cursor
+    ]
+
+
+async def bulk_availability(queries: Sequence[dict]) -> List[dict]:
+    """
+    Answer many {product_id, size?, store_location?} queries with one covered
+    read; results are in query order.
+    """
+    product_ids = list({query["product_id"] for query in queries})
+    cursor = StoreInventory.get_motor_collection().find(
+        {"product_id": {"$in": product_ids}, "quantity": {"$gt": 0}}, _COVERED
+    ).hint(PRODUCT_AVAILABILITY_INDEX)
+    by_product: Dict[str, List[dict]] = {}
+    async for doc in cursor:
+        by_product.setdefault(doc["product_id"], []).append(doc)
+
+    results = []
+    for query in queries:
+        size, store_location = query.get("size"), query.get("store_location")
+        stores = [
+            {"store_location": doc["store_location"], "size": doc["size"], "quantity": doc["quantity"]}
+            for doc in by_product.get(query["product_id"], [])
+            if (size is None or doc["size"] == size) and (store_location is None or doc["store_location"] == store_location)
+        ]
+        results.append({**query, "available": bool(stores), "stores": stores})
+    return results
+
+
+async def in_store(store_location: str, size: Optional[str] = None, limit: int = 50) -> List[dict]:
+    """
+    Products in stock at a store, optionally in one size.
+    """
+    query: Dict[str, object] = {"store_location": store_location}
+    if size is not None:
+        query["size"] = size
+    cursor = StoreInventory.get_motor_collection().find(
+        _in_stock(query, True), {"_id": 0, "product_id": 1, "size": 1, "quantity": 1}
+    ).hint(STORE_AVAILABILITY_INDEX).limit(limit)
+    return await cursor.to_list(length=limit)
+
+
+class StoreInventorySync:
+    """
+    Catalog listener queueing each saved product's entries for a background
+    writer. Changes are snapshotted when queued and written in order.
+    """
+
+    def __init__(self) -> None:
+        self._queue: Optional[asyncio.Queue] = None
+        self._writer: Optional[asyncio.Task] = None
+
+    def _enqueue(self, changes: Iterable[Tuple[str, List[dict]]]) -> None:
+        if self._queue is None:
+            return
+        for change in changes:
+            self._queue.put_nowait(change)
+
+    # Catalog change hook
+
+    def on_product_saved(self, product: Product) -> None:
+        self._enqueue([_entries(product)])
+
+    def on_products_saved(self, products) -> None:
+        self._enqueue(_entries(product) for product in products)
+
+    def on_product_deleted(self, product_id: str) -> None:
+        self._enqueue([(str(product_id), [])])
+
+    # Writer
+
+    @staticmethod
+    async def _flag_low_stock(changes: List[Tuple[str, List[dict]]]) -> List[dict]:
+        """
+        Set each entry's low_stock flag; returns the entries that were not low before.
+        """
+        await low_stock_detector.ensure_loaded()
+        was_low = {
+            doc["_id"]
+            async for doc in StoreInventory.get_motor_collection().find(
+                {"low_stock": True, "product_id": {"$in": list({product_id for product_id, _ in changes})}}, {"_id": 1}
+            )
+        }
+        for _, entries in changes:
+            for entry in entries:
+                entry["low_stock"] = entry["quantity"] <= low_stock_detector.store_threshold(entry["store_location"])
+        # dict() keeps a product's last queued entries, which are the ones that stick
+        return [
+            entry for entries in dict(changes).values() for entry in entries
+            if entry["low_stock"] and entry["_id"] not in was_low
+        ]
+
+    @staticmethod
+    def _requests(changes: List[Tuple[str, List[dict]]]) -> list:
+        requests = []
+        for product_id, entries in changes:
+            # Entries the product no longer has, then the current ones
+            requests.append(DeleteMany({"product_id": product_id, "_id": {"$nin": [entry["_id"] for entry in entries]}}))
+            requests.extend(ReplaceOne({"_id": entry["_id"]}, entry, upsert=True) for entry in entries)
+        return requests
+
+    async def _write_forever(self) -> None:
+        while True:
+            changes = [await self._queue.get()]
+            while not self._queue.empty():
+                changes.append(self._queue.get_nowait())
+            try:
+                newly_low = await self._flag_low_stock(changes)
+                await StoreInventory.get_motor_collection().bulk_write(self._requests(changes), ordered=True)
+                await low_stock_detector.store_entries_low(newly_low)
+            except Exception:
+                logger.exception("Store inventory sync failed for %d products", len(changes))
+            finally:
+                for _ in changes:
+                    self._queue.task_done()
+
+    def start(self) -> None:
+        if self._writer is None or self._writer.done():
+            self._queue = asyncio.Queue()
+            self._writer = asyncio.create_task(self._write_forever())
+
+    async def drain(self) -> None:
+        """
+        Wait until every queued change is written.
+        """
+        if self._queue is not None:
+            await self._queue.join()
+
+    async def stop(self) -> None:
+        if self._writer is not None:
+            await self.drain()
+            self._writer.cancel()
+            try:
+                await self._writer
+            except asyncio.CancelledError:
+                pass
+            self._writer = None
+            self._queue = None
+
+
+store_inventory_sync = StoreInventorySync()
+catalog_events.register(store_inventory_sync)
@@ -0,0 +1,226 @@
+"""
+Nearest stores holding a product.
+
+Stores carry a GeoJSON point with a 2dsphere index. "Nearest stores that
+have product P in size S" is one aggregation: $geoNear walks the stores
+outward from the shopper, a $lookup into store_inventory keeps the ones
+with stock, and $limit stops the walk as soon as enough are found.
+
+The store list is small and rarely changes, so it is also held in memory
+as a k-d tree. That answers "which stores are near" without Mongo, and
+backs the geo query when the server cannot run it (e.g. the 2dsphere index
+is still building).
+"""
+
+import asyncio
+import logging
+import math
+from heapq import heappush, heapreplace
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from pymongo.errors import OperationFailure
+
+from ..models.inventory import StoreInventory
+from ..models.store import Store
+from . import store_inventory
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_KM = 6371.0088
+DEFAULT_MAX_KM = 50.0
+
+
+def _unit_vector(latitude: float, longitude: float) -> Tuple[float, float, float]:
+    lat, lng = math.radians(latitude), math.radians(longitude)
+    return (math.cos(lat) * math.cos(lng), math.cos(lat) * math.sin(lng), math.sin(lat))
+
+
+def _chord(km: float) -> float:
+    return 2 * math.sin(min(km / EARTH_RADIUS_KM, math.pi) / 2)
+
+
+def _km(chord: float) -> float:
+    return 2 * EARTH_RADIUS_KM * math.asin(min(chord / 2, 1.0))
+
+
+class KDTree:
+    """
+    Static k-d tree over 3-d points. Stores are points on the unit sphere,
+    where the straight-line (chord) distance grows with the great-circle
+    distance, so the Euclidean nearest points are the geographically
+    nearest stores.
+    """
+
+    def __init__(self, points: Sequence[Tuple[float, float, float]]) -> None:
+        self.points = list(points)
+        # Nodes as parallel lists: point index, split axis, children (-1 for none)
+        self._point: List[int] = []
+        self._axis: List[int] = []
+        self._left: List[int] = []
+        self._right: List[int] = []
+        self._root = self._build(list(range(len(self.points))))
+
+    def __len__(self) -> int:
+        return len(self.points)
+
+    def _build(self, ids: List[int]) -> int:
+        if not ids:
+            return -1
+        # Split on the axis the points spread furthest along
+        axis = max(range(3), key=lambda a: max(self.points[i][a] for i in ids) - min(self.points[i][a] for i in ids))
+        ids.sort(key=lambda i: self.points[i][axis])
+        mid = len(ids) // 2
+        node = len(self._point)
+        self._point.append(ids[mid])
+        self._axis.append(axis)
+        self._left.append(-1)
+        self._right.append(-1)
+        self._left[node] = self._build(ids[:mid])
+        self._right[node] = self._build(ids[mid + 1:])
+        return node
+
+    def nearest(self, point: Tuple[float, float, float], k: int, max_distance: float = math.inf) -> List[Tuple[float, int]]:
+        """
+        Up to k (distance, point index) pairs within max_distance, nearest first.
+        """
+        best: List[Tuple[float, int]] = []  # max-heap by distance, as (-distance, index)
+
+        def visit(node: int) -> None:
+            if node < 0:
+                return
+            i = self._point[node]
+            distance = math.dist(point, self.points[i])
+            if distance <= max_distance:
+                if len(best) < k:
+                    heappush(best, (-distance, i))
+                elif distance < -best[0][0]:
+                    heapreplace(best, (-distance, i))
+            axis = self._axis[node]
+            offset = point[axis] - self.points[i][axis]
+            near, far = (self._left[node], self._right[node]) if offset < 0 else (self._right[node], self._left[node])
+            visit(near)
+            # The far side can only help if the splitting plane is closer than the current bound
+            bound = -best[0][0] if len(best) == k else max_distance
+            if abs(offset) <= bound:
+                visit(far)
+
+        if k > 0:
+            visit(self._root)
+        return sorted((-negative, i) for negative, i in best)
+
+
+class StoreLocator:
+    """
+    Every store with coordinates, in a k-d tree.
+    """
+
+    def __init__(self) -> None:
+        self._stores: List[dict] = []
+        self._by_name: Dict[str, dict] = {}
+        self._tree = KDTree([])
+        self._loaded = False
+        self._lock = asyncio.Lock()
+
+    def __len__(self) -> int:
+        return len(self._stores)
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    async def ensure_loaded(self) -> None:
+        if self._loaded:
+            return
+        async with self._lock:
+            if self._loaded:
+                return
+            docs = await Store.get_motor_collection().find({}, {"_id": 0, "name": 1, "location": 1, "city": 1, "geo": 1}).to_list(length=None)
+            self.rebuild(docs)
+
+    def rebuild(self, stores: Sequence[dict]) -> None:
+        self._by_name = {store["name"]: store for store in stores}
+        self._stores = [store for store in stores if store.get("geo")]
+        self._tree = KDTree([_unit_vector(store["geo"]["coordinates"][1], store["geo"]["coordinates"][0]) for store in self._stores])
+        self._loaded = True
+
+    def coordinates(self, name: str) -> Optional[Tuple[float, float]]:
+        """
+        (latitude, longitude) of a store, e.g. the one a kiosk stands in.
+        """
+        store = self._by_name.get(name)
+        if not store or not store.get("geo"):
+            return None
+        longitude, latitude = store["geo"]["coordinates"]
+        return latitude, longitude
+
+    def nearest(self, latitude: float, longitude: float, limit: int = 5, max_km: float = DEFAULT_MAX_KM) -> List[dict]:
+        """
+        Stores within max_km, nearest first, with their distance.
+        """
+        found = self._tree.nearest(_unit_vector(latitude, longitude), limit, _chord(max_km))
+        return [{**self._summary(self._stores[i]), "distance_km": round(_km(chord), 2)} for chord, i in found]
+
+    @staticmethod
+    def _summary(store: dict) -> dict:
+        return {"name": store["name"], "location": store.get("location"), "city": store.get("city")}
+
+
+def _nearest_pipeline(product_id: str, size: Optional[str], latitude: float, longitude: float, limit: int, max_km: float) -> List[dict]:
+    stock_match: Dict[str, object] = {"product_id": product_id, "quantity": {"$gt": 0}}
+    if size is not None:
+        stock_match["size"] = size
+    return [
+        {"$geoNear": {
+            "near": {"type": "Point", "coordinates": [longitude, latitude]},
+            "key": "geo",
+            "distanceField": "distance_m",
+            "maxDistance": max_km * 1000,
+            "spherical": True,
+        }},
+        {"$lookup": {
+            "from": StoreInventory.get_settings().name,
+            "let": {"store": "$name"},
+            "pipeline": [
+                {"$match": {**stock_match, "$expr": {"$eq": ["$store_location", "$$store"]}}},
+                {"$project": {"_id": 0, "size": 1, "quantity": 1}},
+            ],
+            "as": "stock",
+        }},
+        {"$match": {"stock.0": {"$exists": True}}},
+        {"$limit": limit},
+        {"$project": {
+            "_id": 0, "name": 1, "location": 1, "city": 1, "stock": 1,
+            "distance_km": {"$round": [{"$divide": ["$distance_m", 1000]}, 2]},
+        }},
+    ]
+
+
+async def nearest_with_stock(product_id: str, size: Optional[str], latitude: float, longitude: float,
+                             limit: int = 3, max_km: float = DEFAULT_MAX_KM) -> List[dict]:
+    """
+    The nearest stores (within max_km) holding the product, in the size if
+    given, with their stock per size and distance.
+    """
+    try:
+        docs = await Store.get_motor_collection().aggregate(
+            _nearest_pipeline(product_id, size, latitude, longitude, limit, max_km)
+        ).to_list(length=limit)
+        return [{"name": doc["name"], "location": doc.get("location"), "city": doc.get("city"),
+                 "distance_km": doc["distance_km"], "stock": doc["stock"]} for doc in docs]
+    except OperationFailure as e:
+        logger.warning("Nearest store query failed (%s); using the in-memory store index", e)
+
+    await store_locator.ensure_loaded()
+    stock: Dict[str, List[dict]] = {}
+    for entry in await store_inventory.availability(product_id, size):
+        stock.setdefault(entry["store_location"], []).append({"size": entry["size"], "quantity": entry["quantity"]})
+    results = []
+    for store in store_locator.nearest(latitude, longitude, len(store_locator), max_km):
+        if store["name"] in stock:
+            results.append({**store, "stock": stock[store["name"]]})
+            if len(results) == limit:
+                break
+    return results
+
+
+store_locator = StoreLocator()
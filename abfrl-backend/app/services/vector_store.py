@@ -1,24 +1,366 @@
 """
-Vector store service using Qdrant.
+In-process semantic product search.
+
+Products are embedded with the deterministic hashing embedder in
+services/embeddings.py, so no model download or network call is needed.
+Vectors live in float32 NumPy matrices: the catalog as precomputed by the
+embedding pipeline (memory-mapped, shared by all workers, see
+services/embedding_store.py) plus a small private block for products written
+since. Exact search is a matrix-vector product followed by an argpartition
+top-k.
+
+Catalogs with at least VECTOR_ANN_MIN_ITEMS products also get an IVF
+(inverted file) index. Rows are clustered with k-means, and a query scores
+only the rows in its nearest clusters.
 """
 
-from typing import List
+import asyncio
+import logging
+import math
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
 
-from qdrant_client import QdrantClient
+import numpy as np
 
 from ..core.config import settings
+from ..models.product import Product
+from . import catalog_events, embedding_store
+from .embeddings import PRODUCT_TEXT_FIELDS, HashingEmbedder, content_hash, product_fields
+
+logger = logging.getLogger(__name__)
+
+
+def _kmeans(data: np.ndarray, k: int, iterations: int, seed: int = 0) -> np.ndarray:
+    """
+    Spherical k-means (cosine) centroids for unit-norm rows.
+    """
+    rng = np.random.default_rng(seed)
+    centroids = data[rng.choice(len(data), size=k, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = np.argmax(data @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, data)
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        empty = norms[:, 0] == 0
+        # Re-seed empty clusters from random rows
+        if empty.any():
+            sums[empty] = data[rng.choice(len(data), size=int(empty.sum()), replace=False)]
+            norms[empty] = 1.0
+        centroids = (sums / norms).astype(np.float32)
+    return centroids
+
+
+class VectorIndex:
+    """
+    Unit vectors with id mapping, tombstoned deletes, exact top-k search and
+    an optional IVF approximate index.
+
+    Rows live in a base matrix (which may be a shared memmap and is never
+    reallocated) followed by a growable private block for appended rows.
+    """
+
+    def __init__(self, dim: int, ann_min_items: int, nprobe: int) -> None:
+        self.dim = dim
+        self.ann_min_items = ann_min_items
+        self.nprobe = nprobe
+        self._base = np.zeros((0, dim), dtype=np.float32)
+        self._extra = np.zeros((0, dim), dtype=np.float32)
+        self._alive = np.zeros(0, dtype=bool)
+        self._ids: List[Optional[str]] = []
+        self._rows: Dict[str, int] = {}
+        self._size = 0
+        # IVF state: unit centroids and the cluster of every row
+        self._centroids: Optional[np.ndarray] = None
+        self._clusters = np.zeros(0, dtype=np.int32)
+        self._ivf_built_at = 0
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    @property
+    def approximate(self) -> bool:
+        return self._centroids is not None
+
+    def _grow(self, capacity: int) -> None:
+        extra = np.zeros((capacity - len(self._base), self.dim), dtype=np.float32)
+        used = self._size - len(self._base)
+        extra[:used] = self._extra[:used]
+        alive = np.zeros(capacity, dtype=bool)
+        alive[:self._size] = self._alive[:self._size]
+        clusters = np.full(capacity, -1, dtype=np.int32)
+        clusters[:self._size] = self._clusters[:self._size]
+        self._extra, self._alive, self._clusters = extra, alive, clusters
+
+    def _set_row(self, row: int, vector: np.ndarray) -> None:
+        if row < len(self._base):
+            self._base[row] = vector
+        else:
+            self._extra[row - len(self._base)] = vector
+
+    def _gather(self, rows: np.ndarray) -> np.ndarray:
+        base_count = len(self._base)
+        if len(rows) and rows[-1] >= base_count:
+            split = int(np.searchsorted(rows, base_count))
+            return np.vstack([self._base[rows[:split]], self._extra[rows[split:] - base_count]])
+        return self._base[rows]
+
+    def _score_all(self, vector: np.ndarray) -> np.ndarray:
+        scores = self._base @ vector
+        extra_used = self._size - len(self._base)
+        if extra_used:
+            scores = np.concatenate([scores, self._extra[:extra_used] @ vector])
+        return scores
+
+    def build(self, ids: Sequence[str], vectors: np.ndarray) -> None:
+        """
+        Replace the index contents in one go. The vectors are used in place
+        (a memmap stays a memmap).
+        """
+        if not isinstance(vectors, np.ndarray) or vectors.dtype != np.float32:
+            vectors = np.asarray(vectors, dtype=np.float32)
+        self._base = vectors.reshape(len(ids), self.dim)
+        self._extra = np.zeros((0, self.dim), dtype=np.float32)
+        self._alive = np.ones(len(ids), dtype=bool)
+        self._ids = list(ids)
+        self._rows = {product_id: row for row, product_id in enumerate(self._ids)}
+        self._size = len(ids)
+        self._clusters = np.full(self._size, -1, dtype=np.int32)
+        self._centroids = None
+        self._maybe_build_ivf()
+
+    def upsert(self, product_id: str, vector: np.ndarray) -> None:
+        row = self._rows.get(product_id)
+        if row is None:
+            if self._size == len(self._alive):
+                self._grow(self._size + max(16, self._size - len(self._base)))
+            row = self._size
+            self._size += 1
+            self._ids.append(product_id)
+            self._rows[product_id] = row
+            self._alive[row] = True
+        self._set_row(row, vector)
+        if self._centroids is not None:
+            self._clusters[row] = int(np.argmax(self._centroids @ vector))
+        self._maybe_build_ivf()
+
+    def remove(self, product_id: str) -> None:
+        row = self._rows.pop(product_id, None)
+        if row is None:
+            return
+        self._alive[row] = False
+        self._ids[row] = None
+        # Compact once tombstones outnumber live rows
+        if self._size > 1024 and len(self._rows) < self._size // 2:
+            live = np.flatnonzero(self._alive[:self._size])
+            self.build([self._ids[row] for row in live], self._gather(live))
+
+    def _maybe_build_ivf(self) -> None:
+        count = len(self._rows)
+        if count < self.ann_min_items:
+            self._centroids = None
+            return
+        # Re-cluster when the catalog has grown a lot since the last build
+        if self._centroids is not None and count < 2 * self._ivf_built_at:
+            return
+        live = np.flatnonzero(self._alive[:self._size])
+        nlist = max(1, int(math.sqrt(count)))
+        rng = np.random.default_rng(0)
+        sample = np.sort(rng.choice(live, size=min(len(live), 64 * nlist), replace=False))
+        self._centroids = _kmeans(self._gather(sample), nlist, iterations=8)
+        self._clusters[:self._size] = -1
+        for start in range(0, len(live), 8192):
+            chunk = live[start:start + 8192]
+            self._clusters[chunk] = np.argmax(self._gather(chunk) @ self._centroids.T, axis=1)
+        self._ivf_built_at = count
+
+    def search(self, vector: np.ndarray, k: int, exact: bool = False) -> List[Tuple[str, float]]:
+        """
+        Top-k (id, cosine score) pairs, best first.
+        """
+        if k <= 0 or not self._rows:
+            return []
+        if self._centroids is not None and not exact:
+            nprobe = min(self.nprobe, len(self._centroids))
+            probe = np.argpartition(-(self._centroids @ vector), nprobe - 1)[:nprobe]
+            rows = np.flatnonzero(np.isin(self._clusters[:self._size], probe) & self._alive[:self._size])
+            scores = self._gather(rows) @ vector
+        else:
+            # Score the matrices in place (no row gather) and mask deleted rows
+            rows = None
+            scores = self._score_all(vector)
+            scores[~self._alive[:self._size]] = -np.inf
+
+        k = min(k, len(self._rows) if rows is None else len(rows))
+        if k == 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        if rows is not None:
+            return [(self._ids[rows[i]], float(scores[i])) for i in top]
+        return [(self._ids[i], float(scores[i])) for i in top]
+
+
+class ProductVectorStore:
+    """
+    Vector index over the whole catalog, kept current through the catalog
+    change hook and hot-swapped when the embedding pipeline publishes a new
+    version on disk.
+    """
+
+    def __init__(self) -> None:
+        self.embedder = HashingEmbedder(settings.VECTOR_DIM)
+        self.index = self._new_index()
+        self.version: Optional[int] = None  # embedding store version in use, None if embedded in-process
+        # Hook writes since startup: product id -> (time, vector or None if deleted)
+        self._local_writes: Dict[str, Tuple[float, Optional[np.ndarray]]] = {}
+        self._loaded = False
+        self._lock = asyncio.Lock()
+        self._watcher: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def _new_index() -> VectorIndex:
+        return VectorIndex(settings.VECTOR_DIM, settings.VECTOR_ANN_MIN_ITEMS, settings.VECTOR_ANN_NPROBE)
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    async def ensure_loaded(self) -> None:
+        """
+        Load the catalog vectors once; later calls are no-ops. Uses the
+        embedding store when it has a version and embeds only the products
+        it is missing or has stale text for.
+        """
+        if self._loaded:
+            return
+        async with self._lock:
+            if self._loaded:
+                return
+            docs = await Product.get_motor_collection().find({}, PRODUCT_TEXT_FIELDS).to_list(length=None)
+            stored = embedding_store.load(settings.EMBEDDING_STORE_DIR, self.embedder.dim)
+            self.rebuild(docs, stored)
+
+    def rebuild(self, products, stored: Optional[embedding_store.StoredEmbeddings] = None) -> None:
+        index = self._new_index()
+        if stored is not None:
+            index.build(stored.ids, stored.vectors)
+            stored_hashes = dict(zip(stored.ids, stored.hashes))
+            current = set()
+            for product in products:
+                product_id = str(product["_id"] if isinstance(product, dict) else product.id)
+                current.add(product_id)
+                if stored_hashes.get(product_id) != content_hash(product, self.embedder.dim):
+                    index.upsert(product_id, self.embedder.embed_fields(product_fields(product)))
+            for product_id in set(stored_hashes) - current:
+                index.remove(product_id)
+            self.version = stored.version
+        else:
+            ids, vectors = [], []
+            for product in products:
+                ids.append(str(product["_id"] if isinstance(product, dict) else product.id))
+                vectors.append(self.embedder.embed_fields(product_fields(product)))
+            matrix = np.vstack(vectors) if vectors else np.zeros((0, self.embedder.dim), dtype=np.float32)
+            index.build(ids, matrix)
+            self.version = None
+        self.index = index
+        self._loaded = True
+
+    def _index_for(self, stored: embedding_store.StoredEmbeddings) -> VectorIndex:
+        index = self._new_index()
+        index.build(stored.ids, stored.vectors)
+        return index
+
+    def swap_to(self, stored: embedding_store.StoredEmbeddings, index: Optional[VectorIndex] = None) -> None:
+        """
+        Switch to a newer stored version. Writes this process saw after that
+        version's catalog snapshot are re-applied on top; older ones are
+        already in it.
+        """
+        index = index or self._index_for(stored)
+        for product_id, (written_at, vector) in list(self._local_writes.items()):
+            if written_at < stored.snapshot_at:
+                del self._local_writes[product_id]
+            elif vector is None:
+                index.remove(product_id)
+            else:
+                index.upsert(product_id, vector)
+        self.index = index
+        self.version = stored.version
+
+    async def check_for_new_version(self) -> bool:
+        manifest = embedding_store.read_manifest(settings.EMBEDDING_STORE_DIR)
+        if not manifest or (self.version is not None and manifest["version"] <= self.version):
+            return False
+        stored = embedding_store.load(settings.EMBEDDING_STORE_DIR, self.embedder.dim)
+        if stored is None:
+            return False
+        # Building the index (IVF clustering on large catalogs) stays off the event loop
+        index = await asyncio.to_thread(self._index_for, stored)
+        self.swap_to(stored, index)
+        return True
+
+    def search(self, query: str, k: int = 5) -> List[Tuple[str, float]]:
+        vector = self.embedder.embed_query(query)
+        if not vector.any():
+            return []
+        return self.index.search(vector, k)
+
+    # Catalog change hook
+
+    def on_product_saved(self, product: Product) -> None:
+        if self._loaded:
+            vector = self.embedder.embed_fields(product_fields(product))
+            self._local_writes[str(product.id)] = (time.time(), vector)
+            self.index.upsert(str(product.id), vector)
+
+    def on_product_deleted(self, product_id: str) -> None:
+        if self._loaded:
+            self._local_writes[product_id] = (time.time(), None)
+            self.index.remove(product_id)
+
+    # Hot swap
+
+    async def _watch_forever(self) -> None:
+        while True:
+            await asyncio.sleep(settings.EMBEDDING_STORE_POLL_SECONDS)
+            if not self._loaded:
+                continue
+            try:
+                if await self.check_for_new_version():
+                    logger.info("Vector store switched to embedding version %s", self.version)
+            except Exception:
+                logger.exception("Loading a new embedding version failed")
+
+    def start(self) -> None:
+        """
+        Poll the embedding store for new versions on the running event loop.
+        """
+        if self._watcher is None or self._watcher.done():
+            self._watcher = asyncio.create_task(self._watch_forever())
+
+    async def stop(self) -> None:
+        if self._watcher is not None:
+            self._watcher.cancel()
+            try:
+                await self._watcher
+            except asyncio.CancelledError:
+                pass
+            self._watcher = None
+
+
+vector_store = ProductVectorStore()
+catalog_events.register(vector_store)
 
 
 class VectorStoreService:
     """
     Service for vector store operations.
     """
-    client = QdrantClient(url=settings.QDRANT_URL, api_key=settings.QDRANT_API_KEY)
 
     @staticmethod
-    def search(query: str) -> List[str]:
+    async def search(query: str, limit: int = 5) -> List[str]:
         """
-        Search for recommendations in vector store.
+        Ids of the products most similar to the query, best first.
         """
-        # Mock implementation; in production, embed query and search
-        return ["product1", "product2"]
\ No newline at end of file
+        await vector_store.ensure_loaded()
+        return [product_id for product_id, score in vector_store.search(query, limit) if score >= settings.VECTOR_MIN_SCORE]
@@ -0,0 +1,40 @@
+"""
+Per-message agent setup cost: building a MasterAgent per request vs the shared registry.
+
+Run from abfrl-backend/:  python benchmarks/bench_agent_setup.py
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+os.environ.setdefault("MONGODB_URL", "mongodb://localhost:27017")
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark-key")
+
+from app.agents.master import MasterAgent  # noqa: E402
+from app.agents.registry import AgentRegistry  # noqa: E402
+
+
+def bench(label, fn, iterations):
+    fn()  # warm up imports and lazy SDK state
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<34} {elapsed / iterations * 1e6:>10.2f} us/message")
+    return elapsed / iterations
+
+
+def main():
+    iterations = int(os.getenv("BENCH_ITERATIONS", "2000"))
+    registry = AgentRegistry()
+    registry.start()
+
+    before = bench("before: MasterAgent() per message", lambda: MasterAgent(), iterations)
+    after = bench("after: shared registry lookup", lambda: registry.master, iterations)
+    print(f"speedup: {before / after:,.0f}x")
+
+
+if __name__ == "__main__":
+    main()
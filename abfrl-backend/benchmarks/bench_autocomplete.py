@@ -0,0 +1,56 @@
+"""
+Autocomplete benchmark on a synthetic catalog: build time, per-query
+latency for short (stored) and longer (ranked on the fly) prefixes, and the
+cost of a catalog write.
+
+Run from abfrl-backend/:  python benchmarks/bench_autocomplete.py [n_products]
+"""
+
+import os
+import random
+import sys
+import time
+from types import SimpleNamespace
+
+os.environ.setdefault("MONGODB_URL", "mongodb://localhost:27017")
+os.environ.setdefault("GOOGLE_API_KEY", "bench")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import numpy as np  # noqa: E402
+
+from app.services import autocomplete  # noqa: E402
+from bench_search import synthetic_catalog  # noqa: E402
+
+PREFIXES = ["s", "sl", "jea", "t-sh", "linen sh", "kurt", "flo", "blazer", "zzz"]
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    docs = list(synthetic_catalog(n))
+    rng = random.Random(3)
+    popularity = {doc["_id"]: rng.randint(0, 500) for doc in docs if rng.random() < 0.3}
+
+    index = autocomplete.AutocompleteIndex()
+    # Keep the benchmark off the co-purchase file
+    autocomplete.copurchase_index.popularity = lambda: popularity
+    start = time.perf_counter()
+    index.rebuild(docs, popularity)
+    print(f"indexed {n} products ({len(index._keys)} keys) in {time.perf_counter() - start:.1f}s")
+
+    timings = {prefix: [] for prefix in PREFIXES}
+    for _ in range(200):
+        for prefix in PREFIXES:
+            start = time.perf_counter()
+            index.suggest(prefix)
+            timings[prefix].append((time.perf_counter() - start) * 1e6)
+    for prefix in PREFIXES:
+        print(f"  {prefix!r:12} p50 {np.percentile(timings[prefix], 50):6.1f} us  p99 {np.percentile(timings[prefix], 99):6.1f} us")
+
+    start = time.perf_counter()
+    for i in range(200):
+        index.on_product_saved(SimpleNamespace(id=f"new{i}", name=f"Slim Linen Shirt {i}", category="shirt"))
+    print(f"catalog write: {(time.perf_counter() - start) / 200 * 1e3:.2f} ms/product")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Facet count benchmark on a synthetic catalog: bitset postings vs counting
+every product in Python for the same filters.
+
+Run from abfrl-backend/:  python benchmarks/bench_facets.py [n_products]
+"""
+
+import os
+import random
+import sys
+import time
+
+os.environ.setdefault("MONGODB_URL", "mongodb://localhost:27017")
+os.environ.setdefault("GOOGLE_API_KEY", "bench")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.services.facets import FACETS, FacetIndex, _facet_values  # noqa: E402
+
+CATEGORIES = ["jeans", "shirts", "tshirts", "kurtas", "sarees", "jackets", "dresses", "sneakers", "boots", "hoodies"]
+SIZES = ["XS", "S", "M", "L", "XL", "XXL", "28", "30", "32", "34", "36"]
+COLORS = ["black", "white", "blue", "red", "green", "beige", "grey", "navy", "pink", "olive"]
+FILTERS = [
+    {},
+    {"category": ["jeans"]},
+    {"category": ["shirts", "tshirts"], "size": ["M", "L"]},
+    {"size": ["M"], "color": ["black", "navy"], "price": ["1000-2000"]},
+]
+
+
+def synthetic_catalog(n, seed=7):
+    rng = random.Random(seed)
+    for i in range(n):
+        yield {
+            "_id": str(i),
+            "category": rng.choice(CATEGORIES),
+            "price": rng.choice([299, 599, 999, 1499, 2499, 4999, 7999, 12999]),
+            "sizes": rng.sample(SIZES, rng.randint(1, 5)),
+            "colors": rng.sample(COLORS, rng.randint(1, 3)),
+        }
+
+
+def scan(docs, filters):
+    counts = {facet: {} for facet in FACETS}
+    for doc in docs:
+        values = dict(zip(FACETS, _facet_values(doc)))
+        failed = [facet for facet, selected in filters.items() if not set(values[facet]) & set(selected)]
+        for facet in FACETS:
+            if not failed or failed == [facet]:
+                for value in values[facet]:
+                    counts[facet][value] = counts[facet].get(value, 0) + 1
+    return counts
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    docs = list(synthetic_catalog(n))
+    start = time.perf_counter()
+    index = FacetIndex()
+    index.rebuild(docs)
+    print(f"indexed {n} products in {time.perf_counter() - start:.2f}s")
+
+    for filters in FILTERS:
+        start = time.perf_counter()
+        for _ in range(100):
+            index.counts(filters)
+        bitset_ms = (time.perf_counter() - start) * 10
+        start = time.perf_counter()
+        scan(docs, filters)
+        scan_ms = (time.perf_counter() - start) * 1e3
+        print(f"  {str(filters):70} bitsets {bitset_ms:7.3f} ms   scan {scan_ms:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
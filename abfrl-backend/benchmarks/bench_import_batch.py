@@ -0,0 +1,81 @@
+"""
+Cost of one bulk-import batch (IMPORT_BATCH_SIZE new products) for every
+catalog change listener, on a synthetic catalog held by all the in-memory
+indexes. This is event-loop time the import endpoint spends per batch.
+
+Run from abfrl-backend/:  python benchmarks/bench_import_batch.py [n_products] [batches]
+"""
+
+import os
+import random
+import sys
+import time
+from types import SimpleNamespace
+
+os.environ.setdefault("MONGODB_URL", "mongodb://localhost:27017")
+os.environ.setdefault("GOOGLE_API_KEY", "bench")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import numpy as np  # noqa: E402
+
+from app.services import autocomplete, catalog_events  # noqa: E402
+from app.services.autocomplete import autocomplete_index  # noqa: E402
+from app.services.catalog_index import catalog_index  # noqa: E402
+from app.services.facets import facet_index  # noqa: E402
+from app.services.product_import import IMPORT_BATCH_SIZE  # noqa: E402
+from app.services.search_index import search_index  # noqa: E402
+from app.services.vector_store import vector_store  # noqa: E402
+from bench_search import synthetic_catalog  # noqa: E402
+
+SIZES = ["S", "M", "L", "XL"]
+COLORS = ["black", "white", "blue", "red", "green"]
+
+
+def product(doc, rng):
+    return SimpleNamespace(
+        id=doc["_id"], name=doc["name"], category=doc["category"], description=doc["description"],
+        price=float(rng.randint(299, 4999)), image_url=None, stock=rng.randint(0, 50), version=0,
+        sizes=rng.sample(SIZES, 2), colors=rng.sample(COLORS, 1), metadata_info={}, inventory=[],
+    )
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    batches = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    rng = random.Random(5)
+    docs = list(synthetic_catalog(n + batches * IMPORT_BATCH_SIZE))
+    catalog = [product(doc, rng) for doc in docs[:n]]
+    popularity = {}
+    # Keep the benchmark off the co-purchase file
+    autocomplete.copurchase_index.popularity = lambda: popularity
+
+    start = time.perf_counter()
+    autocomplete_index.rebuild(catalog, popularity)
+    catalog_index.rebuild(catalog)
+    search_index.rebuild(catalog)
+    facet_index.rebuild(catalog)
+    vector_store.rebuild(catalog)
+    print(f"indexed {n} products in {time.perf_counter() - start:.1f}s")
+
+    timings = {type(listener).__name__: [] for listener in catalog_events._listeners}
+    for b in range(batches):
+        batch = [product(doc, rng) for doc in docs[n + b * IMPORT_BATCH_SIZE:n + (b + 1) * IMPORT_BATCH_SIZE]]
+        for listener in catalog_events._listeners:
+            start = time.perf_counter()
+            saved = getattr(listener, "on_products_saved", None)
+            if saved is not None:
+                saved(batch)
+            else:
+                for p in batch:
+                    listener.on_product_saved(p)
+            timings[type(listener).__name__].append((time.perf_counter() - start) * 1e3)
+
+    print(f"one batch of {IMPORT_BATCH_SIZE} products, per listener (p50 / max over {batches} batches):")
+    for name, values in sorted(timings.items(), key=lambda item: -np.median(item[1])):
+        print(f"  {name:28} {np.median(values):8.1f} ms  {max(values):8.1f} ms")
+    total = np.sum([values for values in timings.values()], axis=0)
+    print(f"all listeners: p50 {np.median(total):.1f} ms, max {total.max():.1f} ms per batch")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Intent routing microbenchmark: original per-branch any(keyword in message)
+scans vs the compiled single-pass matcher in app.agents.intents.
+
+Run from abfrl-backend/:  python benchmarks/bench_intent_router.py
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.agents import intents  # noqa: E402
+
+MESSAGES = [
+    "hello there, how are you doing today?",
+    "show me some jeans for a summer wedding",
+    "add the retro tee in size m to my cart",
+    "what's in my cart right now",
+    "where is my order 64f1c2a9b3e4d5f6a7b8c9d0",
+    "is the aerostride pro available in size 9 at phoenix mall",
+    "tell me more about the linen shirt and how to wash it",
+    "can i pay with upi",
+]
+
+
+def linear_route(message_lower):
+    """The if/elif chain as it existed in MasterAgent.process_message."""
+    for _, intent, keywords in intents.INTENT_TABLE:
+        if any(keyword in message_lower for keyword in list(keywords)):
+            return intent
+    return intents.GENERAL
+
+
+def bench(label, fn, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for message in MESSAGES:
+            fn(message)
+    elapsed = time.perf_counter() - start
+    per_call = elapsed / (iterations * len(MESSAGES))
+    print(f"{label:<28} {per_call * 1e6:>8.2f} us/message")
+    return per_call
+
+
+def main():
+    iterations = int(os.getenv("BENCH_ITERATIONS", "20000"))
+    for message in MESSAGES:
+        assert linear_route(message) == intents.route(message), message
+
+    before = bench("if/elif keyword scans", linear_route, iterations)
+    after = bench("compiled single pass", intents.route, iterations)
+    bench("all intents (match_intents)", intents.match_intents, iterations)
+    print(f"route speedup: {before / after:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
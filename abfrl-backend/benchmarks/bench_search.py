@@ -0,0 +1,87 @@
+"""
+Fuzzy product search benchmark on a synthetic catalog: trigram index vs a
+linear scan scoring every product with the same word similarity.
+
+Run from abfrl-backend/:  python benchmarks/bench_search.py [n_products]
+"""
+
+import os
+import random
+import string
+import sys
+import time
+
+os.environ.setdefault("MONGODB_URL", "mongodb://localhost:27017")
+os.environ.setdefault("GOOGLE_API_KEY", "bench")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import numpy as np  # noqa: E402
+
+from app.services.catalog_index import tokenize  # noqa: E402
+from app.services.search_index import SearchIndex, word_similarity  # noqa: E402
+
+ADJECTIVES = ["slim", "relaxed", "classic", "vintage", "linen", "cotton", "denim", "silk", "wool", "leather",
+              "floral", "striped", "printed", "formal", "casual", "summer", "winter", "festive", "black", "white"]
+ITEMS = ["jeans", "shirt", "t-shirt", "kurta", "saree", "jacket", "blazer", "dress", "sneakers", "boots",
+         "chinos", "hoodie", "skirt", "shorts", "sweater"]
+# Typos, transpositions, partial words and one exact query
+QUERIES = ["jens", "tshrit", "lether jaket", "flroal dres", "kurat", "snekers", "blazr", "linen shirt", "swea"]
+
+
+def synthetic_catalog(n, seed=7):
+    rng = random.Random(seed)
+    # A few thousand brand names give the vocabulary a realistic long tail
+    brands = ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(4, 9))) for _ in range(5000)]
+    for i in range(n):
+        words = rng.sample(ADJECTIVES, 2)
+        item = rng.choice(ITEMS)
+        yield {
+            "_id": str(i),
+            "name": f"{rng.choice(brands).title()} {words[0].title()} {words[1].title()} {item.title()}",
+            "category": item,
+            "description": f"{rng.choice(ADJECTIVES)} {item} in {rng.choice(ADJECTIVES)} style",
+        }
+
+
+def linear_scan(docs, query, limit):
+    query_words = tokenize(query)
+    scored = []
+    for doc in docs:
+        words = set(tokenize(doc["name"]))
+        score = sum(max((word_similarity(q, w) for w in words), default=0.0) for q in query_words)
+        scored.append((score, doc["_id"]))
+    scored.sort(reverse=True)
+    return scored[:limit]
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    docs = list(synthetic_catalog(n))
+
+    start = time.perf_counter()
+    index = SearchIndex()
+    index.rebuild(docs)
+    print(f"indexed {n} products ({len(index._words)} words) in {time.perf_counter() - start:.1f}s")
+    for query in QUERIES:
+        index.search(query)  # first query converts postings to arrays
+
+    timings = {query: [] for query in QUERIES}
+    for _ in range(50):
+        for query in QUERIES:
+            start = time.perf_counter()
+            index.search(query, 20)
+            timings[query].append((time.perf_counter() - start) * 1e3)
+    for query in QUERIES:
+        print(f"  {query!r:16} p50 {np.percentile(timings[query], 50):.3f} ms  p99 {np.percentile(timings[query], 99):.3f} ms")
+    everything = np.concatenate([timings[query] for query in QUERIES])
+    print(f"trigram index: p50 {np.percentile(everything, 50):.3f} ms, p99 {np.percentile(everything, 99):.3f} ms")
+
+    sample = docs[:10_000]
+    start = time.perf_counter()
+    linear_scan(sample, QUERIES[0], 20)
+    scan_ms = (time.perf_counter() - start) * 1e3 * n / len(sample)
+    print(f"linear scan (name only, extrapolated to {n}): {scan_ms:.0f} ms/query")
+
+
+if __name__ == "__main__":
+    main()
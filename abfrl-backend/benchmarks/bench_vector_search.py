@@ -0,0 +1,79 @@
+"""
+Vector search benchmark on a synthetic catalog: exact (full matrix scan +
+argpartition) vs the IVF approximate index, with recall@10 of the latter.
+
+Run from abfrl-backend/:  python benchmarks/bench_vector_search.py [n_products]
+"""
+
+import os
+import random
+import sys
+import time
+
+os.environ.setdefault("MONGODB_URL", "mongodb://localhost:27017")
+os.environ.setdefault("GOOGLE_API_KEY", "bench")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import numpy as np  # noqa: E402
+
+from app.core.config import settings  # noqa: E402
+from app.services.vector_store import HashingEmbedder, VectorIndex, product_fields  # noqa: E402
+
+ADJECTIVES = ["slim", "relaxed", "classic", "vintage", "linen", "cotton", "denim", "silk", "wool", "leather",
+              "floral", "striped", "printed", "formal", "casual", "summer", "winter", "festive", "black", "white"]
+ITEMS = ["jeans", "shirt", "tshirt", "kurta", "saree", "jacket", "blazer", "dress", "sneakers", "boots",
+         "chinos", "hoodie", "skirt", "shorts", "sweater"]
+QUERIES = ["show me slim jeans", "linen shirt for summer", "festive silk saree", "black leather jacket",
+           "casual white sneakers", "wool sweater for winter", "floral summer dress", "formal blazer"]
+
+
+def synthetic_catalog(n, seed=7):
+    rng = random.Random(seed)
+    for i in range(n):
+        words = rng.sample(ADJECTIVES, 2)
+        item = rng.choice(ITEMS)
+        yield {
+            "_id": str(i),
+            "name": f"{words[0].title()} {words[1].title()} {item.title()} {i}",
+            "category": item,
+            "description": f"{rng.choice(ADJECTIVES)} {item} in {rng.choice(ADJECTIVES)} style",
+        }
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e3
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    embedder = HashingEmbedder(settings.VECTOR_DIM)
+
+    start = time.perf_counter()
+    docs = list(synthetic_catalog(n))
+    vectors = np.vstack([embedder.embed_fields(product_fields(doc)) for doc in docs])
+    print(f"embedded {n} products in {time.perf_counter() - start:.1f}s ({vectors.nbytes / 1e6:.0f} MB)")
+
+    exact = VectorIndex(settings.VECTOR_DIM, ann_min_items=n + 1, nprobe=settings.VECTOR_ANN_NPROBE)
+    exact.build([doc["_id"] for doc in docs], vectors)
+    start = time.perf_counter()
+    ivf = VectorIndex(settings.VECTOR_DIM, ann_min_items=1, nprobe=settings.VECTOR_ANN_NPROBE)
+    ivf.build([doc["_id"] for doc in docs], vectors)
+    print(f"IVF build: {time.perf_counter() - start:.1f}s")
+
+    query_vectors = [embedder.embed_query(query) for query in QUERIES]
+    exact_ms = timed(lambda: [exact.search(q, 10) for q in query_vectors], 5) / len(QUERIES)
+    ivf_ms = timed(lambda: [ivf.search(q, 10) for q in query_vectors], 5) / len(QUERIES)
+
+    recall = []
+    for q in query_vectors:
+        truth = {pid for pid, _ in exact.search(q, 10)}
+        recall.append(len(truth & {pid for pid, _ in ivf.search(q, 10)}) / 10)
+    print(f"exact: {exact_ms:.2f} ms/query")
+    print(f"ivf:   {ivf_ms:.2f} ms/query  (nprobe={settings.VECTOR_ANN_NPROBE}, recall@10={np.mean(recall):.2f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,28 +1,492 @@
+"""
+Seed MongoDB.
+
+    python seed_mongo.py
+        Products from data/products_seed.json (existing names are left alone),
+        stocked per data/inventory_seed.json and data/stores_seed.json.
+
+    python seed_mongo.py --synthetic --products 1000000 --users 100000 --orders 10000000 --sessions 200000
+        A deterministic synthetic dataset: fashion products with per-store
+        inventory, users, orders and chat sessions.
+
+Everything is written in streamed batches with bulk_write(ordered=False)
+upserts, so memory stays flat and re-running is idempotent. Synthetic
+documents are a pure function of --seed and their index (ids included), so
+a later run that only adds orders still points at the same products and
+users, and two machines seeding the same sizes get the same data.
+
+Both modes also upsert the stores with their coordinates, and finish by
+rebuilding the store_inventory collection from the products' inventory and
+flagging low-stock products.
+"""
+
+import argparse
 import asyncio
 import json
 import os
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, Iterator, List
+
+import numpy as np
+from bson import ObjectId
+from pymongo import ReplaceOne, UpdateOne
+from pymongo.errors import BulkWriteError
+
 from app.db.mongodb import init_db
-from app.models.product import Product
+from app.models.chat import ChatSession
+from app.models.order import Order
+from app.models.product import Inventory, Product
+from app.models.store import Store
+from app.models.user import User
+from app.services import catalog_cache, low_stock, store_inventory
 
-async def seed_products():
-    print("Initializing database...")
-    await init_db()
-    
-    print("Reading seed data...")
+# Entities are generated in fixed blocks, each from its own random stream, so
+# the data does not depend on the write batch size
+BLOCK = 1000
+EPOCH = datetime(2024, 1, 1)
+HISTORY_DAYS = 365 * 2  # orders and sessions are spread over this period
+SEED_FILE_SIZE = "One Size"
+
+_MAX_SIZES = 6  # longest size chart below
+_MAX_STORES_PER_PRODUCT = 4
+_MAX_ORDER_ITEMS = 5
+_MAX_CHAT_TURNS = 5
+
+_KIND_CODES = {"product": 1, "user": 2, "order": 3, "session": 4}
+
+# (category, sizes, typical price)
+CATEGORIES = [
+    ("shirts", ["S", "M", "L", "XL", "XXL"], 1499),
+    ("tshirts", ["XS", "S", "M", "L", "XL", "XXL"], 799),
+    ("jeans", ["28", "30", "32", "34", "36", "38"], 1999),
+    ("trousers", ["28", "30", "32", "34", "36", "38"], 1799),
+    ("kurtas", ["S", "M", "L", "XL", "XXL"], 1299),
+    ("sarees", ["Free"], 3499),
+    ("dresses", ["XS", "S", "M", "L", "XL"], 2199),
+    ("jackets", ["S", "M", "L", "XL", "XXL"], 3999),
+    ("blazers", ["38", "40", "42", "44", "46"], 5999),
+    ("sweaters", ["S", "M", "L", "XL"], 1899),
+    ("sneakers", ["6", "7", "8", "9", "10", "11"], 2999),
+    ("boots", ["6", "7", "8", "9", "10", "11"], 4499),
+]
+ITEM_NAMES = {
+    "shirts": ["Shirt", "Oxford Shirt", "Linen Shirt", "Casual Shirt"],
+    "tshirts": ["T-Shirt", "Polo", "Graphic Tee", "Henley"],
+    "jeans": ["Jeans", "Slim Jeans", "Straight Jeans", "Ripped Jeans"],
+    "trousers": ["Chinos", "Trousers", "Cargo Pants", "Joggers"],
+    "kurtas": ["Kurta", "Kurta Set", "Nehru Kurta", "Straight Kurta"],
+    "sarees": ["Saree", "Silk Saree", "Cotton Saree", "Banarasi Saree"],
+    "dresses": ["Dress", "Maxi Dress", "Wrap Dress", "Shirt Dress"],
+    "jackets": ["Jacket", "Denim Jacket", "Bomber Jacket", "Biker Jacket"],
+    "blazers": ["Blazer", "Suit Blazer", "Linen Blazer", "Tuxedo Blazer"],
+    "sweaters": ["Sweater", "Cardigan", "Pullover", "Hoodie"],
+    "sneakers": ["Sneakers", "Running Shoes", "Canvas Sneakers", "High Tops"],
+    "boots": ["Boots", "Chelsea Boots", "Chukka Boots", "Hiking Boots"],
+}
+BRANDS = ["Allen Solly", "Louis Philippe", "Van Heusen", "Peter England", "Pantaloons", "Simon Carter",
+          "Forever Glam", "Jaypore", "Marigold Lane", "Byond", "Akkriti", "Rangmanch"]
+ADJECTIVES = ["Classic", "Slim Fit", "Relaxed", "Regular Fit", "Vintage", "Festive", "Everyday", "Premium",
+              "Tailored", "Printed", "Striped", "Solid", "Textured", "Embroidered", "Washed", "Lightweight"]
+MATERIALS = ["cotton", "linen", "denim", "silk", "wool", "polyester blend", "viscose", "leather", "suede", "khadi"]
+COLORS = ["black", "white", "navy", "blue", "grey", "beige", "olive", "maroon", "red", "green", "pink", "mustard"]
+CITIES = [("Mumbai", "Maharashtra", "400001"), ("Delhi", "Delhi", "110001"), ("Bengaluru", "Karnataka", "560001"),
+          ("Hyderabad", "Telangana", "500001"), ("Chennai", "Tamil Nadu", "600001"), ("Kolkata", "West Bengal", "700001"),
+          ("Pune", "Maharashtra", "411001"), ("Ahmedabad", "Gujarat", "380001"), ("Jaipur", "Rajasthan", "302001"),
+          ("Lucknow", "Uttar Pradesh", "226001"), ("Kochi", "Kerala", "682001"), ("Chandigarh", "Chandigarh", "160001")]
+# (latitude, longitude) of each city's centre
+CITY_COORDINATES = {"Mumbai": (19.0760, 72.8777), "Delhi": (28.6139, 77.2090), "Bengaluru": (12.9716, 77.5946),
+                    "Hyderabad": (17.3850, 78.4867), "Chennai": (13.0827, 80.2707), "Kolkata": (22.5726, 88.3639),
+                    "Pune": (18.5204, 73.8567), "Ahmedabad": (23.0225, 72.5714), "Jaipur": (26.9124, 75.7873),
+                    "Lucknow": (26.8467, 80.9462), "Kochi": (9.9312, 76.2673), "Chandigarh": (30.7333, 76.7794)}
+STORE_AREAS = ["Central", "Mall", "High Street", "Airport", "North", "South", "East", "West"]
+# Each area's (north, east) offset from the city centre, in degrees
+_AREA_OFFSETS = [(0.0, 0.0), (0.03, 0.04), (-0.02, 0.03), (0.08, -0.05), (0.1, 0.0), (-0.1, 0.0), (0.0, 0.1), (0.0, -0.1)]
+FIRST_NAMES = ["Aarav", "Vivaan", "Aditya", "Arjun", "Rohan", "Kabir", "Ishaan", "Ananya", "Diya", "Saanvi",
+               "Aadhya", "Kiara", "Meera", "Priya", "Neha", "Rahul", "Vikram", "Sneha", "Pooja", "Karan"]
+LAST_NAMES = ["Sharma", "Verma", "Iyer", "Reddy", "Nair", "Patel", "Shah", "Gupta", "Mehta", "Singh",
+              "Das", "Rao", "Kulkarni", "Joshi", "Menon", "Chopra", "Bose", "Kapoor", "Malhotra", "Pillai"]
+PAYMENT_METHODS = ["upi", "card", "netbanking", "wallet"]
+ORDER_STATUSES = (["delivered", "shipped", "confirmed", "cancelled", "pending"], [0.7, 0.08, 0.1, 0.07, 0.05])
+CHANNELS = (["web", "telegram", "whatsapp"], [0.7, 0.2, 0.1])
+CHAT_ASKS = ["Show me {item} under {price}", "Do you have {item} in size {size}?", "I need a {color} {item} for a wedding",
+             "Is the {name} available in {city}?", "Add the {name} to my cart", "What goes well with {item}?"]
+CHAT_REPLIES = ["Here are some {item} you might like.", "Yes, the {name} is available in size {size}.",
+                "I found {count} options in {color}.", "Added {name} to your cart.", "It is in stock at our {city} store."]
+
+
+def synthetic_id(kind: str, seed: int, index: int) -> ObjectId:
+    """
+    Deterministic ObjectId: fixed timestamp, kind, 24 bits of seed, index.
+    Ids of one kind sort by index, so inserts append to the _id index.
+    """
+    return ObjectId(
+        int(EPOCH.timestamp()).to_bytes(4, "big")
+        + bytes([_KIND_CODES[kind]])
+        + (seed % (1 << 24)).to_bytes(3, "big")
+        + index.to_bytes(4, "big")
+    )
+
+
+def _rng(seed: int, kind: str, block: int) -> np.random.Generator:
+    return np.random.default_rng([seed, _KIND_CODES[kind], block])
+
+
+def _blocks(count: int, kind: str, seed: int, make_block: Callable[[np.random.Generator, int, int], List[dict]]) -> Iterator[dict]:
+    for block in range(0, (count + BLOCK - 1) // BLOCK):
+        start = block * BLOCK
+        yield from make_block(_rng(seed, kind, block), start, min(start + BLOCK, count))
+
+
+def store_locations(n_stores: int) -> List[str]:
+    return [f"{CITIES[i % len(CITIES)][0]} {STORE_AREAS[i // len(CITIES) % len(STORE_AREAS)]}" for i in range(n_stores)]
+
+
+def synthetic_stores(n_stores: int) -> List[dict]:
+    """
+    Store documents for store_locations(n_stores), placed around their city.
+    """
+    stores = []
+    for i, name in enumerate(store_locations(n_stores)):
+        city = CITIES[i % len(CITIES)][0]
+        area = i // len(CITIES) % len(STORE_AREAS)
+        latitude, longitude = CITY_COORDINATES[city]
+        north, east = _AREA_OFFSETS[area]
+        stores.append(_store_doc(name, STORE_AREAS[area], city, latitude + north, longitude + east))
+    return stores
+
+
+def _store_doc(name: str, location, city, latitude: float, longitude: float) -> dict:
+    return {"name": name, "location": location, "city": city,
+            "geo": {"type": "Point", "coordinates": [round(longitude, 6), round(latitude, 6)]}}
+
+
+async def seed_stores(stores: List[dict]) -> None:
+    """
+    Upsert store documents by name (they carry the coordinates nearest-store queries use).
+    """
+    if stores:
+        await Store.get_motor_collection().bulk_write(
+            [UpdateOne({"name": store["name"]}, {"$set": store}, upsert=True) for store in stores], ordered=False
+        )
+    print(f"  stores: {len(stores)} upserted")
+
+
+class SyntheticCatalog:
+    """
+    Per-product attributes as NumPy arrays (a few bytes per product), so
+    orders can name and price any product without reading it back.
+    """
+
+    def __init__(self, seed: int, n_products: int, n_stores: int) -> None:
+        self.seed = seed
+        self.n_products = n_products
+        self.stores = store_locations(n_stores)
+        rng = np.random.default_rng([seed, _KIND_CODES["product"]])
+        self.category = rng.integers(0, len(CATEGORIES), n_products, dtype=np.int8)
+        self.brand = rng.integers(0, len(BRANDS), n_products, dtype=np.int8)
+        adjective = rng.integers(0, len(ADJECTIVES), n_products, dtype=np.int32)
+        item = rng.integers(0, 4, n_products, dtype=np.int32)
+        typical = np.array([price for _, _, price in CATEGORIES], dtype=np.float64)
+        # Log-normal around the category's typical price, ending in 99
+        price = typical[self.category] * rng.lognormal(0.0, 0.35, n_products)
+        self.price = np.maximum(np.round(price / 100) * 100 - 1, 199).astype(np.float32)
+        # Names come from a table of every brand/adjective/item combination
+        self._names = [
+            f"{brand} {adj} {name}"
+            for category, _, _ in CATEGORIES for brand in BRANDS for adj in ADJECTIVES for name in ITEM_NAMES[category]
+        ]
+        self._name_code = ((self.category.astype(np.int32) * len(BRANDS) + self.brand) * len(ADJECTIVES) + adjective) * 4 + item
+
+    def product_id(self, i: int) -> str:
+        return str(synthetic_id("product", self.seed, i))
+
+    def name(self, i: int) -> str:
+        return self._names[self._name_code[i]]
+
+    def sizes(self, i: int) -> List[str]:
+        return CATEGORIES[self.category[i]][1]
+
+    def products(self) -> Iterator[dict]:
+        return _blocks(self.n_products, "product", self.seed, self._product_block)
+
+    def _product_block(self, rng: np.random.Generator, start: int, end: int) -> List[dict]:
+        count = end - start
+        n_stores = len(self.stores)
+        # Draw the whole block at once; per-document RNG calls dominate otherwise
+        colors = rng.random((count, len(COLORS))).argsort(axis=1)[:, :3].tolist()
+        n_colors = rng.integers(1, 4, count).tolist()
+        materials = rng.integers(0, len(MATERIALS), count).tolist()
+        # Stocked in a few stores, in most of the category's sizes
+        stores = rng.random((count, n_stores)).argsort(axis=1)[:, :_MAX_STORES_PER_PRODUCT].tolist()
+        n_in_stores = rng.integers(1, _MAX_STORES_PER_PRODUCT + 1, count).tolist()
+        kept = (rng.random((count, _MAX_SIZES)) < 0.8).tolist()
+        quantities = rng.integers(0, 25, (count, _MAX_STORES_PER_PRODUCT, _MAX_SIZES)).tolist()
+        docs = []
+        for k, i in enumerate(range(start, end)):
+            category, sizes, _ = CATEGORIES[self.category[i]]
+            product_colors = [COLORS[c] for c in colors[k][:n_colors[k]]]
+            stocked = [size for size, keep in zip(sizes, kept[k]) if keep] or sizes[:1]
+            inventory = [
+                {"store_location": self.stores[s], "size": size, "quantity": quantities[k][j][z]}
+                for j, s in enumerate(sorted(stores[k][:n_in_stores[k]])) for z, size in enumerate(stocked)
+            ]
+            name = self.name(i)
+            material = MATERIALS[materials[k]]
+            docs.append({
+                "_id": synthetic_id("product", self.seed, i),
+                "name": name,
+                "description": f"{name} in {material}, available in {', '.join(product_colors)}.",
+                "price": float(self.price[i]),
+                "category": category,
+                "image_url": None,
+                "stock": sum(entry["quantity"] for entry in inventory),
+                "metadata_info": {"colors": product_colors, "brand": BRANDS[self.brand[i]], "material": material},
+                "inventory": inventory,
+                "shopkeeper_id": None,
+                "shopkeeper_name": None,
+                "is_verified": True,
+                "version": 0,
+                # Listing fields the model derives on write (bulk writes skip the hooks)
+                "sizes": sorted({entry["size"] for entry in inventory}),
+                "colors": product_colors,
+            })
+        return docs
+
+
+def user_uid(seed: int, i: int) -> str:
+    return f"synthetic-{seed}-{i:08d}"
+
+
+def _user_fields(seed: int, i: int) -> dict:
+    # Names and city depend only on the index, so orders and sessions can rebuild them cheaply
+    first = FIRST_NAMES[(i * 7 + seed) % len(FIRST_NAMES)]
+    last = LAST_NAMES[(i * 13 + seed) % len(LAST_NAMES)]
+    return {
+        "name": f"{first} {last}",
+        "email": f"{first}.{last}.{i}@example.com".lower(),
+        "phone": f"+91{7000000000 + i}",
+        "city": CITIES[(i * 5 + seed) % len(CITIES)],
+        "uid": user_uid(seed, i),
+    }
+
+
+def users(seed: int, n_users: int) -> Iterator[dict]:
+    def block(rng, start, end):
+        count = end - start
+        days = rng.uniform(0, HISTORY_DAYS, count).tolist()
+        points = rng.integers(0, 5000, count).tolist()
+        docs = []
+        for k, i in enumerate(range(start, end)):
+            user = _user_fields(seed, i)
+            created = EPOCH + timedelta(days=days[k])
+            docs.append({
+                "_id": synthetic_id("user", seed, i),
+                "firebase_uid": user["uid"],
+                "email": user["email"],
+                "phone_number": user["phone"],
+                "full_name": user["name"],
+                "name": user["name"],
+                "loyalty_points": points[k],
+                "telegram_chat_id": None,
+                "role": "user",
+                "shop_name": None,
+                "shop_description": None,
+                "shop_address": None,
+                "created_at": created,
+                "updated_at": created,
+            })
+        return docs
+
+    return _blocks(n_users, "user", seed, block)
+
+
+def _popular(rng: np.random.Generator, n: int, size: int) -> np.ndarray:
+    # Heavy-tailed popularity: low indexes are picked far more often
+    return np.floor(n * rng.random(size) ** 3).astype(np.int64)
+
+
+def orders(catalog: SyntheticCatalog, n_users: int, n_orders: int) -> Iterator[dict]:
+    seed = catalog.seed
+    # Spread evenly over the history, so index order is time order
+    step = timedelta(days=HISTORY_DAYS) / max(n_orders, 1)
+
+    def block(rng, start, end):
+        count = end - start
+        buyers = _popular(rng, n_users, count).tolist()
+        n_items = (rng.choice(_MAX_ORDER_ITEMS, count, p=[0.45, 0.3, 0.15, 0.07, 0.03]) + 1).tolist()
+        # Items beyond the first come from nearby products, which gives co-purchase structure
+        offsets = np.concatenate([np.zeros((count, 1), dtype=np.int64), rng.integers(1, 50, (count, _MAX_ORDER_ITEMS - 1))], axis=1)
+        picked = ((_popular(rng, catalog.n_products, count)[:, None] + offsets) % catalog.n_products).tolist()
+        quantities = rng.choice([1, 2, 3], (count, _MAX_ORDER_ITEMS), p=[0.75, 0.15, 0.1]).tolist()
+        size_picks = rng.integers(0, 1 << 30, (count, _MAX_ORDER_ITEMS)).tolist()
+        discounted = (rng.random(count) < 0.15).tolist()
+        statuses = rng.choice(len(ORDER_STATUSES[0]), count, p=ORDER_STATUSES[1]).tolist()
+        methods = rng.integers(0, len(PAYMENT_METHODS), count).tolist()
+        houses = rng.integers(1, 500, count).tolist()
+        areas = rng.integers(0, len(STORE_AREAS), count).tolist()
+        jitter = rng.random(count).tolist()
+        docs = []
+        for k, i in enumerate(range(start, end)):
+            items = []
+            for j, p in enumerate(dict.fromkeys(picked[k][:n_items[k]])):
+                sizes = catalog.sizes(p)
+                items.append({
+                    "product_id": catalog.product_id(p),
+                    "product_name": catalog.name(p),
+                    "quantity": quantities[k][j],
+                    "price": float(catalog.price[p]),
+                    "size": sizes[size_picks[k][j] % len(sizes)],
+                })
+            subtotal = round(sum(item["price"] * item["quantity"] for item in items), 2)
+            discount = round(subtotal * 0.1, 2) if discounted[k] else 0.0
+            shipping = 0.0 if subtotal >= 999 else 99.0
+            user = _user_fields(seed, buyers[k])
+            city, state, zip_code = user["city"]
+            status = ORDER_STATUSES[0][statuses[k]]
+            docs.append({
+                "_id": synthetic_id("order", seed, i),
+                "user_id": user["uid"],
+                "total_amount": round(subtotal - discount + shipping, 2),
+                "subtotal": subtotal,
+                "shipping_cost": shipping,
+                "discount_amount": discount,
+                "discount_code": "WELCOME10" if discount else None,
+                "status": status,
+                "created_at": EPOCH + step * (i + jitter[k]),
+                "items": items,
+                "payment_method": PAYMENT_METHODS[methods[k]],
+                "payment_status": "pending" if status == "pending" else "success",
+                "razorpay_order_id": None,
+                "razorpay_payment_id": None,
+                "razorpay_signature": None,
+                "shipping_name": user["name"],
+                "shipping_email": user["email"],
+                "shipping_phone": user["phone"],
+                "shipping_address_line1": f"{houses[k]}, {STORE_AREAS[areas[k]]} Road",
+                "shipping_address_line2": None,
+                "shipping_city": city,
+                "shipping_state": state,
+                "shipping_zip": zip_code,
+                "shipping_country": "India",
+                "notes": None,
+            })
+        return docs
+
+    return _blocks(n_orders, "order", seed, block)
+
+
+def chat_sessions(catalog: SyntheticCatalog, n_users: int, n_sessions: int) -> Iterator[dict]:
+    seed = catalog.seed
+
+    def block(rng, start, end):
+        count = end - start
+        owners = _popular(rng, n_users, count).tolist()
+        days = rng.uniform(0, HISTORY_DAYS, count).tolist()
+        channels = rng.choice(len(CHANNELS[0]), count, p=CHANNELS[1]).tolist()
+        n_turns = rng.integers(1, _MAX_CHAT_TURNS + 1, count).tolist()
+        shape = (count, _MAX_CHAT_TURNS)
+        products = _popular(rng, catalog.n_products, count * _MAX_CHAT_TURNS).reshape(shape).tolist()
+        size_picks = rng.integers(0, 1 << 30, shape).tolist()
+        colors = rng.integers(0, len(COLORS), shape).tolist()
+        counts = rng.integers(2, 12, shape).tolist()
+        asks = rng.integers(0, len(CHAT_ASKS), shape).tolist()
+        replies = rng.integers(0, len(CHAT_REPLIES), shape).tolist()
+        docs = []
+        for k, i in enumerate(range(start, end)):
+            user = _user_fields(seed, owners[k])
+            created = EPOCH + timedelta(days=days[k])
+            messages = []
+            for turn in range(n_turns[k]):
+                p = products[k][turn]
+                sizes = catalog.sizes(p)
+                values = {
+                    "item": CATEGORIES[catalog.category[p]][0], "name": catalog.name(p), "price": int(catalog.price[p]),
+                    "size": sizes[size_picks[k][turn] % len(sizes)], "color": COLORS[colors[k][turn]],
+                    "city": user["city"][0], "count": counts[k][turn],
+                }
+                at = created + timedelta(minutes=turn)
+                messages.append({"role": "user", "content": CHAT_ASKS[asks[k][turn]].format(**values), "timestamp": at})
+                messages.append({"role": "agent", "content": CHAT_REPLIES[replies[k][turn]].format(**values),
+                                 "timestamp": at + timedelta(seconds=2)})
+            docs.append({
+                "_id": synthetic_id("session", seed, i),
+                "user_id": user["uid"],
+                "channel": CHANNELS[0][channels[k]],
+                "session_id": f"synthetic-{seed}-session-{i:08d}",
+                "created_at": created,
+                "messages": messages,
+            })
+        return docs
+
+    return _blocks(n_sessions, "session", seed, block)
+
+
+async def bulk_write_stream(collection, requests: Iterable, label: str, total: int, batch_size: int, in_flight: int) -> int:
+    """
+    Send write requests in bulk_write(ordered=False) batches, with up to
+    `in_flight` batches outstanding while the next ones are generated.
+    Returns the number of requests that failed.
+    """
+    slots = asyncio.Semaphore(in_flight)
+    tasks: List[asyncio.Task] = []
+    failed = 0
+    sent = 0
+    started = time.perf_counter()
+
+    async def write(batch):
+        nonlocal failed
+        try:
+            await collection.bulk_write(batch, ordered=False)
+        except BulkWriteError as e:
+            failed += len(e.details.get("writeErrors", []))
+        finally:
+            slots.release()
+
+    batch = []
+    for request in requests:
+        batch.append(request)
+        if len(batch) >= batch_size:
+            await slots.acquire()
+            tasks.append(asyncio.create_task(write(batch)))
+            tasks = [task for task in tasks if not task.done()]
+            sent += len(batch)
+            batch = []
+            if sent % (batch_size * 20) == 0:
+                rate = sent / (time.perf_counter() - started)
+                print(f"  {label}: {sent:,}/{total:,} ({rate:,.0f}/s)")
+    if batch:
+        await slots.acquire()
+        tasks.append(asyncio.create_task(write(batch)))
+        sent += len(batch)
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+    print(f"  {label}: {sent:,} written in {elapsed:.1f}s ({sent / max(elapsed, 1e-9):,.0f}/s), {failed} failed")
+    return failed
+
+
+def _upserts(docs: Iterable[dict]) -> Iterator[ReplaceOne]:
+    for doc in docs:
+        yield ReplaceOne({"_id": doc["_id"]}, doc, upsert=True)
+
+
+async def seed_products(batch_size: int = 1000, in_flight: int = 4) -> None:
+    """
+    Products from data/products_seed.json, stocked in the stores of
+    data/stores_seed.json per data/inventory_seed.json; products whose name
+    already exists are left as they are.
+    """
     file_path = os.path.join("data", "products_seed.json")
     if not os.path.exists(file_path):
         print(f"File not found: {file_path}")
         return
-
     with open(file_path, "r") as f:
         products_data = json.load(f)
-        
     print(f"Found {len(products_data)} products.")
-    
-    for p_data in products_data:
-        # Check if product exists
-        existing = await Product.find_one(Product.name == p_data["name"])
-        if not existing:
+    inventory = seed_file_inventory(len(products_data))
+
+    def requests():
+        for number, p_data in enumerate(products_data, start=1):
             product = Product(
                 name=p_data["name"],
                 description=p_data.get("description"),
@@ -30,14 +494,92 @@ async def seed_products():
                 category=p_data["category"],
                 stock=p_data.get("stock", 0),
                 image_url=p_data.get("image_url"),
-                metadata_info=p_data.get("metadata", {})
+                metadata_info=p_data.get("metadata", {}),
+                inventory=inventory.get(number, []),
             )
-            await product.insert()
-            print(f"Inserted: {product.name}")
-        else:
-            print(f"Skipped (already exists): {p_data['name']}")
-            
+            product.denormalize_listing_fields()
+            yield UpdateOne({"name": product.name}, {"$setOnInsert": product.model_dump(exclude={"id", "revision_id"})}, upsert=True)
+
+    await bulk_write_stream(Product.get_motor_collection(), requests(), "products", len(products_data), batch_size, in_flight)
+    with open(os.path.join("data", "stores_seed.json")) as f:
+        await seed_stores([
+            _store_doc(store["name"], store.get("location"), store.get("city"), store["latitude"], store["longitude"])
+            for store in json.load(f) if "latitude" in store and "longitude" in store
+        ])
+    await store_inventory.rebuild()
+    await low_stock.recompute()
+    await catalog_cache.publish_change()
+
+
+def seed_file_inventory(n_products: int) -> Dict[int, List[Inventory]]:
+    """
+    Inventory entries per product number (1-based position in the products
+    seed file): each product's seeded stock split evenly over the seeded
+    stores. The seed products are not sized, so everything is one size.
+    """
+    with open(os.path.join("data", "inventory_seed.json")) as f:
+        stock = {entry["product_id"]: entry["stock"] for entry in json.load(f)}
+    with open(os.path.join("data", "stores_seed.json")) as f:
+        stores = [store["name"] for store in json.load(f)]
+    inventory = {}
+    for number in range(1, n_products + 1):
+        if number not in stock or not stores:
+            continue
+        share, extra = divmod(stock[number], len(stores))
+        inventory[number] = [
+            Inventory(store_location=store, size=SEED_FILE_SIZE, quantity=share + (1 if i < extra else 0))
+            for i, store in enumerate(stores)
+        ]
+    return inventory
+
+
+async def seed_synthetic(args) -> None:
+    catalog = SyntheticCatalog(args.seed, args.products, args.stores)
+    print(f"Synthetic dataset (seed {args.seed}): {args.products:,} products in {args.stores} stores, "
+          f"{args.users:,} users, {args.orders:,} orders, {args.sessions:,} chat sessions")
+    jobs = [
+        (Product, catalog.products(), "products", args.products),
+        (User, users(args.seed, args.users), "users", args.users),
+        (Order, orders(catalog, max(args.users, 1), args.orders), "orders", args.orders),
+        (ChatSession, chat_sessions(catalog, max(args.users, 1), args.sessions), "chat sessions", args.sessions),
+    ]
+    for model, docs, label, total in jobs:
+        if total:
+            await bulk_write_stream(model.get_motor_collection(), _upserts(docs), label, total, args.batch_size, args.in_flight)
+    await seed_stores(synthetic_stores(args.stores))
+    print("Rebuilding store inventory...")
+    await store_inventory.rebuild()
+    await low_stock.recompute()
+    await catalog_cache.publish_change()
+    print("Derived indexes are rebuilt by their jobs: python -m app.services.copurchase, python -m app.services.embedding_store")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--synthetic", action="store_true", help="generate a synthetic dataset instead of the seed file")
+    parser.add_argument("--products", type=int, default=10_000)
+    parser.add_argument("--users", type=int, default=1_000)
+    parser.add_argument("--orders", type=int, default=50_000)
+    parser.add_argument("--sessions", type=int, default=1_000)
+    parser.add_argument("--stores", type=int, default=24)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--batch-size", type=int, default=2_000, help="documents per bulk_write")
+    parser.add_argument("--in-flight", type=int, default=4, help="bulk_write batches outstanding at once")
+    return parser.parse_args(argv)
+
+
+async def main(argv=None) -> None:
+    args = parse_args(argv)
+    print("Initializing database...")
+    await init_db()
+    if args.synthetic:
+        if args.products < 1:
+            raise SystemExit("--products must be at least 1")
+        await seed_synthetic(args)
+    else:
+        await seed_products(args.batch_size, args.in_flight)
     print("Seeding completed.")
 
+
 if __name__ == "__main__":
-    asyncio.run(seed_products())
+    asyncio.run(main())
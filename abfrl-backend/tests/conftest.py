@@ -0,0 +1,37 @@
+import os
+import uuid
+
+import pytest
+import pytest_asyncio
+
+
+@pytest_asyncio.fixture
+async def mongo_db():
+    """
+    A throwaway database on the server at TEST_MONGODB_URL, initialised with
+    all document models (and their indexes) and dropped afterwards. Tests
+    using it are skipped when no server is configured or reachable.
+    """
+    from beanie import init_beanie
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    from app.db.mongodb import DOCUMENT_MODELS
+
+    url = os.environ.get("TEST_MONGODB_URL")
+    if not url:
+        pytest.skip("TEST_MONGODB_URL not set")
+
+    client = AsyncIOMotorClient(url, serverSelectionTimeoutMS=2000)
+    try:
+        await client.admin.command("ping")
+    except Exception as exc:
+        client.close()
+        pytest.skip(f"MongoDB not reachable at {url}: {exc}")
+
+    name = f"test_{uuid.uuid4().hex[:12]}"
+    await init_beanie(database=client[name], document_models=DOCUMENT_MODELS)
+    try:
+        yield client[name]
+    finally:
+        await client.drop_database(name)
+        client.close()
@@ -0,0 +1,38 @@
+import pytest
+from app.agents.master import MasterAgent
+
+
+class FakeStreamingLLM:
+    async def astream_response(self, prompt, chat_history=None):
+        for chunk in ["Hello ", "there", "!"]:
+            yield chunk
+
+    async def agenerate_response(self, prompt, chat_history=None):
+        raise AssertionError("streaming path should be used")
+
+
+@pytest.mark.asyncio
+async def test_stream_message_yields_llm_chunks_then_done():
+    agent = MasterAgent(llm=FakeStreamingLLM())
+
+    events = [event async for event in agent.stream_message("hi there", [], "test_user")]
+
+    assert [e["content"] for e in events[:-1]] == ["Hello ", "there", "!"]
+    assert events[-1]["done"] is True
+    assert events[-1]["result"]["response"] == "Hello there!"
+
+
+@pytest.mark.asyncio
+async def test_stream_message_sends_deterministic_reply_as_one_chunk():
+    agent = MasterAgent(llm=FakeStreamingLLM())
+
+    async def fake_cart_summary(user_id):
+        return {"items": [], "subtotal": 0, "shipping": 0, "discount": 0, "total": 0}
+
+    agent.cart_service.get_cart_summary = fake_cart_summary
+
+    events = [event async for event in agent.stream_message("show cart", [], "test_user")]
+
+    assert len(events) == 2
+    assert "empty" in events[0]["content"].lower()
+    assert events[1]["result"]["cart_summary"]["items"] == []
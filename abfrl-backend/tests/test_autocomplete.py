@@ -0,0 +1,115 @@
+import random
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import autocomplete
+from app.services.autocomplete import MAX_SUGGESTIONS, AutocompleteIndex
+
+
+def make_product(product_id, name, category):
+    return SimpleNamespace(id=product_id, name=name, category=category)
+
+
+POPULARITY = {"p1": 10, "p2": 40, "p3": 5}
+
+
+@pytest.fixture
+def index(monkeypatch):
+    monkeypatch.setattr(autocomplete.copurchase_index, "popularity", lambda: POPULARITY)
+    index = AutocompleteIndex()
+    index.rebuild([
+        make_product("p1", "Slim Fit Jeans", "jeans"),
+        make_product("p2", "Graphic Print T-Shirt", "tshirts"),
+        make_product("p3", "Oxford Cotton Shirt", "shirts"),
+        make_product("p4", "Silk Saree", "sarees"),
+    ], POPULARITY)
+    return index
+
+
+def texts(suggestions):
+    return [suggestion["text"] for suggestion in suggestions]
+
+
+def test_prefix_matches_any_word_start_ranked_by_popularity(index):
+    # Categories score their products' orders plus one per product
+    assert texts(index.suggest("s")) == ["Slim Fit Jeans", "shirts", "Oxford Cotton Shirt", "sarees", "Silk Saree"]
+    assert texts(index.suggest("t-sh")) == ["tshirts", "Graphic Print T-Shirt"]
+    assert index.suggest("jea")[1] == {"text": "Slim Fit Jeans", "type": "product", "id": "p1"}
+    assert index.suggest("xyz") == [] and index.suggest("  ") == []
+
+
+def test_catalog_hook_keeps_rankings_current(index):
+    index.on_product_saved(make_product("p5", "Slim Stretch Chinos", "trousers"))
+    assert "Slim Stretch Chinos" in texts(index.suggest("sl"))
+    index.on_product_saved(make_product("p1", "Relaxed Jeans", "jeans"))
+    assert "Slim Fit Jeans" not in texts(index.suggest("sl"))
+    index.on_product_deleted("p5")
+    assert index.suggest("tro") == []
+
+
+def test_stored_rankings_match_a_fresh_build(monkeypatch):
+    rng = random.Random(11)
+    words = ["slim", "silk", "linen", "shirt", "saree", "shorts", "skirt", "kurta", "jeans", "jacket"]
+    popularity = {f"p{i}": rng.randint(0, 20) for i in range(300)}
+    monkeypatch.setattr(autocomplete.copurchase_index, "popularity", lambda: popularity)
+    products = [make_product(f"p{i}", " ".join(rng.sample(words, 3)), rng.choice(words)) for i in range(300)]
+    index = AutocompleteIndex()
+    index.rebuild(products[:200], popularity)
+    for prefix in ("s", "sl", "sh", "k"):
+        index.suggest(prefix)
+
+    # Writes after the rankings were stored: inserts, updates and deletes
+    live = {product.id: product for product in products[:200]}
+    for product in products[200:]:
+        index.on_product_saved(product)
+        live[product.id] = product
+    for i in range(0, 300, 7):
+        product = make_product(f"p{i}", " ".join(rng.sample(words, 2)), rng.choice(words))
+        index.on_product_saved(product)
+        live[product.id] = product
+    for i in range(3, 300, 11):
+        index.on_product_deleted(f"p{i}")
+        live.pop(f"p{i}", None)
+
+    fresh = AutocompleteIndex()
+    fresh.rebuild(live.values(), popularity)
+    for prefix in ("s", "sl", "sh", "k", "ja", "linen s"):
+        got = [(s["type"], fresh._score[fresh._product_suggestion[s["id"]]] if "id" in s else s["text"]) for s in index.suggest(prefix)]
+        want = [(s["type"], fresh._score[fresh._product_suggestion[s["id"]]] if "id" in s else s["text"]) for s in fresh.suggest(prefix)]
+        # Same scores in the same order (equal scores may pick different products)
+        assert len(got) == min(MAX_SUGGESTIONS, len(want)) and got == want, prefix
+
+
+@pytest.mark.asyncio
+async def test_new_order_counts_are_ranked_in_the_background(index, monkeypatch):
+    popularity = {"p1": 10, "p2": 40, "p3": 5, "p4": 100}
+    monkeypatch.setattr(autocomplete.copurchase_index, "popularity", lambda: popularity)
+    # Answered from the current rankings while the new ones are built
+    assert texts(index.suggest("s"))[0] == "Slim Fit Jeans"
+    await index.drain()
+    assert texts(index.suggest("s"))[:2] == ["sarees", "Silk Saree"]
+
+    # A write during the re-rank makes it start over from the new catalog
+    newer = {"p5": 500}
+    monkeypatch.setattr(autocomplete.copurchase_index, "popularity", lambda: newer)
+    index.suggest("s")
+    index.on_product_saved(make_product("p5", "Slim Stretch Chinos", "trousers"))
+    await index.drain()
+    assert texts(index.suggest("s"))[0] == "Slim Stretch Chinos"
+
+
+def test_batch_saves_keep_keys_sorted_and_complete(index):
+    batch = [make_product(f"n{i}", f"Slim Linen Shirt {i}", "shirts" if i % 2 else "linen") for i in range(20)]
+    index.on_products_saved(batch[:10])
+    # An update in the batch replaces the product's keys
+    relaxed = make_product("p1", "Relaxed Linen Jeans", "jeans")
+    index.on_products_saved(batch[10:] + [relaxed])
+
+    fresh = AutocompleteIndex()
+    fresh.rebuild([make_product("p2", "Graphic Print T-Shirt", "tshirts"), make_product("p3", "Oxford Cotton Shirt", "shirts"),
+                   make_product("p4", "Silk Saree", "sarees")] + batch + [relaxed], POPULARITY)
+    assert index._keys == fresh._keys
+    pairs = sorted((key, index._text[s]) for key, s in zip(index._keys, index._key_suggestion))
+    assert pairs == sorted((key, fresh._text[s]) for key, s in zip(fresh._keys, fresh._key_suggestion))
+    assert "Relaxed Linen Jeans" in texts(index.suggest("linen"))
@@ -0,0 +1,70 @@
+import asyncio
+import pytest
+from app.models.cart import Cart
+from app.models.product import Product
+from app.services.cart import CartService
+
+
+async def _product(name="Retro Tee", price=399.0):
+    product = Product(name=name, description="Cotton tee", price=price, category="tops", image_url="tee.png")
+    await product.insert()
+    return str(product.id)
+
+
+@pytest.mark.asyncio
+async def test_parallel_add_item_loses_no_updates(mongo_db):
+    product_id = await _product()
+
+    # Hundreds of adds race on the same (new) cart and the same two lines
+    await asyncio.gather(*[
+        CartService.add_item("race_user", product_id, 1, "M" if i % 2 else "L")
+        for i in range(300)
+    ])
+
+    carts = await Cart.find(Cart.user_id == "race_user").to_list()
+    assert len(carts) == 1
+    quantities = {item.size: item.quantity for item in carts[0].items}
+    assert quantities == {"M": 150, "L": 150}
+
+
+@pytest.mark.asyncio
+async def test_parallel_mixed_mutations_keep_other_lines(mongo_db):
+    tee = await _product()
+    jeans = await _product("Slim Jeans", 1299.0)
+    await CartService.add_item("mixed_user", jeans, 1, "32")
+
+    await asyncio.gather(
+        *[CartService.add_item("mixed_user", tee, 2, "M") for _ in range(100)],
+        *[CartService.update_quantity("mixed_user", jeans, 3, "32") for _ in range(20)],
+    )
+
+    summary = await CartService.get_cart_summary("mixed_user")
+    quantities = {item["name"]: item["quantity"] for item in summary["items"]}
+    assert quantities == {"Retro Tee": 200, "Slim Jeans": 3}
+
+    assert (await CartService.remove_item("mixed_user", jeans, "32"))["success"]
+    assert not (await CartService.remove_item("mixed_user", jeans, "32"))["success"]
+
+
+@pytest.mark.asyncio
+async def test_clear_cart_is_idempotent_for_new_users(mongo_db):
+    await asyncio.gather(*[CartService.clear_cart("fresh_user") for _ in range(20)])
+    carts = await Cart.find(Cart.user_id == "fresh_user").to_list()
+    assert len(carts) == 1 and carts[0].items == []
+
+
+@pytest.mark.asyncio
+async def test_replace_cart_merges_lines_and_reports_each_item(mongo_db):
+    tee = await _product()
+    jeans = await _product("Slim Jeans", 1299.0)
+    await CartService.add_item("sync_user", jeans, 5, "30")
+
+    results = await CartService.replace_cart("sync_user", [
+        {"product_id": tee, "quantity": 1, "size": "M"},
+        {"product_id": "not-a-product", "quantity": 1, "size": None},
+        {"product_id": tee, "quantity": 2, "size": "M"},
+    ])
+
+    assert [r["success"] for r in results] == [True, False, True]
+    summary = await CartService.get_cart_summary("sync_user")
+    assert [(i["name"], i["quantity"]) for i in summary["items"]] == [("Retro Tee", 3)]
@@ -0,0 +1,75 @@
+import pytest
+
+from app.services.catalog_cache import CatalogResponseCache, etag_matches, publish_change
+
+
+def test_entries_are_reused_until_catalog_changes():
+    cache = CatalogResponseCache(max_entries=8)
+    key = cache.key("/api/v1/products/", "limit=2")
+    entry = cache.put(key, [{"id": "1", "name": "Tee"}], {"X-Next-Cursor": "1"})
+
+    assert cache.get(cache.key("/api/v1/products/", "limit=2")) is entry
+    assert entry.body == b'[{"id":"1","name":"Tee"}]'
+
+    cache.on_product_saved(object())
+    assert len(cache) == 0
+    assert cache.get(cache.key("/api/v1/products/", "limit=2")) is None
+
+
+def test_payload_built_across_a_write_is_not_cached():
+    cache = CatalogResponseCache(max_entries=8)
+    key = cache.key("/api/v1/products/", "")
+    cache.on_product_deleted("1")
+    cache.put(key, [])
+    assert len(cache) == 0
+
+
+def test_lru_evicts_least_recently_used():
+    cache = CatalogResponseCache(max_entries=2)
+    a, b, c = (cache.key("/p", q) for q in "abc")
+    cache.put(a, "a")
+    cache.put(b, "b")
+    cache.get(a)
+    cache.put(c, "c")
+    assert cache.get(b) is None
+    assert cache.get(a) is not None and cache.get(c) is not None
+
+
+def test_etag_is_content_hash_and_matches_if_none_match():
+    cache = CatalogResponseCache(max_entries=2)
+    etag = cache.put(cache.key("/p", ""), [1, 2]).etag
+    assert etag == CatalogResponseCache(max_entries=2).put(("x", "y", "z"), [1, 2]).etag
+
+    assert etag_matches(etag, etag)
+    assert etag_matches(f'"other", W/{etag}', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches('"other"', etag)
+    assert not etag_matches(None, etag)
+
+
+def test_entries_expire_after_max_age():
+    cache = CatalogResponseCache(max_entries=2, max_age_seconds=0)
+    key = cache.key("/p", "")
+    cache.put(key, [1])
+    assert cache.get(key) is None and len(cache) == 0
+
+
+@pytest.mark.asyncio
+async def test_writes_from_elsewhere_drop_entries_at_next_sync(mongo_db):
+    cache = CatalogResponseCache(max_entries=8, check_seconds=0)
+    await cache.sync()
+    cache.put(cache.key("/p", ""), [1])
+
+    await cache.sync()
+    assert len(cache) == 1
+    # Another worker, or the seed script, changed the catalog
+    await publish_change()
+    await cache.sync()
+    assert len(cache) == 0 and cache.get(cache.key("/p", "")) is None
+
+    # This process's own writes are published once and not re-applied on sync
+    cache.bump()
+    await cache.drain()
+    cache.put(cache.key("/p", ""), [2])
+    await cache.sync()
+    assert len(cache) == 1
@@ -0,0 +1,46 @@
+from types import SimpleNamespace
+
+from app.services.catalog_index import CatalogIndex
+
+
+def make_product(product_id, name, price=499.0):
+    return SimpleNamespace(id=product_id, name=name, price=price, description=f"{name} description", image_url=None)
+
+
+def build_index():
+    index = CatalogIndex()
+    index.rebuild([
+        make_product("p1", "Retro Tee"),
+        make_product("p2", "Retro Tee Oversized"),
+        make_product("p3", "Slim Fit Jeans"),
+        make_product("p4", "Sneakers"),
+    ])
+    return index
+
+
+def test_find_in_text_prefers_longest_full_name():
+    index = build_index()
+    assert index.find_in_text("add the retro tee oversized in size l")["id"] == "p2"
+    assert index.find_in_text("add the retro tee please")["id"] == "p1"
+    assert index.find_in_text("add something nice") is None
+
+
+def test_match_words_needs_two_words_for_multi_word_names():
+    index = build_index()
+    assert index.match_words("i want those slim jeans")["id"] == "p3"
+    assert index.match_words("i want jeans") is None
+    assert index.match_words("i want jeans", min_multi_word_matches=1)["id"] == "p3"
+    assert index.match_words("buy sneakers")["id"] == "p4"
+
+
+def test_catalog_hook_updates_index_incrementally():
+    index = build_index()
+
+    index.on_product_saved(make_product("p4", "Canvas Sneakers", price=999.0))
+    assert index.find_in_text("canvas sneakers")["price"] == 999.0
+    assert index.find_in_text("just sneakers") is None
+
+    index.on_product_deleted("p3")
+    assert index.get("p3") is None
+    assert index.match_words("slim fit jeans") is None
+    assert len(index) == 3
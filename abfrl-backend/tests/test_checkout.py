@@ -0,0 +1,130 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+
+from app.api.v1.endpoints.checkout import CheckoutRequest, checkout
+from app.models.cart import Cart
+from app.models.inventory import StockReservation
+from app.models.order import Order
+from app.models.payment import PaymentSession
+from app.models.product import Product
+from app.services import idempotency
+from app.services.cart import CartService
+from app.services.idempotency import IdempotencyConflict
+from app.services.inventory import InventoryService
+
+
+def _request(product_id, payment_id="pay-1", quantity=1, price=499.0):
+    return CheckoutRequest(
+        user_id="u1",
+        shipping_address={"full_name": "Asha Rao", "email": "asha@example.com", "phone": "9999999999",
+                          "address_line1": "1 MG Road", "city": "Pune", "state": "Maharashtra", "zip_code": "411001"},
+        cart_items=[{"id": product_id, "name": "Retro Tee", "price": price, "quantity": quantity}],
+        subtotal=price * quantity, shipping=0.0, discount=0.0, total=price * quantity,
+        payment_id=payment_id, transaction_id=f"txn-{payment_id}",
+    )
+
+
+async def _payment(payment_id, amount, status="SUCCESS", user_id="u1"):
+    await PaymentSession(id=payment_id, user_id=user_id, amount=amount, status=status,
+                         expires_at=datetime.utcnow() + timedelta(minutes=15)).insert()
+
+
+async def _tee(stock=5):
+    product = Product(name="Retro Tee", price=499.0, category="T-Shirts", stock=stock)
+    await product.insert()
+    return str(product.id)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_retries_place_one_order(mongo_db):
+    product_id = await _tee()
+    await CartService.add_item("u1", product_id, 2)
+    await InventoryService.reserve_items("pay-1", [(product_id, 2)], "u1")
+    await _payment("pay-1", 1098.0)
+    request = _request(product_id, quantity=2)
+
+    responses = await asyncio.gather(*[checkout(request, None) for _ in range(20)])
+    assert len({response["order_id"] for response in responses}) == 1
+    assert await Order.find_all().count() == 1
+    # A retry under another key still finds the order by its payment, and takes no stock
+    assert (await checkout(request, "client-key"))["order_id"] == responses[0]["order_id"]
+    assert (await Product.get(product_id)).stock == 3
+
+
+@pytest.mark.asyncio
+async def test_order_is_priced_from_the_server_cart(mongo_db):
+    product_id = await _tee()
+    await CartService.add_item("u1", product_id, 2)
+    await InventoryService.reserve_items("pay-2", [(product_id, 2)], "u1")
+    # The cart grew after the payment's hold and was paid in full; the client claims a rupee each
+    await CartService.add_item("u1", product_id, 1)
+    await _payment("pay-2", 1497.0)
+
+    response = await checkout(_request(product_id, "pay-2", quantity=3, price=1.0), None)
+    assert (response["order"]["subtotal"], response["order"]["shipping"], response["total"]) == (1497.0, 0, 1497.0)
+    assert response["order"]["items"][0]["total"] == 1497.0
+    assert response["cart_summary"]["items"] == []
+    # The stale hold went back and the whole cart was sold
+    assert (await Product.get(product_id)).stock == 2
+    assert await StockReservation.find(StockReservation.status == "held").count() == 0
+    assert (await Cart.find_one(Cart.user_id == "u1")).items == []
+
+
+@pytest.mark.asyncio
+async def test_rejects_a_payment_for_another_total(mongo_db):
+    product_id = await _tee()
+    await CartService.add_item("u1", product_id, 1)
+    await _payment("pay-3", 1.0)
+    with pytest.raises(HTTPException) as raised:
+        await checkout(_request(product_id, "pay-3"), None)
+    assert raised.value.status_code == 409
+    assert await Order.find_all().count() == 0
+    assert (await Product.get(product_id)).stock == 5
+    assert len((await Cart.find_one(Cart.user_id == "u1")).items) == 1
+
+
+@pytest.mark.asyncio
+async def test_only_a_successful_payment_by_the_user_places_an_order(mongo_db):
+    product_id = await _tee()
+    await CartService.add_item("u1", product_id, 1)
+    await _payment("pending", 599.0, "PENDING")
+    await _payment("expired", 599.0, "EXPIRED")
+    await _payment("theirs", 599.0, user_id="u2")
+
+    for payment_id in ("missing", "pending", "expired", "theirs"):
+        with pytest.raises(HTTPException) as raised:
+            await checkout(_request(product_id, payment_id), None)
+        assert raised.value.status_code == 402, payment_id
+    assert raised.value.detail["status"] is None  # another user's payment is not disclosed
+    assert await Order.find_all().count() == 0
+    assert (await Product.get(product_id)).stock == 5
+
+    # Once the payment succeeds the retry goes through
+    await PaymentSession.get_motor_collection().update_one({"_id": "pending"}, {"$set": {"status": "SUCCESS"}})
+    assert (await checkout(_request(product_id, "pending"), None))["total"] == 599.0
+
+
+@pytest.mark.asyncio
+async def test_keys_run_once_and_reject_other_payloads(mongo_db):
+    calls = []
+
+    async def handler():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"order_id": "o1"}
+
+    results = await asyncio.gather(*[idempotency.run("test", "k1", {"a": 1}, handler) for _ in range(10)])
+    assert results == [{"order_id": "o1"}] * 10 and len(calls) == 1
+    with pytest.raises(IdempotencyConflict):
+        await idempotency.run("test", "k1", {"a": 2}, handler)
+
+    # A failed attempt leaves the key free for the retry
+    async def failing():
+        raise RuntimeError("payment gateway down")
+
+    with pytest.raises(RuntimeError):
+        await idempotency.run("test", "k2", {"a": 1}, failing)
+    assert await idempotency.run("test", "k2", {"a": 1}, handler) == {"order_id": "o1"}
@@ -0,0 +1,62 @@
+import random
+from collections import Counter
+from itertools import combinations
+from app.services.copurchase import CoPurchaseCounts, CoPurchaseIndex
+
+
+def _baskets(n, seed=3):
+    rng = random.Random(seed)
+    products = [f"p{i}" for i in range(40)]
+    return [rng.sample(products, rng.randint(1, 5)) for _ in range(n)]
+
+
+def _expected_top(baskets, top_n):
+    pairs = Counter()
+    for basket in baskets:
+        for a, b in combinations(sorted(set(basket)), 2):
+            pairs[a, b] += 1
+            pairs[b, a] += 1
+    top = {}
+    for (a, b), count in pairs.items():
+        top.setdefault(a, []).append((b, count))
+    return {a: sorted(n, key=lambda x: -x[1])[:top_n] for a, n in top.items()}
+
+
+def test_counts_match_brute_force_and_are_incremental(tmp_path):
+    baskets = _baskets(300)
+    path = str(tmp_path / "copurchase.npz")
+
+    # First half, persisted; second half on top of the reloaded state
+    state = CoPurchaseCounts()
+    state.add_orders(baskets[:150])
+    state.finish(top_n=5)
+    state.save(path)
+    state = CoPurchaseCounts.load(path)
+    state.add_orders(baskets[150:220])
+    state.merge_pending()
+    state.add_orders(baskets[220:])
+    state.finish(top_n=5)
+
+    expected = _expected_top(baskets, 5)
+    neighbours = state.neighbours()
+    assert set(neighbours) == set(expected)
+    for product_id, top in neighbours.items():
+        # Same counts in the same order (ties may pick different products)
+        assert [count for _, count in top] == [count for _, count in expected[product_id]]
+    assert state.orders_processed == 300
+    ordered = Counter(product_id for basket in baskets for product_id in set(basket))
+    assert state.popularity() == dict(ordered)
+
+
+def test_index_serves_saved_neighbours(tmp_path):
+    path = str(tmp_path / "copurchase.npz")
+    state = CoPurchaseCounts()
+    state.add_orders([["tee", "jeans"], ["tee", "jeans", "cap"], ["tee", "socks"]])
+    state.finish(top_n=2)
+    state.save(path)
+
+    index = CoPurchaseIndex(path, reload_seconds=0)
+    assert index.get("tee") == [("jeans", 2), ("cap", 1)] or index.get("tee") == [("jeans", 2), ("socks", 1)]
+    assert index.get("jeans", limit=1) == [("tee", 2)]
+    assert index.get("unknown") == []
+    assert index.popularity() == {"tee": 3, "jeans": 2, "cap": 1, "socks": 1}
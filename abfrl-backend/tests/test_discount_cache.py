@@ -0,0 +1,70 @@
+import asyncio
+import time
+import pytest
+from types import SimpleNamespace
+from app.services.discount_cache import DiscountCodeCache
+
+
+def _code(code, percent=10.0, active=True):
+    return SimpleNamespace(code=code, discount_percent=percent, min_purchase=0, active=active)
+
+
+def _cache(codes, ttl=60):
+    cache = DiscountCodeCache(ttl_seconds=ttl)
+    loads = []
+
+    async def fake_load():
+        loads.append(1)
+        cache._codes = {c.code.upper(): c for c in codes if c.active}
+        cache._loaded_at = time.monotonic()
+        cache.refreshes += 1
+
+    cache._load = fake_load
+    return cache, loads
+
+
+@pytest.mark.asyncio
+async def test_lookups_after_first_load_are_hits():
+    cache, loads = _cache([_code("SAVE10"), _code("OLD", active=False)])
+
+    assert (await cache.get("save10")).discount_percent == 10.0
+    assert await cache.get("OLD") is None
+    assert await cache.get("NOPE") is None
+
+    assert len(loads) == 1
+    stats = cache.stats()
+    assert stats["misses"] == 1 and stats["hits"] == 2 and stats["size"] == 1
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_share_one_load():
+    cache, loads = _cache([_code("SAVE10")])
+    await asyncio.gather(*[cache.get("SAVE10") for _ in range(20)])
+    assert len(loads) == 1
+
+
+@pytest.mark.asyncio
+async def test_expired_snapshot_reloads():
+    cache, loads = _cache([_code("SAVE10")], ttl=0)
+    await cache.get("SAVE10")
+    await cache.get("SAVE10")
+    assert len(loads) == 2
+
+
+@pytest.mark.asyncio
+async def test_writes_update_snapshot_in_place():
+    cache, loads = _cache([_code("SAVE10")])
+    await cache.get("SAVE10")
+
+    cache.on_code_saved(_code("NEW20", 20.0))
+    cache.on_code_saved(_code("SAVE10", active=False))
+    assert (await cache.get("new20")).discount_percent == 20.0
+    assert await cache.get("SAVE10") is None
+
+    cache.on_code_deleted("new20")
+    assert await cache.get("NEW20") is None
+    assert len(loads) == 1
+
+    cache.invalidate()
+    assert (await cache.get("SAVE10")) is not None
+    assert len(loads) == 2
@@ -0,0 +1,62 @@
+import time
+import numpy as np
+from types import SimpleNamespace
+from app.services import embedding_store
+from app.services.vector_store import ProductVectorStore, VectorIndex
+
+DIM = 64
+
+CATALOG = [
+    {"_id": "1", "name": "Slim Fit Blue Jeans", "category": "jeans", "description": "Classic denim"},
+    {"_id": "2", "name": "Oxford Cotton Shirt", "category": "shirts", "description": "Formal white shirt"},
+    {"_id": "3", "name": "Running Sneakers", "category": "footwear", "description": "Lightweight running shoes"},
+]
+
+
+def test_pipeline_reembeds_only_changed_products(tmp_path):
+    directory = str(tmp_path)
+    first = embedding_store.embed_catalog(directory, time.time(), CATALOG, DIM)
+    assert first == {"products": 3, "embedded": 3, "removed": 0, "version": 1}
+
+    # Nothing changed: no new version
+    assert embedding_store.embed_catalog(directory, time.time(), CATALOG, DIM)["version"] == 1
+
+    changed = [dict(CATALOG[0], name="Ripped Black Jeans"), CATALOG[1]]
+    stats = embedding_store.embed_catalog(directory, time.time(), changed, DIM)
+    assert stats == {"products": 2, "embedded": 1, "removed": 1, "version": 2}
+
+    stored = embedding_store.load(directory, DIM)
+    assert stored.version == 2 and stored.ids == ["1", "2"]
+    assert isinstance(stored.vectors, np.memmap)
+    assert embedding_store.load(directory, DIM * 2) is None
+
+
+def test_old_versions_are_pruned(tmp_path):
+    directory = str(tmp_path)
+    for i in range(4):
+        embedding_store.embed_catalog(directory, time.time(), [dict(CATALOG[0], name=f"Jeans {i}")], DIM)
+    files = sorted(p.name for p in tmp_path.iterdir() if p.name.startswith("vectors-"))
+    assert files == ["vectors-000003.npy", "vectors-000004.npy"]
+
+
+def test_swap_keeps_local_writes_newer_than_the_snapshot(tmp_path):
+    directory = str(tmp_path)
+    store = ProductVectorStore()
+    store.embedder.dim = DIM
+    store._new_index = lambda: VectorIndex(DIM, 10**6, 4)
+
+    embedding_store.embed_catalog(directory, time.time(), CATALOG, DIM)
+    store.rebuild(CATALOG, embedding_store.load(directory, DIM))
+    assert store.version == 1
+
+    snapshot_at = time.time()
+    store.on_product_saved(SimpleNamespace(id="4", name="Canvas Tote Bag", category="bags", description="", metadata_info={}))
+    store.on_product_deleted("3")
+
+    # A pipeline run whose catalog read started before those writes
+    embedding_store.embed_catalog(directory, snapshot_at - 1, CATALOG[:2] + [dict(CATALOG[2], name="Trail Sneakers")], DIM)
+    store.swap_to(embedding_store.load(directory, DIM))
+
+    assert store.version == 2
+    assert store.search("tote bag", 1)[0][0] == "4"
+    assert "3" not in [product_id for product_id, _ in store.search("sneakers", 5)]
@@ -0,0 +1,78 @@
+import random
+from types import SimpleNamespace
+
+from app.services.facets import PRICE_BUCKETS, FacetIndex, price_bucket
+
+
+def make_product(product_id, category, price, sizes=(), colors=()):
+    return SimpleNamespace(id=product_id, category=category, price=price, sizes=list(sizes), colors=list(colors))
+
+
+def test_price_buckets():
+    assert price_bucket(0) == "0-500"
+    assert price_bucket(499.99) == "0-500"
+    assert price_bucket(500) == "500-1000"
+    assert price_bucket(25000) == PRICE_BUCKETS[-1] == "10000+"
+
+
+def test_filtered_counts_are_disjunctive_per_facet():
+    index = FacetIndex()
+    index.rebuild([
+        make_product("p1", "jeans", 1999, ["30", "32"], ["blue"]),
+        make_product("p2", "jeans", 2499, ["32"], ["black"]),
+        make_product("p3", "shirts", 999, ["M", "L"], ["white", "blue"]),
+        make_product("p4", "shirts", 799, ["S"], ["blue"]),
+    ])
+    result = index.counts({"category": ["jeans"], "color": ["blue"]})
+    facets = {facet: {item["value"]: item["count"] for item in items} for facet, items in result["facets"].items()}
+    assert result["total"] == 1
+    # Categories counted under the color filter only, colors under the category filter only
+    assert facets["category"] == {"jeans": 1, "shirts": 2}
+    assert facets["color"] == {"blue": 1, "black": 1}
+    assert facets["size"] == {"30": 1, "32": 1}
+    assert [item["value"] for item in index.counts({"size": ["XL"]})["facets"]["size"]][:3] == ["S", "M", "L"]
+
+
+def _brute_force(products, filters):
+    def matches(product, skip=None):
+        values = {"category": [product.category], "size": product.sizes, "color": product.colors, "price": [price_bucket(product.price)]}
+        return all(set(values[facet]) & set(selected) for facet, selected in filters.items() if selected and facet != skip)
+
+    facets = {}
+    for facet in ("category", "size", "color", "price"):
+        counts = {}
+        for product in products:
+            if matches(product, skip=facet):
+                values = {"category": [product.category], "size": product.sizes, "color": product.colors, "price": [price_bucket(product.price)]}[facet]
+                for value in set(values):
+                    counts[value] = counts.get(value, 0) + 1
+        for value in filters.get(facet) or []:
+            counts.setdefault(value, 0)
+        facets[facet] = counts
+    return sum(matches(product) for product in products), facets
+
+
+def test_counts_match_brute_force_after_writes():
+    rng = random.Random(2)
+
+    def random_product(product_id):
+        return make_product(
+            product_id, rng.choice(["jeans", "shirts", "kurtas"]), rng.choice([299, 799, 1499, 4999, 12000]),
+            rng.sample(["S", "M", "L", "30", "32"], rng.randint(0, 3)), rng.sample(["blue", "black", "red"], rng.randint(0, 2)),
+        )
+
+    products = {f"p{i}": random_product(f"p{i}") for i in range(200)}
+    index = FacetIndex()
+    index.rebuild(products.values())
+    for i in range(0, 260, 3):
+        products[f"p{i}"] = random_product(f"p{i}")
+        index.on_product_saved(products[f"p{i}"])
+    for i in range(1, 200, 5):
+        del products[f"p{i}"]
+        index.on_product_deleted(f"p{i}")
+
+    for filters in [{}, {"category": ["jeans"]}, {"size": ["M", "30"], "color": ["red"]}, {"price": ["0-500", "10000+"], "category": ["kurtas", "shirts"]}]:
+        result = index.counts(filters)
+        total, expected = _brute_force(list(products.values()), filters)
+        assert result["total"] == total
+        assert {facet: {item["value"]: item["count"] for item in items} for facet, items in result["facets"].items()} == expected
@@ -0,0 +1,72 @@
+"""
+Golden routing results for the master agent's keyword intent router.
+These pin the behaviour of the original if/elif chain in process_message.
+"""
+
+import pytest
+
+from app.agents import intents
+
+GOLDEN = [
+    ('clear history please', 'clear_history'),
+    ("let's start over", 'clear_history'),
+    ('add to cart the Retro Tee', 'add_to_cart'),
+    ("I'll take the blue one", 'add_to_cart'),
+    ('i want that in size L', 'add_to_cart'),
+    ('buy this now', 'add_to_cart'),
+    ('remove this from my cart', 'remove_from_cart'),
+    ('take out the jeans', 'remove_from_cart'),
+    ("what's in my cart?", 'view_cart'),
+    ('show cart', 'view_cart'),
+    ('do i have anything in cart', 'view_cart'),
+    ('apply discount code SAVE10', 'apply_discount'),
+    ('use coupon WELCOME5', 'apply_discount'),
+    ('proceed to checkout', 'checkout'),
+    ('checkout', 'checkout'),
+    ('show my orders', 'view_orders'),
+    ('what did i order last week', 'view_orders'),
+    ('any orders yet?', 'view_orders'),
+    ('track order 64f1c2a9b3e4d5f6a7b8c9d0', 'track_order'),
+    ('where is my order', 'view_orders'),
+    ('delivery status please', 'track_order'),
+    ('show me jeans', 'browse'),
+    ('recommend something for a wedding', 'browse'),
+    ("I'm looking for a shirt", 'browse'),
+    ('browse products', 'browse'),
+    ('tell me more about the Retro Tee', 'product_details'),
+    ('details of aerostride', 'product_details'),
+    ('I want to purchase shoes', 'purchase'),
+    ('is this available in size M', 'availability'),
+    ('do you have it in stock at phoenix mall', 'availability'),
+    ('how do I pay?', 'payment'),
+    ('payment options', 'payment'),
+    ('hello', 'general'),
+    ('thanks a lot', 'general'),
+    ("what's the weather like", 'general'),
+    ('show me my cart', 'view_cart'),
+    ('add it and checkout', 'add_to_cart'),
+    ('showcase', 'browse'),
+    ('i need that shirt', 'add_to_cart'),
+    ('order status of my last purchase', 'track_order'),
+    ('can you check order history', 'view_orders'),
+    ('tshirt under 500', 'browse'),
+    ('about your return policy', 'product_details'),
+    ('buy', 'purchase'),
+]
+
+
+@pytest.mark.parametrize("message,expected", GOLDEN)
+def test_route_matches_golden(message, expected):
+    assert intents.route(message.lower()) == expected
+
+
+def test_match_intents_returns_all_overlapping_matches_by_priority():
+    matches = intents.match_intents("show me what's in my cart and how to pay")
+    assert [m.intent for m in matches] == [intents.VIEW_CART, intents.BROWSE, intents.PAYMENT]
+    assert [m.priority for m in matches] == sorted(m.priority for m in matches)
+
+
+def test_match_intents_reports_keywords_that_are_prefixes_of_longer_ones():
+    # "show" (browse) is a prefix of "show my orders" (view_orders)
+    intents_found = {m.intent for m in intents.match_intents("show my orders")}
+    assert {intents.VIEW_ORDERS, intents.BROWSE} <= intents_found
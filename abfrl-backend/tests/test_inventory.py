@@ -0,0 +1,86 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+
+from app.models.inventory import StockReservation
+from app.models.product import Product
+from app.services.inventory import HOLDS_FIELD, InsufficientStock, InventoryService
+
+
+async def _product(stock, name="Retro Tee"):
+    product = Product(name=name, price=499.0, category="T-Shirts", stock=stock)
+    await product.insert()
+    return str(product.id)
+
+
+async def _stock(product_id):
+    doc = await Product.get_motor_collection().find_one({"_id": ObjectId(product_id)})
+    return doc["stock"], doc.get(HOLDS_FIELD, [])
+
+
+@pytest.mark.asyncio
+async def test_parallel_reservations_never_oversell(mongo_db):
+    product_id = await _product(5)
+    results = await asyncio.gather(*[InventoryService.reserve(f"pay-{i}", product_id, 1) for i in range(40)])
+    assert sum(results) == 5
+    assert (await _stock(product_id))[0] == 0
+    # Failed attempts leave no reservation behind
+    assert await StockReservation.find_all().count() == 5
+
+
+@pytest.mark.asyncio
+async def test_bulk_reserve_is_all_or_nothing(mongo_db):
+    tee = await _product(5)
+    jeans = await _product(1, "Slim Jeans")
+    await InventoryService.reserve_items("pay-1", [(tee, 2), (jeans, 1), (tee, 1)], "u1")
+    assert (await _stock(tee))[0] == 2 and (await _stock(jeans))[0] == 0
+
+    with pytest.raises(InsufficientStock) as short:
+        await InventoryService.reserve_items("pay-2", [(tee, 1), (jeans, 1)], "u1")
+    assert short.value.product_ids == [jeans]
+    # The tee taken before the jeans came up short was given back
+    assert await _stock(tee) == (2, ["pay-1"])
+
+
+@pytest.mark.asyncio
+async def test_commit_and_release_are_exclusive_and_once(mongo_db):
+    product_id = await _product(3)
+    await InventoryService.reserve_items("pay-1", [(product_id, 2)])
+    assert await InventoryService.commit("pay-1")
+    assert not await InventoryService.release("pay-1")
+    assert await _stock(product_id) == (1, [])
+
+    await InventoryService.reserve_items("pay-2", [(product_id, 1)])
+    results = await asyncio.gather(*[InventoryService.release("pay-2") for _ in range(10)])
+    assert sum(results) == 1
+    assert not await InventoryService.commit("pay-2")
+    assert await _stock(product_id) == (1, [])
+
+
+@pytest.mark.asyncio
+async def test_release_expired_gives_stock_back(mongo_db):
+    product_id = await _product(4)
+    await InventoryService.reserve_items("pay-1", [(product_id, 3)])
+    assert await InventoryService.release_expired() == 0
+    assert await InventoryService.release_expired(datetime.utcnow() + timedelta(days=1)) == 1
+    assert await _stock(product_id) == (4, [])
+    reservation = await StockReservation.find_one(StockReservation.reservation_id == "pay-1")
+    assert reservation.status == "released" and reservation.closed_at is not None
+
+
+@pytest.mark.asyncio
+async def test_only_closed_reservations_expire(mongo_db):
+    product_id = await _product(4)
+    await InventoryService.reserve_items("pay-1", [(product_id, 1)])
+    await InventoryService.reserve_items("pay-2", [(product_id, 1)])
+    assert await InventoryService.commit("pay-1")
+
+    held = await StockReservation.find_one(StockReservation.reservation_id == "pay-2")
+    committed = await StockReservation.find_one(StockReservation.reservation_id == "pay-1")
+    # The TTL runs on closed_at, which a hold only gets when it is committed or released
+    assert held.closed_at is None and committed.closed_at is not None
+    ttl = [index for index in (await StockReservation.get_motor_collection().index_information()).values()
+           if "expireAfterSeconds" in index]
+    assert [list(index["key"]) for index in ttl] == [[("closed_at", 1)]]
@@ -0,0 +1,66 @@
+import asyncio
+import pytest
+from app.agents.llm_client import LLMClient
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class SlowChat:
+    def __init__(self, gate):
+        self.gate = gate
+
+    async def send_message_async(self, prompt):
+        await self.gate.wait()
+        return FakeResponse("ok")
+
+
+class FakeModel:
+    def __init__(self, gate):
+        self.gate = gate
+
+    def start_chat(self, history):
+        return SlowChat(self.gate)
+
+
+@pytest.mark.asyncio
+async def test_agenerate_response_sheds_load_when_queue_full():
+    llm = LLMClient()
+    gate = asyncio.Event()
+    llm.model = FakeModel(gate)
+    llm._semaphore = asyncio.Semaphore(1)
+    llm._max_queue_depth = 1
+
+    in_flight = asyncio.create_task(llm.agenerate_response("hi"))
+    queued = asyncio.create_task(llm.agenerate_response("hi"))
+    await asyncio.sleep(0)
+
+    # One call holds the slot, one waits; the next is rejected immediately
+    assert await llm.agenerate_response("hi") == LLMClient.OVERLOADED_MESSAGE
+
+    gate.set()
+    assert await in_flight == "ok"
+    assert await queued == "ok"
+
+
+@pytest.mark.asyncio
+async def test_agenerate_response_shares_breaker_state():
+    llm = LLMClient()
+
+    class FailingChat:
+        async def send_message_async(self, prompt):
+            raise RuntimeError("boom")
+
+    class FailingModel:
+        def start_chat(self, history):
+            return FailingChat()
+
+    llm.model = FailingModel()
+    await llm.agenerate_response("hi")
+
+    # The breaker is open now, so the model is not called again
+    llm.model = None
+    reply = await llm.agenerate_response("hi")
+    assert "temporarily unavailable" in reply
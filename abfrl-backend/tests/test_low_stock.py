@@ -0,0 +1,86 @@
+import pytest
+from bson import ObjectId
+
+from app.models.product import Inventory, Product
+from app.models.store import Store
+from app.services import catalog_events, low_stock, store_inventory
+from app.services.inventory import InventoryService
+from app.services.low_stock import LOW_STOCK_FIELD, LowStockAlerts, low_stock_alerts, low_stock_detector
+
+
+@pytest.mark.asyncio
+async def test_alerts_fan_out_per_shopkeeper():
+    alerts = LowStockAlerts(max_queued=2)
+    everything, mine = alerts.subscribe(), alerts.subscribe("shop-1")
+    for i, owner in enumerate(["shop-1", "shop-2", "shop-1"]):
+        alerts.publish({"product_id": str(i), "shopkeeper_id": owner})
+    # The admin queue kept the newest two; the shopkeeper only sees their products
+    assert [everything.get_nowait()["product_id"] for _ in range(everything.qsize())] == ["1", "2"]
+    assert [mine.get_nowait()["product_id"] for _ in range(mine.qsize())] == ["0", "2"]
+    alerts.unsubscribe(everything)
+    alerts.unsubscribe(mine)
+    assert len(alerts) == 0
+
+
+@pytest.mark.asyncio
+async def test_stock_decrements_flag_and_alert(mongo_db):
+    product = Product(name="Retro Tee", price=499.0, category="T-Shirts", stock=12, reorder_threshold=10, shopkeeper_id="shop-1")
+    await product.insert()
+    await low_stock.recompute()
+    assert await low_stock.count_low_stock() == 0
+
+    queue = low_stock_alerts.subscribe("shop-1")
+    low_stock_detector.start()
+    try:
+        assert await InventoryService.update_stock(str(product.id), 1)
+        await low_stock_detector.drain()
+        assert queue.empty()
+
+        assert await InventoryService.update_stock(str(product.id), 2)
+        await low_stock_detector.drain()
+        alert = queue.get_nowait()
+        assert (alert["kind"], alert["product_id"], alert["stock"], alert["threshold"]) == ("product", str(product.id), 9, 10)
+        assert await low_stock.count_low_stock() == await low_stock.count_low_stock("shop-1") == 1
+
+        # Still low: no second alert; restocked: the flag clears
+        assert await InventoryService.update_stock(str(product.id), 1)
+        await Product.get_motor_collection().update_one({"_id": product.id}, {"$inc": {"stock": 20}})
+        low_stock_detector.stock_changed([product.id])
+        await low_stock_detector.drain()
+        assert queue.empty()
+        assert (await Product.get_motor_collection().find_one({"_id": ObjectId(str(product.id))}))[LOW_STOCK_FIELD] is False
+    finally:
+        await low_stock_detector.stop()
+        low_stock_alerts.unsubscribe(queue)
+
+
+@pytest.mark.asyncio
+async def test_store_entries_use_store_thresholds(mongo_db):
+    await Store(name="Phoenix Mall", reorder_threshold=5).insert()
+    await low_stock_detector.load_store_thresholds()
+    product = Product(name="Slim Jeans", price=1999.0, category="Jeans", inventory=[
+        Inventory(store_location="Phoenix Mall", size="32", quantity=4),
+        Inventory(store_location="Inorbit", size="32", quantity=4),
+    ])
+    await product.insert()
+    await store_inventory.rebuild()
+    assert [(entry["store_location"], entry["size"]) for entry in await low_stock.low_stock_entries()] == [("Phoenix Mall", "32")]
+
+    queue = low_stock_alerts.subscribe()
+    store_inventory.store_inventory_sync.start()
+    try:
+        product.inventory = [
+            Inventory(store_location="Phoenix Mall", size="32", quantity=3),
+            Inventory(store_location="Inorbit", size="32", quantity=1),
+        ]
+        await product.save()
+        catalog_events.notify_product_saved(product)
+        await store_inventory.store_inventory_sync.drain()
+        # Phoenix Mall was already low; only Inorbit crossed its (default) threshold
+        alert = queue.get_nowait()
+        assert (alert["kind"], alert["store_location"], alert["quantity"]) == ("store", "Inorbit", 1)
+        assert queue.empty()
+        assert len(await low_stock.low_stock_entries()) == 2
+    finally:
+        await store_inventory.store_inventory_sync.stop()
+        low_stock_alerts.unsubscribe(queue)
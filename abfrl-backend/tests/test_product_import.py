@@ -0,0 +1,64 @@
+import json
+
+import pytest
+
+from app.models.product import Product
+from app.services import product_import
+from app.services.product_import import ImportFormatError, csv_rows, import_products, ndjson_rows
+
+
+async def chunked(data: bytes, size: int):
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+
+async def collect(rows):
+    return [row async for row in rows]
+
+
+@pytest.mark.asyncio
+async def test_ndjson_rows_survive_any_chunking():
+    data = '{"name": "Café Tee", "price": 499}\n\n[1, 2]\n{"name": \n{"name": "Kurta", "price": 999}'.encode()
+    expected = await collect(ndjson_rows(chunked(data, len(data))))
+    for size in (1, 2, 7):
+        assert await collect(ndjson_rows(chunked(data, size))) == expected
+    assert [(row_no, row, error is not None) for row_no, row, error in expected] == [
+        (1, {"name": "Café Tee", "price": 499}, False),
+        (3, None, True),
+        (4, None, True),
+        (5, {"name": "Kurta", "price": 999}, False),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_csv_rows_handle_quoted_newlines_and_bad_records():
+    data = (
+        "name,price,description,colors\r\n"
+        'Linen Shirt,1299,"Breathable, light",white|blue\r\n'
+        'Silk Saree,4999,"Two\nlines",\r\n'
+        "Broken,1\n"
+    ).encode()
+    rows = await collect(csv_rows(chunked(data, 5)))
+    assert rows[0] == (2, {"name": "Linen Shirt", "price": "1299", "description": "Breathable, light", "colors": "white|blue"}, None)
+    assert rows[1] == (3, {"name": "Silk Saree", "price": "4999", "description": "Two\nlines"}, None)
+    assert rows[2][0] == 5 and rows[2][2] == "Expected 4 fields, got 2"
+
+    with pytest.raises(ImportFormatError):
+        await collect(csv_rows(chunked(b'name,price\n"Unclosed,1\n', 4)))
+
+
+@pytest.mark.asyncio
+async def test_import_inserts_valid_rows_in_batches_and_reports_the_rest(mongo_db, monkeypatch):
+    monkeypatch.setattr(product_import, "IMPORT_BATCH_SIZE", 3)
+    lines = [json.dumps({"name": f"Tee {i}", "price": 100 + i, "colors": ["black"]}) for i in range(7)]
+    lines.insert(2, json.dumps({"name": "", "price": -1}))
+    lines.insert(5, "not json")
+    data = "\n".join(lines).encode()
+
+    summary = await import_products(chunked(data, 16), "ndjson", {"shopkeeper_id": "shop-1"})
+
+    assert summary["received"] == 9 and summary["inserted"] == 7 and summary["failed"] == 2
+    assert [error["row"] for error in summary["errors"]] == [3, 6]
+    assert len(summary["errors"][0]["errors"]) == 2
+    products = await Product.find(Product.shopkeeper_id == "shop-1").to_list()
+    assert len(products) == 7 and all(product.colors == ["black"] for product in products)
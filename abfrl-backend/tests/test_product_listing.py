@@ -0,0 +1,47 @@
+import pytest
+from types import SimpleNamespace
+from httpx import AsyncClient
+from app.main import app
+from app.models.product import Inventory, Product
+from app.services.catalog_cache import catalog_cache
+
+
+def test_listing_fields_are_derived_on_write():
+    # Documents cannot be built without a database, so run the hook on a stand-in
+    product = SimpleNamespace(
+        inventory=[Inventory(store_location="Mumbai", size="M"), Inventory(store_location="Pune", size="L"),
+                   Inventory(store_location="Pune", size="M")],
+        metadata_info={"colors": ["black", "white"]},
+    )
+    Product.denormalize_listing_fields(product)
+    assert product.sizes == ["L", "M"]
+    assert product.colors == ["black", "white"]
+
+
+@pytest.mark.asyncio
+async def test_keyset_pages_cover_filtered_catalog(mongo_db):
+    catalog_cache.bump()  # Responses cached by earlier tests belong to another database
+    for i in range(25):
+        await Product(
+            name=f"Tee {i}", price=100.0 * i, category="tops" if i % 2 else "jeans",
+            inventory=[Inventory(store_location="Mumbai", size="M" if i % 3 else "XL")],
+        ).insert()
+
+    seen = []
+    cursor = None
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        while True:
+            params = {"limit": 4, "category": "tops", "min_price": 300, "size": "M", "fields": "name,price"}
+            if cursor:
+                params["cursor"] = cursor
+            response = await client.get("/api/v1/products/", params=params)
+            assert response.status_code == 200
+            page = response.json()
+            assert all(set(item) == {"id", "name", "price"} for item in page)
+            seen.extend(item["name"] for item in page)
+            cursor = response.headers.get("X-Next-Cursor")
+            if not cursor:
+                break
+
+    expected = [f"Tee {i}" for i in range(25) if i % 2 and i >= 3 and i % 3]
+    assert seen == expected
@@ -0,0 +1,119 @@
+import random
+from types import SimpleNamespace
+
+from app.services.catalog_index import tokenize
+from app.services import search_index
+from app.services.search_index import FIELD_WEIGHTS, SearchIndex, _words
+
+
+def make_product(product_id, name, category, description=""):
+    return SimpleNamespace(id=product_id, name=name, category=category, description=description)
+
+
+def build_index():
+    index = SearchIndex()
+    index.rebuild([
+        make_product("p1", "Slim Fit Blue Jeans", "jeans", "Stretch denim jeans"),
+        make_product("p2", "Graphic Print T-Shirt", "tshirts", "Casual cotton tee"),
+        make_product("p3", "Oxford Cotton Shirt", "shirts", "Formal cotton shirt"),
+        make_product("p4", "Leather Biker Jacket", "jackets", "Black leather jacket"),
+        make_product("p5", "Chelsea Boots", "footwear", "Leather boots"),
+    ])
+    return index
+
+
+def test_typos_find_the_right_products():
+    index = build_index()
+    assert index.search("jens")[0][0] == "p1"
+    assert index.search("tshrit")[0][0] == "p2"
+    assert index.search("lether jaket")[0][0] == "p4"
+    assert index.search("oxfrd")[0][0] == "p3"
+    assert index.search("xyzzy") == []
+
+
+def test_name_matches_outrank_description_matches():
+    index = build_index()
+    ranked = [product_id for product_id, _ in index.search("leather")]
+    assert ranked == ["p4", "p5"]
+
+
+def test_catalog_hook_updates_and_deletes():
+    index = build_index()
+    index.on_product_saved(make_product("p5", "Suede Chelsea Boots", "footwear"))
+    index.on_product_saved(make_product("p6", "Silk Kurta", "ethnic"))
+    index.on_product_deleted("p1")
+    assert [product_id for product_id, _ in index.search("leather")] == ["p4"]
+    assert index.search("kurta")[0][0] == "p6"
+    assert index.search("jeans") == []
+    assert len(index) == 5
+
+
+def _exhaustive(index, query, products):
+    """
+    Score every product directly, without the early stop.
+    """
+    query_words = list(dict.fromkeys(tokenize(query)))
+    scores = {}
+    for product in products:
+        weights = {}
+        for field, weight in FIELD_WEIGHTS:
+            for word in _words(getattr(product, field)):
+                weights[word] = max(weights.get(word, 0.0), weight)
+        score = 0.0
+        for query_word in query_words:
+            score += max(
+                [similarity * weights[index._words[word_id]] for word_id, similarity in index.similar_words(query_word)
+                 if index._words[word_id] in weights] or [0.0]
+            )
+        if score:
+            scores[product.id] = round(score, 3)
+    return sorted(scores.values(), reverse=True)
+
+
+def test_early_stop_matches_exhaustive_scoring():
+    rng = random.Random(5)
+    vocabulary = ["slim", "linen", "cotton", "denim", "silk", "floral", "black", "jeans", "shirt", "t-shirt",
+                  "kurta", "dress", "jacket", "boots", "skirt", "shorts"]
+    products = [
+        make_product(f"p{i}", " ".join(rng.sample(vocabulary, 3)), rng.choice(vocabulary[7:]), " ".join(rng.sample(vocabulary, 4)))
+        for i in range(2000)
+    ]
+    index = SearchIndex()
+    index.rebuild(products)
+    # Tombstones must not leak into results either
+    for product in products[:100]:
+        index.on_product_deleted(product.id)
+    live = products[100:]
+
+    for query in ["jens", "linen shirt", "flroal dres", "black silk tshirt", "skirt", "cotton kurta jacket"]:
+        for limit in (1, 5, 20):
+            got = [score for _, score in index.search(query, limit)]
+            assert got == _exhaustive(index, query, live)[:limit], (query, limit)
+
+
+def test_walk_stops_inside_segments_with_final_scores(monkeypatch):
+    # Small chunks, so the early stop falls inside segments and the top scores must be completed
+    monkeypatch.setattr(search_index, "_CHUNK_ROWS", 16)
+    stops = []
+    final_candidates = SearchIndex._final_candidates
+
+    def recording(*args):
+        final = final_candidates(*args)
+        stops.append(final is not None and len(args[-1]) > 0)
+        return final
+
+    monkeypatch.setattr(SearchIndex, "_final_candidates", staticmethod(recording))
+    rng = random.Random(11)
+    vocabulary = ["linen", "cotton", "leather", "floral", "black", "jeans", "shirt", "jacket", "dress", "boots"]
+    products = [
+        make_product(f"p{i}", " ".join(rng.sample(vocabulary, 3)), rng.choice(vocabulary[5:]), " ".join(rng.sample(vocabulary, 3)))
+        for i in range(3000)
+    ]
+    index = SearchIndex()
+    index.rebuild(products)
+
+    for query in ["jens", "linen shirt", "lether jaket", "flroal dres black"]:
+        stops.clear()
+        got = [score for _, score in index.search(query, 10)]
+        assert got == _exhaustive(index, query, products)[:10], query
+        assert any(stops), query
@@ -0,0 +1,45 @@
+from seed_mongo import SyntheticCatalog, chat_sessions, orders, synthetic_id, users
+
+
+def test_synthetic_data_is_deterministic():
+    first = SyntheticCatalog(7, 2500, 6)
+    second = SyntheticCatalog(7, 2500, 6)
+    assert list(first.products()) == list(second.products())
+    assert list(orders(first, 300, 1200)) == list(orders(second, 300, 1200))
+    assert list(SyntheticCatalog(8, 2500, 6).products()) != list(first.products())
+    # Ids depend on kind, seed and index only
+    assert synthetic_id("product", 7, 5) == list(first.products())[5]["_id"]
+    assert synthetic_id("product", 7, 5) != synthetic_id("order", 7, 5) != synthetic_id("product", 8, 5)
+
+
+def test_products_carry_listing_fields():
+    catalog = SyntheticCatalog(1, 1500, 4)
+    products = list(catalog.products())
+    assert len(products) == 1500
+    for product in products[:200]:
+        assert product["sizes"] == sorted({entry["size"] for entry in product["inventory"]})
+        assert product["stock"] == sum(entry["quantity"] for entry in product["inventory"])
+        assert {entry["store_location"] for entry in product["inventory"]} <= set(catalog.stores)
+        assert product["colors"] == product["metadata_info"]["colors"]
+
+
+def test_orders_and_sessions_reference_generated_entities():
+    catalog = SyntheticCatalog(3, 800, 4)
+    products = {str(product["_id"]): product for product in catalog.products()}
+    user_docs = list(users(3, 150))
+    uids = {user["firebase_uid"] for user in user_docs}
+    assert len(uids) == len({user["email"] for user in user_docs}) == len({user["phone_number"] for user in user_docs}) == 150
+
+    order_docs = list(orders(catalog, 150, 2000))
+    assert [order["created_at"] for order in order_docs] == sorted(order["created_at"] for order in order_docs)
+    for order in order_docs:
+        assert order["user_id"] in uids
+        for item in order["items"]:
+            product = products[item["product_id"]]
+            assert (item["product_name"], item["price"]) == (product["name"], product["price"])
+            assert item["size"] in catalog.sizes(int(item["product_id"][-8:], 16))
+        assert order["subtotal"] == round(sum(item["price"] * item["quantity"] for item in order["items"]), 2)
+
+    sessions = list(chat_sessions(catalog, 150, 300))
+    assert len({session["session_id"] for session in sessions}) == 300
+    assert all(session["user_id"] in uids and session["messages"] for session in sessions)
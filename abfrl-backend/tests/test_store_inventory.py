@@ -0,0 +1,82 @@
+import pytest
+
+from app.agents.master import asked_size
+from app.models.inventory import PRODUCT_AVAILABILITY_INDEX, StoreInventory
+from app.models.product import Inventory, Product
+from app.services import catalog_events, store_inventory
+
+
+@pytest.mark.parametrize("message, size", [
+    ("is the oxford shirt available in size m", "M"),
+    ("do you have size: 32 at phoenix mall", "32"),
+    ("the size is l, is it in stock", "L"),
+    ("any medium left", "M"),
+    ("what sizes do you have for the oxford shirt", None),
+    ("what size do you have in the oxford shirt", None),
+    ("it's for my sister, is it in stock", None),
+])
+def test_asked_size(message, size):
+    assert asked_size(message) == size
+
+
+async def _jeans():
+    product = Product(name="Slim Jeans", price=1999.0, category="Jeans", inventory=[
+        Inventory(store_location="Phoenix Mall", size="32", quantity=3),
+        Inventory(store_location="Phoenix Mall", size="34", quantity=0),
+        Inventory(store_location="Inorbit", size="32", quantity=1),
+    ])
+    await product.insert()
+    return product
+
+
+@pytest.mark.asyncio
+async def test_rebuild_and_availability(mongo_db):
+    product = await _jeans()
+    product_id = str(product.id)
+    await store_inventory.rebuild()
+
+    assert await store_inventory.availability(product_id) == [
+        {"store_location": "Inorbit", "size": "32", "quantity": 1},
+        {"store_location": "Phoenix Mall", "size": "32", "quantity": 3},
+    ]
+    assert await store_inventory.availability(product_id, "34") == []
+    assert await store_inventory.availability(product_id, "34", in_stock_only=False) == [
+        {"store_location": "Phoenix Mall", "size": "34", "quantity": 0},
+    ]
+    assert await store_inventory.in_store("Inorbit", "32") == [{"product_id": product_id, "size": "32", "quantity": 1}]
+
+    results = await store_inventory.bulk_availability([
+        {"product_id": product_id, "size": "32", "store_location": "Inorbit"},
+        {"product_id": product_id, "size": "34"},
+    ])
+    assert [result["available"] for result in results] == [True, False]
+
+
+@pytest.mark.asyncio
+async def test_availability_reads_are_covered(mongo_db):
+    product = await _jeans()
+    await store_inventory.rebuild()
+    explain = await StoreInventory.get_motor_collection().find(
+        {"product_id": str(product.id), "size": "32", "quantity": {"$gt": 0}}, store_inventory._COVERED
+    ).hint(PRODUCT_AVAILABILITY_INDEX).explain()
+    assert explain["executionStats"]["totalDocsExamined"] == 0
+
+
+@pytest.mark.asyncio
+async def test_product_writes_reach_the_collection(mongo_db):
+    product = await _jeans()
+    store_inventory.store_inventory_sync.start()
+    try:
+        product.inventory = [Inventory(store_location="Inorbit", size="30", quantity=2)]
+        await product.save()
+        catalog_events.notify_product_saved(product)
+        await store_inventory.store_inventory_sync.drain()
+        assert await store_inventory.availability(str(product.id), in_stock_only=False) == [
+            {"store_location": "Inorbit", "size": "30", "quantity": 2},
+        ]
+
+        catalog_events.notify_product_deleted(str(product.id))
+        await store_inventory.store_inventory_sync.drain()
+        assert await StoreInventory.find(StoreInventory.product_id == str(product.id)).count() == 0
+    finally:
+        await store_inventory.store_inventory_sync.stop()
@@ -0,0 +1,61 @@
+import math
+import random
+
+import pytest
+
+from app.models.product import Inventory, Product
+from app.models.store import GeoPoint, Store
+from app.services import store_inventory, stores
+from app.services.stores import KDTree, StoreLocator, _unit_vector
+
+
+def _haversine_km(a, b):
+    (lat1, lng1), (lat2, lng2) = [(math.radians(lat), math.radians(lng)) for lat, lng in (a, b)]
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * stores.EARTH_RADIUS_KM * math.asin(math.sqrt(h))
+
+
+def test_kd_tree_matches_brute_force():
+    rng = random.Random(5)
+    points = [_unit_vector(rng.uniform(8, 32), rng.uniform(68, 90)) for _ in range(300)]
+    tree = KDTree(points)
+    for _ in range(50):
+        query = _unit_vector(rng.uniform(8, 32), rng.uniform(68, 90))
+        expected = sorted((math.dist(query, point), i) for i, point in enumerate(points))
+        assert tree.nearest(query, 7) == expected[:7]
+        bound = expected[10][0]
+        assert tree.nearest(query, 50, bound) == [pair for pair in expected[:50] if pair[0] <= bound]
+
+
+def test_locator_distances_and_radius():
+    locator = StoreLocator()
+    locator.rebuild([
+        {"name": "Fort", "geo": {"type": "Point", "coordinates": [72.8347, 18.9322]}},
+        {"name": "Andheri", "geo": {"type": "Point", "coordinates": [72.8697, 19.1136]}},
+        {"name": "Pune Central", "geo": {"type": "Point", "coordinates": [73.8567, 18.5204]}},
+        {"name": "Online"},
+    ])
+    here = (19.0760, 72.8777)
+    nearest = locator.nearest(*here, limit=5, max_km=50)
+    assert [store["name"] for store in nearest] == ["Andheri", "Fort"]
+    assert nearest[0]["distance_km"] == pytest.approx(_haversine_km(here, (19.1136, 72.8697)), abs=0.01)
+    assert locator.coordinates("Pune Central") == (18.5204, 73.8567)
+    assert locator.coordinates("Online") is None
+
+
+@pytest.mark.asyncio
+async def test_nearest_with_stock(mongo_db):
+    for name, lng, lat in [("Fort", 72.8347, 18.9322), ("Andheri", 72.8697, 19.1136), ("Pune Central", 73.8567, 18.5204)]:
+        await Store(name=name, city="Mumbai", geo=GeoPoint(coordinates=[lng, lat])).insert()
+    product = Product(name="Linen Shirt", price=1499.0, category="Shirts", inventory=[
+        Inventory(store_location="Andheri", size="M", quantity=0),
+        Inventory(store_location="Fort", size="M", quantity=2),
+        Inventory(store_location="Pune Central", size="M", quantity=5),
+    ])
+    await product.insert()
+    await store_inventory.rebuild()
+
+    found = await stores.nearest_with_stock(str(product.id), "M", 19.0760, 72.8777, limit=3, max_km=50)
+    assert [(store["name"], store["stock"]) for store in found] == [("Fort", [{"size": "M", "quantity": 2}])]
+    found = await stores.nearest_with_stock(str(product.id), "M", 19.0760, 72.8777, limit=3, max_km=500)
+    assert [store["name"] for store in found] == ["Fort", "Pune Central"]
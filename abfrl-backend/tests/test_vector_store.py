@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+from types import SimpleNamespace
+from app.services.vector_store import HashingEmbedder, ProductVectorStore, VectorIndex
+
+CATALOG = [
+    {"_id": "1", "name": "Slim Fit Blue Jeans", "category": "jeans", "description": "Classic denim with a slim fit"},
+    {"_id": "2", "name": "Oxford Cotton Shirt", "category": "shirts", "description": "Formal white shirt for office"},
+    {"_id": "3", "name": "Leather Biker Jacket", "category": "jackets", "description": "Black genuine leather"},
+    {"_id": "4", "name": "Running Sneakers", "category": "footwear", "description": "Lightweight running shoes"},
+]
+
+
+def _store():
+    store = ProductVectorStore()
+    store.rebuild(CATALOG)
+    return store
+
+
+def test_embeddings_are_deterministic_unit_vectors():
+    embedder = HashingEmbedder(64)
+    first = embedder.embed_fields([("Slim Fit Blue Jeans", 1.0)])
+    second = HashingEmbedder(64).embed_fields([("slim fit blue jeans", 1.0)])
+    assert first.dtype == np.float32
+    assert np.allclose(first, second)
+    assert np.isclose(np.linalg.norm(first), 1.0)
+    assert not embedder.embed_query("show me something").any()
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("show me jeans", "1"),
+    ("recommend a shirt", "2"),
+    ("black leather jacket", "3"),
+    ("running shoes", "4"),
+])
+def test_search_ranks_matching_product_first(query, expected):
+    assert _store().search(query, 2)[0][0] == expected
+
+
+def test_catalog_hook_keeps_index_current():
+    store = _store()
+    store.on_product_saved(SimpleNamespace(id="5", name="Silk Saree", category="ethnic",
+                                           description="For weddings", colors=["red"], metadata_info={}))
+    assert store.search("silk saree", 1)[0][0] == "5"
+
+    store.on_product_deleted("1")
+    assert "1" not in [product_id for product_id, _ in store.search("jeans", 10)]
+
+
+def test_ivf_search_agrees_with_exact_search():
+    rng = np.random.default_rng(0)
+    # Clustered data, as product embeddings are
+    centers = rng.normal(size=(20, 32))
+    vectors = (centers[rng.integers(0, 20, 2000)] + 0.3 * rng.normal(size=(2000, 32))).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    ids = [str(i) for i in range(2000)]
+
+    index = VectorIndex(32, ann_min_items=1000, nprobe=8)
+    index.build(ids, vectors)
+    assert index.approximate
+
+    hits = 0
+    for query in vectors[:50]:
+        exact = {pid for pid, _ in index.search(query, 10, exact=True)}
+        hits += len(exact & {pid for pid, _ in index.search(query, 10)})
+    assert hits / 500 >= 0.9
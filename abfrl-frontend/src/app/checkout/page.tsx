@@ -15,7 +15,7 @@ import { useAuthContext } from '@/context/auth-context'
 import QRCode from 'qrcode'
 
 export default function CheckoutPage() {
-  const { cart, summary, clearCart } = useCart()
+  const { cart, summary, setCart } = useCart()
   const { user } = useAuthContext()
   const router = useRouter()
   const [step, setStep] = useState(1) // 1: Shipping, 2: Review & Payment, 3: QR Code Payment
@@ -188,23 +188,10 @@ export default function CheckoutPage() {
 
   const processCheckout = async (pid: string, txnId: string) => {
     try {
-      // Map cart items to backend format
-      const cartItems = cart.map(item => ({
-        id: String(item.id),
-        name: item.name,
-        price: item.price,
-        quantity: item.quantity,
-        selectedSize: item.selectedSize
-      }))
-
+      // The backend prices and empties the cart itself
       const checkoutResponse = await api.post('/api/v1/checkout/checkout', {
         user_id: user?.uid,
         shipping_address: shippingDetails,
-        cart_items: cartItems,
-        subtotal: summary.subtotal,
-        shipping: summary.shipping,
-        discount: summary.discount,
-        total: summary.total,
         discount_code: summary.discountCode,
         payment_id: pid,
         transaction_id: txnId,
@@ -212,7 +199,7 @@ export default function CheckoutPage() {
       })
 
       if (checkoutResponse.data.success) {
-        clearCart()
+        setCart({ items: [], summary: { subtotal: 0, shipping: 0, discount: 0, total: 0, discountCode: undefined } })
         router.push(`/checkout/success?order_id=${checkoutResponse.data.order_id}`)
       }
     } catch (error: any) {